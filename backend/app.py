@@ -1,24 +1,325 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, stream_with_context
 from flask_cors import CORS
+import base64
+import binascii
+import hashlib
+import heapq
 import json
+import threading
 import time
 import requests
 from bs4 import BeautifulSoup
 import urllib.parse
 import re
-from typing import Dict, List, Optional, Any
+import unicodedata
+from typing import Dict, List, Optional, Any, Callable, Generator, Iterator, Tuple
 import logging
 import sys
 import traceback
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from config import Config
+from http_client import HttpClient
+from cache import PersistentCache, create_cache
+from keyword_matcher import KeywordMatcher
+from page_planner import RankingPagePlanner
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from llm_client import HedgedLLMClient, LLMStreamResult, LLMTarget, StreamingLLMClient
+from shop_store import ShopStore
+from singleflight import SingleFlight
+from rate_limiter import Priority, RateLimitExceeded, TokenBucketScheduler
+from restaurant_record import RestaurantRecord, compact_shop, restaurants_to_dicts
+from serialization import EncodedResponseCache, dumps_json, negotiate_encoding, parse_fields, project_fields
+from metrics import (CACHE_REQUESTS_TOTAL, HOTPEPPER_PAGING_TOTAL, QUERY_PARSE_TOTAL, REGISTRY, STAGE_DURATION,
+                     UPSTREAM_ERRORS_TOTAL)
+from log_config import (current_request_id, debug_enabled, describe_error, end_request_context, get_logger, mask_secrets,
+                        mask_url_secrets, setup_logging, start_request_context, submit_in_context)
 
 app = Flask(__name__)
 CORS(app)
 
-# 標準出力を強制的にフラッシュ
-import sys
-import os
-sys.stdout = os.fdopen(sys.stdout.fileno(), 'w', 1)  # Line buffered
+# ログはキュー経由でバックグラウンドスレッドが出力する
+setup_logging()
+logger = get_logger('app')
+parse_logger = get_logger('parse')
+llm_logger = get_logger('llm')
+search_logger = get_logger('search')
+hotpepper_logger = get_logger('hotpepper')
+price_logger = get_logger('price')
+
+# 地域辞書（主要エリア）
+LOCATION_KEYWORDS = {
+    '新宿': '新宿',
+    'shinjuku': '新宿',
+    '歌舞伎町': '新宿',  # 歌舞伎町は新宿エリアに含める
+    'kabukicho': '新宿',
+    '渋谷': '渋谷',
+    'shibuya': '渋谷',
+    '池袋': '池袋',
+    'ikebukuro': '池袋',
+    '銀座': '銀座',
+    'ginza': '銀座',
+    '六本木': '六本木',
+    'roppongi': '六本木',
+    '品川': '品川',
+    'shinagawa': '品川',
+    '新橋': '新橋',
+    'shinbashi': '新橋',
+    '恵比寿': '恵比寿',
+    'ebisu': '恵比寿',
+    '代官山': '代官山',
+    'daikanyama': '代官山',
+    '表参道': '表参道',
+    'omotesando': '表参道',
+    '赤坂': '赤坂',
+    'akasaka': '赤坂',
+    '青山': '青山',
+    'aoyama': '青山',
+    '有楽町': '有楽町',
+    'yurakucho': '有楽町',
+    '秋葉原': '秋葉原',
+    'akihabara': '秋葉原',
+    '上野': '上野',
+    'ueno': '上野',
+    '浅草': '浅草',
+    'asakusa': '浅草',
+    '東京駅': '東京駅',
+    'tokyo station': '東京駅',
+    '横浜': '横浜',
+    'yokohama': '横浜',
+    'みなとみらい': 'みなとみらい',
+    'minato mirai': 'みなとみらい'
+}
+
+# 料理ジャンル辞書
+CUISINE_KEYWORDS = {
+    '寿司': '寿司',
+    'sushi': '寿司',
+    '鮨': '寿司',
+    'すし': '寿司',
+    'イタリアン': 'イタリアン',
+    'italian': 'イタリアン',
+    'イタリア料理': 'イタリアン',
+    'フレンチ': 'フレンチ',
+    'french': 'フレンチ',
+    'フランス料理': 'フレンチ',
+    '中華': '中華',
+    'chinese': '中華',
+    '中国料理': '中華',
+    '中華料理': '中華',
+    '焼肉': '焼肉',
+    'yakiniku': '焼肉',
+    '焼き肉': '焼肉',
+    'bbq': '焼肉',
+    '居酒屋': '居酒屋',
+    'izakaya': '居酒屋',
+    '韓国料理': '韓国料理',
+    'korean': '韓国料理',
+    'タイ料理': 'タイ料理',
+    'thai': 'タイ料理',
+    'インド料理': 'インド料理',
+    'indian': 'インド料理',
+    'カレー': 'カレー',
+    'curry': 'カレー',
+    'ラーメン': 'ラーメン',
+    'ramen': 'ラーメン',
+    'うどん': 'うどん',
+    'udon': 'うどん',
+    'そば': 'そば',
+    'soba': 'そば',
+    '蕎麦': 'そば',
+    '天ぷら': '天ぷら',
+    'tempura': '天ぷら',
+    'てんぷら': '天ぷら',
+    'とんかつ': 'とんかつ',
+    'tonkatsu': 'とんかつ',
+    'カツ': 'とんかつ',
+    'ハンバーガー': 'ハンバーガー',
+    'burger': 'ハンバーガー',
+    'ステーキ': 'ステーキ',
+    'steak': 'ステーキ',
+    '和食': '和食',
+    'japanese': '和食',
+    '洋食': '洋食',
+    'western': '洋食'
+}
+
+# シチュエーション/カテゴリ辞書
+CATEGORY_KEYWORDS = {
+    'デート': 'デート',
+    'date': 'デート',
+    '記念日': '記念日',
+    'anniversary': '記念日',
+    '接待': '接待',
+    'business': '接待',
+    '会食': '接待',
+    '飲み会': '飲み会',
+    'party': '飲み会',
+    'パーティ': '飲み会',
+    '女子会': '女子会',
+    'girls night': '女子会',
+    '家族': '家族',
+    'family': '家族',
+    'ファミリー': '家族',
+    '一人': '一人',
+    'solo': '一人',
+    'ひとり': '一人',
+    'ランチ': 'ランチ',
+    'lunch': 'ランチ',
+    'お昼': 'ランチ',
+    'ディナー': 'ディナー',
+    'dinner': 'ディナー',
+    '夕食': 'ディナー',
+    'カジュアル': 'カジュアル',
+    'casual': 'カジュアル',
+    '高級': '高級',
+    'luxury': '高級',
+    'fine dining': '高級',
+    'おしゃれ': 'おしゃれ',
+    'stylish': 'おしゃれ',
+    '安い': '安い',
+    'cheap': '安い',
+    'リーズナブル': '安い',
+    'affordable': '安い',
+    '個室': '個室',
+    'private': '個室',
+    'プライベート': '個室',
+    '夜景': '夜景',
+    'view': '夜景',
+    '景色': '夜景'
+}
+
+# 予算キーワード
+BUDGET_KEYWORDS = {
+    '安い': 'low',
+    'cheap': 'low',
+    'リーズナブル': 'low',
+    '3000円以下': 'low',
+    '2000円以下': 'low',
+    '高級': 'high',
+    'luxury': 'high',
+    'fine dining': 'high',
+    '10000円以上': 'high',
+    '1万円以上': 'high',
+    '普通': 'medium',
+    'moderate': 'medium',
+    '5000円': 'medium',
+    '4000円': 'medium',
+    '中価格': 'medium'
+}
+
+# 人数キーワード
+PARTY_SIZE_KEYWORDS = {
+    '二人': 2,
+    '2人': 2,
+    '2名': 2,
+    'couple': 2,
+    'two': 2,
+    '四人': 4,
+    '4人': 4,
+    '4名': 4,
+    'four': 4,
+    'group': 4,
+    '大人数': 10,
+    '10人': 10,
+    '宴会': 10,
+    'large group': 10,
+    '一人': 1,
+    '1人': 1,
+    'solo': 1,
+    'alone': 1
+}
+
+# 時間帯キーワード
+TIME_PREFERENCE_KEYWORDS = {
+    'ランチ': 'lunch',
+    'lunch': 'lunch',
+    'お昼': 'lunch',
+    '昼食': 'lunch',
+    'ディナー': 'dinner',
+    'dinner': 'dinner',
+    '夕食': 'dinner',
+    '夜': 'dinner',
+    '朝食': 'breakfast',
+    'breakfast': 'breakfast',
+    '朝': 'breakfast',
+    'morning': 'breakfast'
+}
+
+# カテゴリ/シチュエーションごとのマッチスコア加点キーワード（店名・キャッチコピーで判定）
+CATEGORY_SCORE_KEYWORDS = {
+    'デート': ['デート', '記念日', 'カップル', '個室', '夜景'],
+    '接待': ['接待', '宴会', '個室', '高級', 'コース'],
+    '飲み会': ['飲み会', '宴会', '飲み放題', 'パーティ', '歓送迎会'],
+    '家族': ['家族', 'ファミリー', '子供', 'キッズ'],
+    '一人': ['一人', 'カウンター', 'ひとり', 'bar'],
+    'ランチ': ['ランチ', 'lunch', 'お昼', '定食'],
+    'ディナー': ['ディナー', 'dinner', 'コース', '夜'],
+    '高級': ['高級', 'luxury', 'fine', 'premium'],
+    '安い': ['安い', '格安', 'リーズナブル', 'コスパ'],
+    '個室': ['個室', 'private', 'プライベート']
+}
+
+# 予算レベルごとのマッチスコア加点キーワード（店舗の予算表記で判定）
+BUDGET_SCORE_KEYWORDS = {
+    'low': ['1000', '2000', '安い', 'リーズナブル'],
+    'medium': ['3000', '4000', '5000'],
+    'high': ['6000', '8000', '1万', '高級']
+}
+
+# 推定評価を上げるキャッチコピーのキーワード
+QUALITY_CATCH_KEYWORDS = ['厳選', '最高', '極上', '特選', 'こだわり', '老舗']
+
+# 検索結果として返す最大件数と、そのうち高評価店（4.0以上）を優先する枠
+TOP_RESTAURANTS_LIMIT = 50
+HIGH_RATED_QUOTA = 30
+
+# クエリ解析用の語彙をまとめたオートマトン（起動時に一度だけ構築）
+QUERY_KEYWORD_MATCHER = KeywordMatcher({
+    'location': LOCATION_KEYWORDS,
+    'cuisine': CUISINE_KEYWORDS,
+    'category': CATEGORY_KEYWORDS,
+    'budget': BUDGET_KEYWORDS,
+    'party_size': PARTY_SIZE_KEYWORDS,
+    'time_preference': TIME_PREFERENCE_KEYWORDS
+})
+
+
+def create_hotpepper_scheduler() -> TokenBucketScheduler:
+    """Config の設定でホットペッパーAPI用のスケジューラーを作成"""
+    return TokenBucketScheduler(
+        'hotpepper',
+        rate=Config.HOTPEPPER_RATE_LIMIT,
+        burst=Config.HOTPEPPER_BURST,
+        daily_quota=Config.HOTPEPPER_DAILY_QUOTA,
+        quota_reserve={
+            Priority.SPECULATIVE: Config.HOTPEPPER_SPECULATIVE_RESERVE,
+            Priority.BACKGROUND: Config.HOTPEPPER_BACKGROUND_RESERVE
+        },
+        max_wait={
+            Priority.INTERACTIVE: Config.HOTPEPPER_INTERACTIVE_MAX_WAIT,
+            Priority.SPECULATIVE: Config.HOTPEPPER_SEARCH_DEADLINE,  # 実際は検索ごとの締め切りまで
+            Priority.BACKGROUND: None
+        },
+        max_queue=Config.HOTPEPPER_MAX_QUEUE
+    )
+
+def llm_hedge_policy() -> Dict[str, Any]:
+    """予備リクエストを送るまでの待ち時間の設定"""
+    return {
+        'percentile': Config.LLM_HEDGE_PERCENTILE,
+        'min_delay': Config.LLM_HEDGE_MIN_DELAY,
+        'default_delay': Config.LLM_HEDGE_DEFAULT_DELAY
+    }
+
+def drain_generator(generator: Generator) -> Any:
+    """ジェネレータを最後まで回し、そのreturn値を返す"""
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        return stop.value
+
 
 class RestaurantSearchService:
     def __init__(self):
@@ -31,199 +332,172 @@ class RestaurantSearchService:
         self.hotpepper_api_key = Config.HOTPEPPER_API_KEY
         self.tabelog_api_key = Config.TABELOG_API_KEY
         
-        print(f"[INIT] HotPepper API Key: {'SET' if self.hotpepper_api_key else 'NOT SET'}")
-        print(f"[INIT] HotPepper API Key (masked): {self.hotpepper_api_key[:4]}...{self.hotpepper_api_key[-4:] if self.hotpepper_api_key and len(self.hotpepper_api_key) > 8 else 'INVALID'}")
-        print(f"[INIT] Tabelog API Key: {'SET' if self.tabelog_api_key else 'NOT SET'}")
-        print(f"[INIT] HotPepper URL: {self.hotpepper_api}")
+        # 上流API呼び出し用の共有HTTPセッション（ホスト別コネクションプール・keep-alive）
+        self.http = HttpClient(
+            pool_connections=Config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            pool_block=Config.HTTP_POOL_BLOCK
+        )
+        
+        # LLMストリーミングクライアント（JSONが揃った時点で生成を打ち切る）
+        self.llm_client = StreamingLLMClient(self.http, self.llm_endpoint, timeout=Config.LLM_TIMEOUT)
         
+        # 回路遮断（連続して失敗したらすぐにフォールバック）と予備リクエスト付きで呼び出す
+        self.llm_breakers = {
+            'primary': CircuitBreaker('llm_primary', Config.LLM_BREAKER_FAILURE_THRESHOLD, Config.LLM_BREAKER_RECOVERY_TIME),
+            'hedge': CircuitBreaker('llm_hedge', Config.LLM_BREAKER_FAILURE_THRESHOLD, Config.LLM_BREAKER_RECOVERY_TIME)
+        }
+        hedge_client = None
+        if Config.LLM_HEDGE_ENABLED:
+            hedge_client = StreamingLLMClient(self.http, Config.LLM_HEDGE_ENDPOINT, timeout=Config.LLM_TIMEOUT)
+        self.hedged_llm_client = HedgedLLMClient(
+            *self._llm_targets(self.llm_client, hedge_client),
+            executor=ThreadPoolExecutor(max_workers=Config.LLM_HEDGE_WORKERS, thread_name_prefix='llm') if hedge_client else None,
+            **llm_hedge_policy()
+        )
+        
+        # ホットペッパー グルメサーチの応答キャッシュ（TTL + LRU、CACHE_BACKEND でワーカー間の共有も可）
+        self.hotpepper_cache = create_cache(
+            'hotpepper',
+            ttl=Config.HOTPEPPER_CACHE_TTL,
+            max_entries=Config.HOTPEPPER_CACHE_MAX_ENTRIES,
+            max_bytes=Config.HOTPEPPER_CACHE_MAX_BYTES
+        )
+        
+        # LLMによるクエリ解析結果の永続キャッシュ（再起動後も保持、同一ホストのワーカーはファイルを共有）
+        if Config.CACHE_BACKEND.lower() == 'redis':
+            self.llm_parse_cache = create_cache(
+                'llm_parse',
+                ttl=Config.LLM_PARSE_CACHE_TTL,
+                max_entries=Config.LLM_PARSE_CACHE_MAX_ENTRIES,
+                max_bytes=Config.LLM_PARSE_CACHE_MAX_BYTES
+            )
+        else:
+            self.llm_parse_cache = PersistentCache(
+                path=Config.LLM_PARSE_CACHE_PATH,
+                max_entries=Config.LLM_PARSE_CACHE_MAX_ENTRIES
+            )
+        
+        # ホットペッパーAPIの呼び出し制御（全呼び出しが通る。1ページ目・価格比較を先読みより優先）
+        self.hotpepper_scheduler = create_hotpepper_scheduler()
+        
+        # 実行中の同じLLM解析・同じページ取得には新たに問い合わせず、結果を共有する
+        self._llm_parse_flight = SingleFlight('llm_parse')
+        self._hotpepper_page_flight = SingleFlight('hotpepper_page')
+        
+        # ホットペッパー店舗のローカルストア（取得済みエリアはAPIを呼ばずに検索）
+        self.shop_store = ShopStore(Config.SHOP_STORE_PATH, Config.SHOP_STORE_MAX_AGE) if Config.SHOP_STORE_ENABLED else None
+        
+        # ホットペッパーのページ取得用ワーカープール（全リクエストで共有）
+        self._hotpepper_executor = ThreadPoolExecutor(
+            max_workers=Config.HOTPEPPER_FETCH_WORKERS,
+            thread_name_prefix='hotpepper'
+        )
+        # 価格比較サイト問い合わせ用ワーカープール
+        self._price_executor = ThreadPoolExecutor(
+            max_workers=Config.PRICE_FETCH_WORKERS,
+            thread_name_prefix='price'
+        )
+        
+        logger.info(f"HotPepper API Key: {'SET' if self.hotpepper_api_key else 'NOT SET'}")
+        logger.info(f"Tabelog API Key: {'SET' if self.tabelog_api_key else 'NOT SET'}")
+        logger.info(f"HotPepper URL: {self.hotpepper_api}")
+        
+    def _llm_targets(self, primary_client: Any, hedge_client: Optional[Any]) -> Tuple[LLMTarget, Optional[LLMTarget]]:
+        """主系・予備の呼び出し先（回路遮断の状態は同期版・非同期版で共有する）"""
+        primary = LLMTarget('primary', primary_client, Config.LLM_MODEL, self.llm_breakers['primary'])
+        if hedge_client is None:
+            return primary, None
+        return primary, LLMTarget('hedge', hedge_client, Config.LLM_HEDGE_MODEL, self.llm_breakers['hedge'])
+    
     def query_llm(self, user_query: str) -> Dict[str, Any]:
+        direct_or_cached, cache_key = self._parse_query_without_llm(user_query)
+        if direct_or_cached is not None:
+            return direct_or_cached
+        
+        # 直接マッチングが失敗した場合のみLLMを使用（同じ言い回しを解析中ならその結果を待つ）
+        return self._llm_parse_flight.do(cache_key, lambda: self._parse_with_llm(user_query, cache_key))
+    
+    def _parse_with_llm(self, user_query: str, cache_key: str) -> Dict[str, Any]:
+        parse_logger.info(f"No direct match found, querying LLM for: {user_query}")
+        QUERY_PARSE_TOTAL.inc(source='llm')
+        with STAGE_DURATION.time(stage='llm_call'):
+            llm_result = self._query_llm_for_restaurant(user_query)
+        
+        if llm_result is None:
+            # LLMに問い合わせられなかった場合はキャッシュせず、復旧後に解析し直す
+            return self._empty_llm_result()
+        self._store_llm_parse_result(cache_key, llm_result)
+        return llm_result
+    
+    def _parse_query_without_llm(self, user_query: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """辞書マッチングと解析キャッシュで解析（LLMが必要な場合は結果がNone）
+        
+        (解析結果, 解析キャッシュのキー) を返す。
+        """
         # まず直接辞書マッチングを試行
-        direct_result = self._extract_restaurant_keywords_directly(user_query)
+        with STAGE_DURATION.time(stage='direct_parse'):
+            direct_result = self._extract_restaurant_keywords_directly(user_query)
         
         # 直接マッチングが成功した場合はそれを使用
+        cache_key = f"{Config.LLM_MODEL}:{self._canonicalize_query(user_query)}"
         if any([direct_result.get('location'), direct_result.get('cuisine'), direct_result.get('category')]):
-            print(f"*** DIRECT MATCH FOUND: {direct_result} ***")
-            return direct_result
-        
-        # 直接マッチングが失敗した場合のみLLMを使用
-        print(f"[INFO] No direct match found, querying LLM for: {user_query}", flush=True)
-        llm_result = self._query_llm_for_restaurant(user_query)
-        return llm_result
+            parse_logger.info(f"Direct match found: {direct_result}")
+            QUERY_PARSE_TOTAL.inc(source='direct')
+            return direct_result, cache_key
+        
+        # 同じ言い回しの解析結果がキャッシュにあればLLMを呼ばない
+        cached_result = self.llm_parse_cache.get(cache_key)
+        CACHE_REQUESTS_TOTAL.inc(cache='llm_parse', result='hit' if cached_result is not None else 'miss')
+        if cached_result is not None:
+            parse_logger.info(f"LLM parse cache hit for: {user_query}")
+            QUERY_PARSE_TOTAL.inc(source='cache')
+            return cached_result, cache_key
+        return None, cache_key
+    
+    def _store_llm_parse_result(self, cache_key: str, llm_result: Dict[str, Any]) -> None:
+        # LLMが応答したが何も抽出できなかった（全項目None）結果は短いTTLのネガティブエントリとして保存
+        if any(value is not None for value in llm_result.values()):
+            self.llm_parse_cache.set(cache_key, llm_result, ttl=Config.LLM_PARSE_CACHE_TTL)
+        else:
+            self.llm_parse_cache.set(cache_key, llm_result, ttl=Config.LLM_PARSE_CACHE_NEGATIVE_TTL)
+    
+    @staticmethod
+    def _canonicalize_query(query: str) -> str:
+        """クエリの正規化（NFKC・全角/半角の統一、小文字化、「」と余分な空白の除去）"""
+        normalized = unicodedata.normalize('NFKC', query).lower()
+        normalized = normalized.replace('「', '').replace('」', '')
+        return ' '.join(normalized.split())
     
     def _extract_restaurant_keywords_directly(self, query: str) -> Dict[str, Any]:
         """直接的なキーワード抽出（飲食店版）"""
         query_lower = query.lower().replace('「', '').replace('」', '')
         
-        # 地域辞書（主要エリア）
-        location_dict = {
-            '新宿': '新宿',
-            'shinjuku': '新宿',
-            '歌舞伎町': '新宿',  # 歌舞伎町は新宿エリアに含める
-            'kabukicho': '新宿',
-            '渋谷': '渋谷',
-            'shibuya': '渋谷',
-            '池袋': '池袋',
-            'ikebukuro': '池袋',
-            '銀座': '銀座',
-            'ginza': '銀座',
-            '六本木': '六本木',
-            'roppongi': '六本木',
-            '品川': '品川',
-            'shinagawa': '品川',
-            '新橋': '新橋',
-            'shinbashi': '新橋',
-            '恵比寿': '恵比寿',
-            'ebisu': '恵比寿',
-            '代官山': '代官山',
-            'daikanyama': '代官山',
-            '表参道': '表参道',
-            'omotesando': '表参道',
-            '赤坂': '赤坂',
-            'akasaka': '赤坂',
-            '青山': '青山',
-            'aoyama': '青山',
-            '有楽町': '有楽町',
-            'yurakucho': '有楽町',
-            '秋葉原': '秋葉原',
-            'akihabara': '秋葉原',
-            '上野': '上野',
-            'ueno': '上野',
-            '浅草': '浅草',
-            'asakusa': '浅草',
-            '東京駅': '東京駅',
-            'tokyo station': '東京駅',
-            '横浜': '横浜',
-            'yokohama': '横浜',
-            'みなとみらい': 'みなとみらい',
-            'minato mirai': 'みなとみらい'
-        }
-        
-        # 料理ジャンル辞書
-        cuisine_dict = {
-            '寿司': '寿司',
-            'sushi': '寿司',
-            '鮨': '寿司',
-            'すし': '寿司',
-            'イタリアン': 'イタリアン',
-            'italian': 'イタリアン',
-            'イタリア料理': 'イタリアン',
-            'フレンチ': 'フレンチ',
-            'french': 'フレンチ',
-            'フランス料理': 'フレンチ',
-            '中華': '中華',
-            'chinese': '中華',
-            '中国料理': '中華',
-            '中華料理': '中華',
-            '焼肉': '焼肉',
-            'yakiniku': '焼肉',
-            '焼き肉': '焼肉',
-            'bbq': '焼肉',
-            '居酒屋': '居酒屋',
-            'izakaya': '居酒屋',
-            '韓国料理': '韓国料理',
-            'korean': '韓国料理',
-            'タイ料理': 'タイ料理',
-            'thai': 'タイ料理',
-            'インド料理': 'インド料理',
-            'indian': 'インド料理',
-            'カレー': 'カレー',
-            'curry': 'カレー',
-            'ラーメン': 'ラーメン',
-            'ramen': 'ラーメン',
-            'うどん': 'うどん',
-            'udon': 'うどん',
-            'そば': 'そば',
-            'soba': 'そば',
-            '蕎麦': 'そば',
-            '天ぷら': '天ぷら',
-            'tempura': '天ぷら',
-            'てんぷら': '天ぷら',
-            'とんかつ': 'とんかつ',
-            'tonkatsu': 'とんかつ',
-            'カツ': 'とんかつ',
-            'ハンバーガー': 'ハンバーガー',
-            'burger': 'ハンバーガー',
-            'ステーキ': 'ステーキ',
-            'steak': 'ステーキ',
-            '和食': '和食',
-            'japanese': '和食',
-            '洋食': '洋食',
-            'western': '洋食'
-        }
-        
-        # シチュエーション/カテゴリ辞書
-        category_dict = {
-            'デート': 'デート',
-            'date': 'デート',
-            '記念日': '記念日',
-            'anniversary': '記念日',
-            '接待': '接待',
-            'business': '接待',
-            '会食': '接待',
-            '飲み会': '飲み会',
-            'party': '飲み会',
-            'パーティ': '飲み会',
-            '女子会': '女子会',
-            'girls night': '女子会',
-            '家族': '家族',
-            'family': '家族',
-            'ファミリー': '家族',
-            '一人': '一人',
-            'solo': '一人',
-            'ひとり': '一人',
-            'ランチ': 'ランチ',
-            'lunch': 'ランチ',
-            'お昼': 'ランチ',
-            'ディナー': 'ディナー',
-            'dinner': 'ディナー',
-            '夕食': 'ディナー',
-            'カジュアル': 'カジュアル',
-            'casual': 'カジュアル',
-            '高級': '高級',
-            'luxury': '高級',
-            'fine dining': '高級',
-            'おしゃれ': 'おしゃれ',
-            'stylish': 'おしゃれ',
-            '安い': '安い',
-            'cheap': '安い',
-            'リーズナブル': '安い',
-            'affordable': '安い',
-            '個室': '個室',
-            'private': '個室',
-            'プライベート': '個室',
-            '夜景': '夜景',
-            'view': '夜景',
-            '景色': '夜景'
-        }
+        # 全語彙を1回の走査で照合（語彙ごとに最長一致を採用）
+        matches = QUERY_KEYWORD_MATCHER.match(query_lower)
         
         # 地域マッチング
         detected_location = None
-        for location_key, location_name in location_dict.items():
-            if location_key in query_lower:
-                detected_location = location_name
-                print(f"*** LOCATION DETECTED: '{location_key}' -> '{location_name}' ***")
-                break
+        if matches['location']:
+            detected_location = matches['location'].value
+            parse_logger.debug("Location detected: '%s' -> '%s'", matches['location'].keyword, detected_location)
         
         # 料理ジャンルマッチング  
         detected_cuisine = None
-        for cuisine_key, cuisine_name in cuisine_dict.items():
-            if cuisine_key in query_lower:
-                detected_cuisine = cuisine_name
-                print(f"*** CUISINE DETECTED: '{cuisine_key}' -> '{cuisine_name}' ***")
-                break
+        if matches['cuisine']:
+            detected_cuisine = matches['cuisine'].value
+            parse_logger.debug("Cuisine detected: '%s' -> '%s'", matches['cuisine'].keyword, detected_cuisine)
         
         # カテゴリマッチング
         detected_category = None
-        for category_key, category_name in category_dict.items():
-            if category_key in query_lower:
-                detected_category = category_name
-                print(f"*** CATEGORY DETECTED: '{category_key}' -> '{category_name}' ***")
-                break
+        if matches['category']:
+            detected_category = matches['category'].value
+            parse_logger.debug("Category detected: '%s' -> '%s'", matches['category'].keyword, detected_category)
         
         # 複合クエリの解析
-        compound_result = self._parse_compound_restaurant_query(query_lower, detected_location, detected_cuisine, detected_category)
+        compound_result = self._parse_compound_restaurant_query(query_lower, detected_location, detected_cuisine, detected_category, matches)
         if compound_result:
-            print(f"*** COMPOUND RESTAURANT QUERY: {compound_result} ***", flush=True)
+            parse_logger.info(f"Compound restaurant query: {compound_result}")
             return compound_result
         
         # 基本的な結果を返す
@@ -237,37 +511,20 @@ class RestaurantSearchService:
         
         return result
     
-    def _parse_compound_restaurant_query(self, query_lower: str, location: str, cuisine: str, category: str) -> Optional[Dict[str, Any]]:
+    def _parse_compound_restaurant_query(self, query_lower: str, location: str, cuisine: str, category: str,
+                                         matches: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """複合レストランクエリの解析（例: '新宿でデートにおすすめのイタリアン'）"""
+        if matches is None:
+            matches = QUERY_KEYWORD_MATCHER.match(query_lower)
         
         # 予算情報の抽出
-        budget = None
-        if any(keyword in query_lower for keyword in ['安い', 'cheap', 'リーズナブル', '3000円以下', '2000円以下']):
-            budget = 'low'
-        elif any(keyword in query_lower for keyword in ['高級', 'luxury', 'fine dining', '10000円以上', '1万円以上']):
-            budget = 'high'
-        elif any(keyword in query_lower for keyword in ['普通', 'moderate', '5000円', '4000円', '中価格']):
-            budget = 'medium'
+        budget = matches['budget'].value if matches['budget'] else None
         
         # 人数情報の抽出
-        party_size = None
-        if any(keyword in query_lower for keyword in ['二人', '2人', '2名', 'couple', 'two']):
-            party_size = 2
-        elif any(keyword in query_lower for keyword in ['四人', '4人', '4名', 'four', 'group']):
-            party_size = 4
-        elif any(keyword in query_lower for keyword in ['大人数', '10人', '宴会', 'large group']):
-            party_size = 10
-        elif any(keyword in query_lower for keyword in ['一人', '1人', 'solo', 'alone']):
-            party_size = 1
+        party_size = matches['party_size'].value if matches['party_size'] else None
         
         # 時間帯情報の抽出
-        time_preference = None
-        if any(keyword in query_lower for keyword in ['ランチ', 'lunch', 'お昼', '昼食']):
-            time_preference = 'lunch'
-        elif any(keyword in query_lower for keyword in ['ディナー', 'dinner', '夕食', '夜']):
-            time_preference = 'dinner'
-        elif any(keyword in query_lower for keyword in ['朝食', 'breakfast', '朝', 'morning']):
-            time_preference = 'breakfast'
+        time_preference = matches['time_preference'].value if matches['time_preference'] else None
         
         # 複数の要素が検出された場合は複合クエリとして処理
         detected_elements = [location, cuisine, category, budget, party_size, time_preference]
@@ -287,10 +544,22 @@ class RestaurantSearchService:
         
         return None
     
-    def _query_llm_for_restaurant(self, user_query: str) -> Dict[str, Any]:
-        """LLMを使用してレストラン検索クエリを解析"""
+    def _query_llm_for_restaurant(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """LLMを使用してレストラン検索クエリを解析
+
+        回路遮断中・タイムアウト・接続エラー・HTTPエラーでLLMの応答が得られなかった場合はNoneを返す
+        （一時的な障害のため、解析キャッシュには保存しない）。
+        """
         try:
-            prompt = f"""あなたはレストラン検索の専門アシスタントです。ユーザーの自然言語クエリからレストラン検索に必要な情報を抽出してください。
+            # ストリーミングで受信し、JSONオブジェクトが揃った時点で生成を打ち切る
+            stream_result = self.hedged_llm_client.generate_json(self._build_llm_payload(user_query))
+            return self._interpret_llm_result(stream_result)
+        except Exception as e:
+            return self._llm_query_failed(e, self._llm_error_status(e, requests.RequestException))
+    
+    def _build_llm_payload(self, user_query: str) -> Dict[str, Any]:
+        """クエリ解析用の /api/generate リクエスト本体"""
+        prompt = f"""あなたはレストラン検索の専門アシスタントです。ユーザーの自然言語クエリからレストラン検索に必要な情報を抽出してください。
 
 ユーザークエリ: "{user_query}"
 
@@ -310,104 +579,117 @@ class RestaurantSearchService:
 - 料理ジャンルは一般的なカテゴリで答えてください
 - 日本のレストランを優先してください"""
 
-            payload = {
-                "model": Config.LLM_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "max_tokens": 200
-                }
+        return {
+            "model": Config.LLM_MODEL,
+            "prompt": prompt,
+            "options": {
+                "temperature": 0.3,
+                "top_p": 0.9,
+                "max_tokens": 200
             }
+        }
+    
+    def _interpret_llm_result(self, stream_result: LLMStreamResult) -> Optional[Dict[str, Any]]:
+        """LLMの応答を検索条件に正規化（JSONが得られなければ全項目None、HTTPエラーならNone）"""
+        if stream_result.status_code == 200:
+            llm_logger.debug("LLM response: %s", stream_result.text.strip())
+            llm_logger.info(
+                f"LLM stream: {stream_result.token_count} tokens, "
+                f"TTFT={stream_result.time_to_first_token}, TPS={stream_result.tokens_per_second}, "
+                f"terminated_early={stream_result.terminated_early}"
+            )
             
-            response = requests.post(self.llm_endpoint, json=payload, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result.get('response', '').strip()
-                
-                app.logger.info(f"LLM response: {content}")
-                
-                # JSONを抽出
-                try:
-                    json_start = content.find('{')
-                    json_end = content.rfind('}') + 1
-                    
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = content[json_start:json_end]
-                        parsed = json.loads(json_str)
-                        
-                        # 結果を検証・正規化
-                        result = {
-                            'location': parsed.get('location') if parsed.get('location') and parsed.get('location') != 'null' else None,
-                            'cuisine': parsed.get('cuisine') if parsed.get('cuisine') and parsed.get('cuisine') != 'null' else None,
-                            'category': parsed.get('category') if parsed.get('category') and parsed.get('category') != 'null' else None,
-                            'budget': parsed.get('budget') if parsed.get('budget') and parsed.get('budget') != 'null' else None,
-                            'party_size': parsed.get('party_size') if parsed.get('party_size') and parsed.get('party_size') != 'null' else None,
-                            'time_preference': parsed.get('time_preference') if parsed.get('time_preference') and parsed.get('time_preference') != 'null' else None
-                        }
-                        
-                        app.logger.info(f"Parsed LLM result: {result}")
-                        return result
-                        
-                except json.JSONDecodeError as e:
-                    app.logger.error(f"Failed to parse LLM JSON response: {e}")
-                
-                # JSONパースに失敗した場合のフォールバック
-                return {
-                    'location': None,
-                    'cuisine': None,
-                    'category': None,
-                    'budget': None,
-                    'party_size': None,
-                    'time_preference': None
+            parsed = stream_result.parsed
+            if parsed is not None:
+                # 結果を検証・正規化
+                result = {
+                    'location': parsed.get('location') if parsed.get('location') and parsed.get('location') != 'null' else None,
+                    'cuisine': parsed.get('cuisine') if parsed.get('cuisine') and parsed.get('cuisine') != 'null' else None,
+                    'category': parsed.get('category') if parsed.get('category') and parsed.get('category') != 'null' else None,
+                    'budget': parsed.get('budget') if parsed.get('budget') and parsed.get('budget') != 'null' else None,
+                    'party_size': parsed.get('party_size') if parsed.get('party_size') and parsed.get('party_size') != 'null' else None,
+                    'time_preference': parsed.get('time_preference') if parsed.get('time_preference') and parsed.get('time_preference') != 'null' else None
                 }
                 
-            else:
-                app.logger.error(f"LLM API error: HTTP {response.status_code}")
-                return {'location': None, 'cuisine': None, 'category': None, 'budget': None, 'party_size': None, 'time_preference': None}
-                
-        except Exception as e:
-            app.logger.error(f"LLM query error: {e}")
-            return {'location': None, 'cuisine': None, 'category': None, 'budget': None, 'party_size': None, 'time_preference': None}
+                llm_logger.info(f"Parsed LLM result: {result}")
+                return result
+            
+            llm_logger.error("Failed to parse LLM JSON response: no complete JSON object")
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='llm', status='invalid_response')
+            
+            # JSONパースに失敗した場合のフォールバック
+            return self._empty_llm_result()
+            
+        else:
+            llm_logger.error(f"LLM API error: HTTP {stream_result.status_code}")
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='llm', status=stream_result.status_code)
+            return None
+    
+    @staticmethod
+    def _empty_llm_result() -> Dict[str, Any]:
+        """何も抽出できなかった場合の解析結果（全項目None）"""
+        return {'location': None, 'cuisine': None, 'category': None, 'budget': None, 'party_size': None, 'time_preference': None}
+    
+    @staticmethod
+    def _llm_error_status(error: Exception, connection_error: type) -> str:
+        if isinstance(error, CircuitOpenError):
+            return 'circuit_open'
+        return 'connection' if isinstance(error, connection_error) else 'exception'
+    
+    def _llm_query_failed(self, error: Exception, status: str) -> None:
+        llm_logger.error(f"LLM query error: {error}")
+        UPSTREAM_ERRORS_TOTAL.inc(upstream='llm', status=status)
+        return None
     
     def search_restaurants(self, search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
         """レストラン検索（複数ソース対応）"""
+        return drain_generator(self.iter_search_restaurants(search_params))
+    
+    def iter_search_restaurants(self, search_params: Dict[str, Any]) -> Generator[Dict[str, Any], None, List[Dict[str, Any]]]:
+        """レストラン検索（ストリーミング用）
+
+        ホットペッパーの各ページを処理するたびにそのページのレストランをyieldし、
+        最終的な上位候補リストをreturnする。
+        """
         candidates = []
         seen_ids = set()
         
-        print(f"[SEARCH] Searching restaurants with params: {search_params}", flush=True)
+        search_logger.info(f"Searching restaurants with params: {search_params}")
         
         # ホットペッパーAPIの結果を優先
         if self.hotpepper_api_key:
-            hotpepper_results = self._search_hotpepper(search_params, seen_ids)
+            hotpepper_results = yield from self._iter_search_hotpepper(search_params, seen_ids)
             candidates.extend(hotpepper_results)
-            print(f"[HOTPEPPER] Added {len(hotpepper_results)} results")
+            search_logger.info(f"HotPepper added {len(hotpepper_results)} results")
         
+        return self._complete_search(candidates, search_params, seen_ids)
+    
+    def _complete_search(self, candidates: List[Dict[str, Any]], search_params: Dict[str, Any], seen_ids: set) -> List[Dict[str, Any]]:
+        """ホットペッパーの結果に他ソース・サンプルデータを加え、上位候補に絞り込む"""
         # 食べログAPIの結果
         if self.tabelog_api_key:
             tabelog_results = self._search_tabelog(search_params, seen_ids)
             candidates.extend(tabelog_results)
-            print(f"[TABELOG] Added {len(tabelog_results)} results")
+            search_logger.info(f"Tabelog added {len(tabelog_results)} results")
         
         # HotPepper APIの結果が少ない場合、サンプルデータで補完
         if len(candidates) < 5:
-            print(f"[FALLBACK] Only {len(candidates)} API results, adding sample data for better variety")
+            search_logger.info(f"Only {len(candidates)} API results, adding sample data for better variety")
             sample_results = self._get_sample_restaurants(search_params, seen_ids)
             # サンプル結果をAPIの結果の後に追加
             candidates.extend(sample_results)  # 制限なし
         
-        print(f"*** TOTAL RESULTS: {len(candidates)} RESTAURANTS FOUND ***")
+        search_logger.info(f"Total results: {len(candidates)} restaurants found")
         
         # 上位50件にフィルタリング
-        filtered_candidates = self._filter_top_restaurants(candidates, search_params)
-        print(f"*** FILTERED TO TOP: {len(filtered_candidates)} RESTAURANTS ***")
+        with STAGE_DURATION.time(stage='filter_top'):
+            filtered_candidates = self._filter_top_restaurants(candidates, search_params)
+        search_logger.info(f"Filtered to top: {len(filtered_candidates)} restaurants")
         
         return filtered_candidates
     
     def _calculate_match_score(self, shop: Dict[str, Any], search_params: Dict[str, Any]) -> float:
-        """レストランのマッチスコアを計算"""
+        """レストランのマッチスコアを計算（1店舗ずつの参照実装。検索では _score_shops_batch を使う）"""
         match_score = 10.0  # 基本スコア（API結果なので高い）
         
         # 料理ジャンルのマッチング（重要度：高）
@@ -433,21 +715,8 @@ class RestaurantSearchService:
             # 店名や説明文にカテゴリ関連キーワードが含まれるかチェック
             shop_name = shop.get('name', '').lower()
             shop_catch = shop.get('catch', '').lower()
-            category_keywords = {
-                'デート': ['デート', '記念日', 'カップル', '個室', '夜景'],
-                '接待': ['接待', '宴会', '個室', '高級', 'コース'],
-                '飲み会': ['飲み会', '宴会', '飲み放題', 'パーティ', '歓送迎会'],
-                '家族': ['家族', 'ファミリー', '子供', 'キッズ'],
-                '一人': ['一人', 'カウンター', 'ひとり', 'bar'],
-                'ランチ': ['ランチ', 'lunch', 'お昼', '定食'],
-                'ディナー': ['ディナー', 'dinner', 'コース', '夜'],
-                '高級': ['高級', 'luxury', 'fine', 'premium'],
-                '安い': ['安い', '格安', 'リーズナブル', 'コスパ'],
-                '個室': ['個室', 'private', 'プライベート']
-            }
-            
-            if category in category_keywords:
-                for keyword in category_keywords[category]:
+            if category in CATEGORY_SCORE_KEYWORDS:
+                for keyword in CATEGORY_SCORE_KEYWORDS[category]:
                     if keyword in shop_name or keyword in shop_catch:
                         match_score += 5.0
                         break
@@ -457,11 +726,7 @@ class RestaurantSearchService:
         shop_budget = shop.get('budget', {}).get('name', '')
         if budget and shop_budget:
             # 予算レベルの対応チェック
-            if budget == 'low' and any(keyword in shop_budget for keyword in ['1000', '2000', '安い', 'リーズナブル']):
-                match_score += 6.0
-            elif budget == 'medium' and any(keyword in shop_budget for keyword in ['3000', '4000', '5000']):
-                match_score += 6.0
-            elif budget == 'high' and any(keyword in shop_budget for keyword in ['6000', '8000', '1万', '高級']):
+            if budget in BUDGET_SCORE_KEYWORDS and any(keyword in shop_budget for keyword in BUDGET_SCORE_KEYWORDS[budget]):
                 match_score += 6.0
         
         # 設備・特徴によるボーナス（重要度：低）
@@ -477,7 +742,7 @@ class RestaurantSearchService:
         return round(match_score, 1)
     
     def _estimate_rating_from_shop_data(self, shop: Dict[str, Any]) -> float:
-        """店舗データから評価を推定"""
+        """店舗データから評価を推定（1店舗ずつの参照実装。検索では _score_shops_batch を使う）"""
         base_rating = 3.0  # 基本評価
         
         # 設備・サービスによるボーナス
@@ -506,7 +771,7 @@ class RestaurantSearchService:
         if catch:
             if len(catch) > 20:  # 詳細なキャッチコピー
                 base_rating += 0.2
-            if any(keyword in catch for keyword in ['厳選', '最高', '極上', '特選', 'こだわり', '老舗']):
+            if any(keyword in catch for keyword in QUALITY_CATCH_KEYWORDS):
                 base_rating += 0.3
         
         # 予算帯による評価調整（高級店は基本的に品質が高い傾向）
@@ -531,84 +796,258 @@ class RestaurantSearchService:
         # 5.0を超えないよう制限
         return round(min(base_rating, 5.0), 1)
     
+    def _score_shops_batch(self, shops: List[Dict[str, Any]], search_params: Dict[str, Any]) -> Tuple[List[float], List[float]]:
+        """ページ内の店舗のマッチスコアと推定評価をまとめて計算
+        
+        _calculate_match_score / _estimate_rating_from_shop_data と同じ結果を返す
+        （benchmarks/micro_benchmark.py が計測前に記録済みの店舗フィクスチャで照合する）。
+        必要な項目を列ごとに一度だけ取り出して各判定を少数の特徴キーに落とし、
+        スコアは特徴キーごとにメモ化した加算表から引く。
+        """
+        if not shops:
+            return [], []
+        
+        cuisine = search_params.get('cuisine', '')
+        location = search_params.get('location', '')
+        category = search_params.get('category', '')
+        budget = search_params.get('budget', '')
+        category_keywords = CATEGORY_SCORE_KEYWORDS.get(category, []) if category else []
+        budget_keywords = BUDGET_SCORE_KEYWORDS.get(budget, []) if budget else []
+        
+        # 列の取り出し
+        genres = [shop.get('genre', {}).get('name', '') for shop in shops]
+        areas = [shop.get('middle_area', {}).get('name', '') for shop in shops]
+        addresses = [shop.get('address', '') for shop in shops]
+        catches = [shop.get('catch', '') for shop in shops]
+        budgets = [shop.get('budget', {}).get('name', '') for shop in shops]
+        photos = [shop.get('photo', {}).get('pc', {}) for shop in shops]
+        flags = [
+            (
+                shop.get('private_room', '') == 'あり',
+                shop.get('card', '') == '利用可',
+                shop.get('parking', '') == 'あり',
+                shop.get('non_smoking', '') == '全面禁煙',
+                shop.get('wifi', '') == 'あり',
+                shop.get('lunch', '') == 'あり',
+                bool(shop.get('open', ''))
+            )
+            for shop in shops
+        ]
+        
+        # 検索条件に依存する判定
+        cuisine_hits = [bool(cuisine) and cuisine in genre for genre in genres]
+        if location:
+            location_levels = [
+                2 if location in area else (1 if location in address else 0)
+                for area, address in zip(areas, addresses)
+            ]
+        else:
+            location_levels = [0] * len(shops)
+        if category_keywords:
+            texts = [(shop.get('name', '').lower(), catch.lower()) for shop, catch in zip(shops, catches)]
+            category_hits = [
+                any(keyword in name or keyword in catch for keyword in category_keywords)
+                for name, catch in texts
+            ]
+        else:
+            category_hits = [False] * len(shops)
+        if budget_keywords:
+            budget_hits = [bool(name) and any(keyword in name for keyword in budget_keywords) for name in budgets]
+        else:
+            budget_hits = [False] * len(shops)
+        
+        match_scores = [
+            self._match_score_for_features(cuisine_hit, location_level, category_hit, budget_hit, flag[:4])
+            for cuisine_hit, location_level, category_hit, budget_hit, flag
+            in zip(cuisine_hits, location_levels, category_hits, budget_hits, flags)
+        ]
+        
+        # 検索条件に依存しない判定
+        ratings = []
+        for flag, photo, catch, budget_name, address in zip(flags, photos, catches, budgets, addresses):
+            photo_level = 2 if photo.get('l') else (1 if photo.get('m') else 0)
+            long_catch = bool(catch) and len(catch) > 20
+            quality_catch = bool(catch) and any(keyword in catch for keyword in QUALITY_CATCH_KEYWORDS)
+            if not budget_name:
+                budget_level = 0
+            elif '8000' in budget_name or '1万' in budget_name or '10000' in budget_name:
+                budget_level = 3
+            elif '5000' in budget_name or '6000' in budget_name:
+                budget_level = 2
+            elif '2000' in budget_name or '3000' in budget_name:
+                budget_level = 1
+            else:
+                budget_level = 0
+            detailed_address = bool(address) and len(address) > 20
+            ratings.append(self._rating_for_features(flag, photo_level, long_catch, quality_catch, budget_level, detailed_address))
+        
+        return match_scores, ratings
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _match_score_for_features(cuisine_hit: bool, location_level: int, category_hit: bool, budget_hit: bool,
+                                  flags: Tuple[bool, ...]) -> float:
+        """特徴キーからマッチスコアを計算（_calculate_match_score と同じ順序で加算）"""
+        private_room, card, parking, non_smoking = flags
+        match_score = 10.0
+        if cuisine_hit:
+            match_score += 15.0
+        if location_level == 2:
+            match_score += 12.0
+        elif location_level == 1:
+            match_score += 8.0
+        if category_hit:
+            match_score += 5.0
+        if budget_hit:
+            match_score += 6.0
+        if private_room:
+            match_score += 2.0
+        if card:
+            match_score += 1.0
+        if parking:
+            match_score += 1.0
+        if non_smoking:
+            match_score += 1.0
+        return round(match_score, 1)
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _rating_for_features(flags: Tuple[bool, ...], photo_level: int, long_catch: bool, quality_catch: bool,
+                             budget_level: int, detailed_address: bool) -> float:
+        """特徴キーから推定評価を計算（_estimate_rating_from_shop_data と同じ順序で加算）"""
+        private_room, card, parking, non_smoking, wifi, lunch, has_open = flags
+        base_rating = 3.0
+        if private_room:
+            base_rating += 0.3
+        if card:
+            base_rating += 0.2
+        if parking:
+            base_rating += 0.2
+        if non_smoking:
+            base_rating += 0.2
+        if wifi:
+            base_rating += 0.1
+        if lunch:
+            base_rating += 0.1
+        if photo_level == 2:
+            base_rating += 0.2
+        elif photo_level == 1:
+            base_rating += 0.1
+        if long_catch:
+            base_rating += 0.2
+        if quality_catch:
+            base_rating += 0.3
+        if budget_level == 3:
+            base_rating += 0.4
+        elif budget_level == 2:
+            base_rating += 0.2
+        elif budget_level == 1:
+            base_rating += 0.1
+        if has_open:
+            base_rating += 0.1
+        if detailed_address:
+            base_rating += 0.1
+        return round(min(base_rating, 5.0), 1)
+    
     def _filter_top_restaurants(self, candidates: List[Dict[str, Any]], search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
         """上位50件のレストランをフィルタリング（高評価優先）"""
-        if len(candidates) <= 50:
+        if len(candidates) <= TOP_RESTAURANTS_LIMIT:
             return candidates
         
-        # 高評価フィルタリング（4.0以上を優先）
-        high_rated = [r for r in candidates if r.get('rating', 0) >= 4.0]
-        medium_rated = [r for r in candidates if 3.5 <= r.get('rating', 0) < 4.0]
-        low_rated = [r for r in candidates if r.get('rating', 0) < 3.5]
-        
-        print(f"[FILTER] Rating distribution: High(4.0+): {len(high_rated)}, Medium(3.5-4.0): {len(medium_rated)}, Low(<3.5): {len(low_rated)}")
-        
-        # 各レストランに総合スコアを計算
-        for restaurant in candidates:
-            total_score = 0.0
+        # 1パスで総合スコアを計算し、高評価店（4.0以上）とそれ以外をそれぞれ上限付きヒープで保持
+        # ヒープの要素は (総合スコア, -元の順位, レストラン)。同点は元の順位が早い方を優先する
+        high_heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        other_heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        medium_count = 0
+        low_count = 0
+        for index, restaurant in enumerate(candidates):
+            total_score = self._calculate_total_score(restaurant)
+            restaurant['total_score'] = total_score
             
-            # マッチスコア（重み：50%）
-            match_score = restaurant.get('match_score', 0)
-            total_score += match_score * 0.5
-            
-            # 評価スコア（重み：50%）- 評価を重視
             rating = restaurant.get('rating', 0)
-            if rating and rating > 0:
-                # 5点満点の評価を100点満点に変換
-                rating_score = (rating / 5.0) * 100
-                total_score += rating_score * 0.5
-                
-                # 高評価ボーナス
-                if rating >= 4.5:
-                    total_score += 15.0  # 4.5以上は特別ボーナス
-                elif rating >= 4.0:
-                    total_score += 10.0  # 4.0以上はボーナス
-                elif rating >= 3.5:
-                    total_score += 5.0   # 3.5以上は軽微なボーナス
+            if rating >= 4.0:
+                # 高評価店は上位30件を優先枠に、31位以降は残り枠（最大20件）の候補にするため50件まで保持
+                self._push_bounded(high_heap, TOP_RESTAURANTS_LIMIT, (total_score, -index, restaurant))
+                continue
+            if rating >= 3.5:
+                medium_count += 1
             else:
-                # 評価がない場合は平均的な評価として扱う
-                total_score += 60 * 0.5  # 平均的な評価（3.0/5.0相当）
-            
-            # ソース別のボーナス（信頼性を考慮）
-            source = restaurant.get('source', '')
-            if source == 'hotpepper':
-                total_score += 5.0  # API結果は信頼性が高い
-            elif source == 'tabelog':
-                total_score += 3.0
-            else:
-                total_score += 0.0  # サンプルデータは追加ボーナスなし
-            
-            restaurant['total_score'] = round(total_score, 1)
+                low_count += 1
+            self._push_bounded(other_heap, TOP_RESTAURANTS_LIMIT, (total_score, -index, restaurant))
         
-        # 総合スコア順にソート
-        candidates.sort(key=lambda x: x.get('total_score', 0), reverse=True)
-        
-        # 高評価店を優先的に選択
-        selected = []
+        search_logger.info(
+            "Rating distribution",
+            extra={'data': {'high': len(candidates) - medium_count - low_count, 'medium': medium_count, 'low': low_count}}
+        )
         
         # 1. 高評価店（4.0以上）から最大30件
-        high_rated_sorted = sorted(high_rated, key=lambda x: x.get('total_score', 0), reverse=True)
-        selected.extend(high_rated_sorted[:30])
+        high_sorted = sorted(high_heap, reverse=True)
+        selected = high_sorted[:HIGH_RATED_QUOTA]
         
-        # 2. 残り枠を中評価・低評価から選択
-        remaining_slots = 50 - len(selected)
+        # 2. 残り枠を選ばれなかった高評価店・中評価・低評価から選択
+        remaining_slots = TOP_RESTAURANTS_LIMIT - len(selected)
         if remaining_slots > 0:
-            other_candidates = [r for r in candidates if r not in selected]
-            other_sorted = sorted(other_candidates, key=lambda x: x.get('total_score', 0), reverse=True)
-            selected.extend(other_sorted[:remaining_slots])
+            others = heapq.nlargest(remaining_slots, high_sorted[HIGH_RATED_QUOTA:] + other_heap)
+            selected.extend(others)
         
-        # 最終的に総合スコア順でソート
-        top_candidates = sorted(selected, key=lambda x: x.get('total_score', 0), reverse=True)
+        # 最終的に総合スコア順でソート（安定ソートなので同点は高評価枠 → 残り枠の順を保つ）
+        top_candidates = [entry[2] for entry in sorted(selected, key=lambda entry: entry[0], reverse=True)]
         
-        print(f"[FILTER] Top 10 restaurants by score (high rating priority):")
-        for i, restaurant in enumerate(top_candidates[:10]):
-            score = restaurant.get('total_score', 0)
-            match_score = restaurant.get('match_score', 0)
-            rating = restaurant.get('rating', 'N/A')
-            print(f"  {i+1}. {restaurant.get('name', 'Unknown')} | Score: {score} (Match: {match_score}, Rating: {rating})")
+        if debug_enabled():
+            search_logger.debug("Top 10 restaurants by score (high rating priority):")
+            for i, restaurant in enumerate(top_candidates[:10]):
+                score = restaurant.get('total_score', 0)
+                match_score = restaurant.get('match_score', 0)
+                rating = restaurant.get('rating', 'N/A')
+                search_logger.debug(f"  {i+1}. {restaurant.get('name', 'Unknown')} | Score: {score} (Match: {match_score}, Rating: {rating})")
         
         return top_candidates
     
+    @staticmethod
+    def _push_bounded(heap: List[Tuple[float, int, Dict[str, Any]]], size: int, entry: Tuple[float, int, Dict[str, Any]]) -> None:
+        """最小ヒープに要素を追加し、上位 size 件だけを残す"""
+        if len(heap) < size:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    
+    def _calculate_total_score(self, restaurant: Dict[str, Any]) -> float:
+        """マッチスコア・評価・ソースから総合スコアを計算"""
+        total_score = 0.0
+        
+        # マッチスコア（重み：50%）
+        match_score = restaurant.get('match_score', 0)
+        total_score += match_score * 0.5
+        
+        # 評価スコア（重み：50%）- 評価を重視
+        rating = restaurant.get('rating', 0)
+        if rating and rating > 0:
+            # 5点満点の評価を100点満点に変換
+            rating_score = (rating / 5.0) * 100
+            total_score += rating_score * 0.5
+            
+            # 高評価ボーナス
+            if rating >= 4.5:
+                total_score += 15.0  # 4.5以上は特別ボーナス
+            elif rating >= 4.0:
+                total_score += 10.0  # 4.0以上はボーナス
+            elif rating >= 3.5:
+                total_score += 5.0   # 3.5以上は軽微なボーナス
+        else:
+            # 評価がない場合は平均的な評価として扱う
+            total_score += 60 * 0.5  # 平均的な評価（3.0/5.0相当）
+        
+        # ソース別のボーナス（信頼性を考慮）
+        source = restaurant.get('source', '')
+        if source == 'hotpepper':
+            total_score += 5.0  # API結果は信頼性が高い
+        elif source == 'tabelog':
+            total_score += 3.0
+        else:
+            total_score += 0.0  # サンプルデータは追加ボーナスなし
+        
+        return round(total_score, 1)
+    
     def _get_sample_restaurants(self, search_params: Dict[str, Any], seen_ids: set) -> List[Dict[str, Any]]:
         """サンプルレストランデータの生成"""
         location = search_params.get('location', '東京')
@@ -805,262 +1244,593 @@ class RestaurantSearchService:
         # スコア順にソート
         filtered_restaurants.sort(key=lambda x: x.get('match_score', 0), reverse=True)
         
-        print(f"[SAMPLE] Found {len(filtered_restaurants)} matching restaurants")
+        search_logger.info(f"Sample data: found {len(filtered_restaurants)} matching restaurants")
         return filtered_restaurants  # 制限なし
     
     def _search_hotpepper(self, search_params: Dict[str, Any], seen_ids: set) -> List[Dict[str, Any]]:
         """ホットペッパーAPI検索"""
+        return drain_generator(self._iter_search_hotpepper(search_params, seen_ids))
+    
+    def _iter_search_hotpepper(self, search_params: Dict[str, Any], seen_ids: set) -> Generator[Dict[str, Any], None, List[Dict[str, Any]]]:
+        """ホットペッパーAPI検索（ページごとにスコア付きレストランをyield）"""
         if not self.hotpepper_api_key:
-            print("[HOTPEPPER] API key not configured")
+            hotpepper_logger.warning("API key not configured")
             return []
         
         try:
-            # API リクエストパラメータの構築
-            params = {
-                'key': self.hotpepper_api_key,
-                'format': 'json',
-                'count': 100,  # より多くの結果を取得（APIの最大値）
-            }
-            
-            # 地域の設定（段階的に検索）
-            location = search_params.get('location')
-            search_attempts = []
-            
-            if location and location in Config.HOTPEPPER_AREA_CODES:
-                # 1回目：中エリア指定
-                params['middle_area'] = Config.HOTPEPPER_AREA_CODES[location]
-                print(f"[HOTPEPPER] Area: {location} -> {params['middle_area']}")
-                search_attempts.append(('middle_area', params['middle_area']))
-            elif location:
-                # エリアコードにない場合はキーワード検索
-                params['keyword'] = location
-                print(f"[HOTPEPPER] Using keyword search for location: {location}")
-                search_attempts.append(('keyword', location))
-            
-            # 料理ジャンルの設定
-            cuisine = search_params.get('cuisine')
-            if cuisine and cuisine in Config.HOTPEPPER_GENRE_CODES:
-                params['genre'] = Config.HOTPEPPER_GENRE_CODES[cuisine]
-                print(f"[HOTPEPPER] Genre: {cuisine} -> {params['genre']}")
-            elif cuisine:
-                # ジャンルコードにない場合はキーワードに追加
-                existing_keyword = params.get('keyword', '')
-                params['keyword'] = f"{existing_keyword} {cuisine}".strip()
-                print(f"[HOTPEPPER] Using keyword search for cuisine: {cuisine}")
-            
-            # デバッグ：フレンチの場合は一時的にキーワード検索を使用
-            if cuisine == 'フレンチ':
-                if 'genre' in params:
-                    del params['genre']
-                existing_keyword = params.get('keyword', '')
-                params['keyword'] = f"{existing_keyword} フレンチ".strip()
-                print(f"[HOTPEPPER] DEBUG: Using keyword search for French cuisine")
-            
-            # 予算の設定
-            budget = search_params.get('budget')
-            if budget:
-                if budget == 'low':
-                    params['budget'] = 'B005'  # ~2000円
-                elif budget == 'medium':
-                    params['budget'] = 'B003'  # 3000~4000円
-                elif budget == 'high':
-                    params['budget'] = 'B001'  # 4000円~
+            params, location = self._build_hotpepper_params(search_params)
+            planner = self._create_page_planner(search_params)
             
             # 段階的検索の実行
             restaurants = []
-            all_shops = []
+            total_shop_count = 0
             
-            # 複数ページの結果を取得
-            max_pages = 3  # 最大3ページ分取得
-            for page in range(max_pages):
-                page_params = params.copy()
-                page_params['start'] = page * 100 + 1  # 開始位置を設定
-                
-                print(f"[HOTPEPPER] Request params (page {page + 1}): {page_params}")
-                
-                response = requests.get(self.hotpepper_api, params=page_params, timeout=Config.REQUEST_TIMEOUT)
-                print(f"[HOTPEPPER] Page {page + 1} response status: {response.status_code}")
-                
-                if response.status_code != 200:
-                    print(f"[HOTPEPPER] HTTP Error on page {page + 1}: {response.status_code} - {response.text}")
-                    if page == 0:  # 1ページ目が失敗した場合のみエラー
-                        return []
-                    else:
-                        break  # 2ページ目以降の失敗は継続
-                
-                data = response.json()
-                results = data.get('results', {})
-                shops = results.get('shop', [])
-                available_count = results.get('results_available', 0)
-                
-                print(f"[HOTPEPPER] Page {page + 1} - Raw shop count: {len(shops)}")
-                print(f"  - Available count: {available_count}")
-                print(f"  - Returned count: {results.get('results_returned', 'N/A')}")
-                print(f"  - Start position: {results.get('results_start', 'N/A')}")
-                
-                if page == 0 and shops:
-                    # 最初の5件の詳細情報を表示
-                    print(f"[HOTPEPPER] First 5 shops detailed info:")
-                    for i, shop in enumerate(shops[:5]):
-                        shop_name = shop.get('name', 'Unknown')
-                        shop_genre = shop.get('genre', {})
-                        genre_code = shop_genre.get('code', 'N/A')
-                        genre_name = shop_genre.get('name', 'N/A')
-                        
-                        # 評価関連のフィールドをチェック
-                        rating_fields = ['rating', 'score', 'evaluation', 'review', 'stars']
-                        rating_info = []
-                        for field in rating_fields:
-                            if field in shop and shop[field]:
-                                rating_info.append(f"{field}: {shop[field]}")
-                        
-                        rating_str = ', '.join(rating_info) if rating_info else 'No rating fields'
-                        print(f"  {i+1}. {shop_name} | {genre_code}: {genre_name} | {rating_str}")
-                        
-                        # 全フィールド一覧を表示（デバッグ用）
-                        if i == 0:  # 最初の店舗のみ
-                            print(f"    Available fields: {list(shop.keys())}")
-                
-                all_shops.extend(shops)
+            for label, shops, replaces_previous in self._iter_hotpepper_shop_batches(params, location, planner):
+                if replaces_previous:
+                    # フォールバック結果で置き換える場合はそれまでの結果を破棄
+                    for restaurant in restaurants:
+                        seen_ids.discard(restaurant['id'])
+                    restaurants = []
+                    total_shop_count = 0
                 
+                total_shop_count += len(shops)
+                page_restaurants = self._restaurants_from_shops(shops, search_params, seen_ids)
+                restaurants.extend(page_restaurants)
+                planner.record_page(len(shops), page_restaurants)
+                yield {
+                    'source': 'hotpepper',
+                    'label': label,
+                    'replaces_previous': replaces_previous,
+                    'restaurants': page_restaurants
+                }
+            
+            return self._finish_hotpepper_results(restaurants, total_shop_count)
+            
+        except Exception as e:
+            hotpepper_logger.exception(f"Unexpected error: {describe_error(e)}")
+            return []
+    
+    def _restaurants_from_shops(self, shops: List[Dict[str, Any]], search_params: Dict[str, Any], seen_ids: set) -> List[RestaurantRecord]:
+        """1ページ分の店舗を絞り込み、スコア付きのレストラン情報に変換"""
+        accepted_shops = [shop for shop in shops if self._accept_hotpepper_shop(shop, search_params, seen_ids)]
+        
+        # マッチスコアと推定評価はページ単位でまとめて計算
+        with STAGE_DURATION.time(stage='scoring'):
+            match_scores, ratings = self._score_shops_batch(accepted_shops, search_params)
+        return [
+            self._build_hotpepper_restaurant(shop, match_score, rating)
+            for shop, match_score, rating in zip(accepted_shops, match_scores, ratings)
+        ]
+    
+    def _create_page_planner(self, search_params: Dict[str, Any]) -> RankingPagePlanner:
+        """上位候補の選び方に合わせたページ取得の計画"""
+        return RankingPagePlanner(
+            self._calculate_total_score,
+            self._hotpepper_score_bound(search_params),
+            Config.HOTPEPPER_PAGE_SIZE,
+            Config.HOTPEPPER_MAX_PAGES,
+            TOP_RESTAURANTS_LIMIT,
+            HIGH_RATED_QUOTA
+        )
+    
+    def _hotpepper_score_bound(self, search_params: Dict[str, Any]) -> Tuple[float, float]:
+        """この検索条件でホットペッパーの店舗が取り得る (総合スコア, 推定評価) の上限"""
+        category = search_params.get('category', '')
+        budget = search_params.get('budget', '')
+        match_score = self._match_score_for_features(
+            bool(search_params.get('cuisine', '')),
+            2 if search_params.get('location', '') else 0,
+            bool(category) and bool(CATEGORY_SCORE_KEYWORDS.get(category)),
+            bool(budget) and bool(BUDGET_SCORE_KEYWORDS.get(budget)),
+            (True, True, True, True)
+        )
+        rating = self._rating_for_features((True,) * 7, 2, True, True, 3, True)
+        total_score = self._calculate_total_score({'match_score': match_score, 'rating': rating, 'source': 'hotpepper'})
+        return total_score, rating
+    
+    @staticmethod
+    def _finish_hotpepper_results(restaurants: List[RestaurantRecord], total_shop_count: int) -> List[RestaurantRecord]:
+        hotpepper_logger.info(f"Total shop count from all pages: {total_shop_count}")
+        hotpepper_logger.info(f"After genre filtering: {len(restaurants)} restaurants")
+        
+        # マッチスコア順にソート
+        restaurants.sort(key=lambda x: x.get('match_score', 0), reverse=True)
+        
+        hotpepper_logger.info(f"Found {len(restaurants)} restaurants")
+        return restaurants
+    
+    def _build_hotpepper_params(self, search_params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """検索条件からグルメサーチAPIのパラメータを組み立てる（(パラメータ, 地域名) を返す）"""
+        # API リクエストパラメータの構築
+        params = {
+            'key': self.hotpepper_api_key,
+            'format': 'json',
+            'count': Config.HOTPEPPER_PAGE_SIZE,  # より多くの結果を取得（APIの最大値）
+        }
+        
+        # 地域の設定（段階的に検索）
+        location = search_params.get('location')
+        search_attempts = []
+        
+        if location and location in Config.HOTPEPPER_AREA_CODES:
+            # 1回目：中エリア指定
+            params['middle_area'] = Config.HOTPEPPER_AREA_CODES[location]
+            hotpepper_logger.info(f"Area: {location} -> {params['middle_area']}")
+            search_attempts.append(('middle_area', params['middle_area']))
+        elif location:
+            # エリアコードにない場合はキーワード検索
+            params['keyword'] = location
+            hotpepper_logger.info(f"Using keyword search for location: {location}")
+            search_attempts.append(('keyword', location))
+        
+        # 料理ジャンルの設定
+        cuisine = search_params.get('cuisine')
+        if cuisine and cuisine in Config.HOTPEPPER_GENRE_CODES:
+            params['genre'] = Config.HOTPEPPER_GENRE_CODES[cuisine]
+            hotpepper_logger.info(f"Genre: {cuisine} -> {params['genre']}")
+        elif cuisine:
+            # ジャンルコードにない場合はキーワードに追加
+            existing_keyword = params.get('keyword', '')
+            params['keyword'] = f"{existing_keyword} {cuisine}".strip()
+            hotpepper_logger.info(f"Using keyword search for cuisine: {cuisine}")
+        
+        # デバッグ：フレンチの場合は一時的にキーワード検索を使用
+        if cuisine == 'フレンチ':
+            if 'genre' in params:
+                del params['genre']
+            existing_keyword = params.get('keyword', '')
+            params['keyword'] = f"{existing_keyword} フレンチ".strip()
+            hotpepper_logger.debug("Using keyword search for French cuisine")
+        
+        # 予算の設定
+        budget = search_params.get('budget')
+        if budget:
+            if budget == 'low':
+                params['budget'] = 'B005'  # ~2000円
+            elif budget == 'medium':
+                params['budget'] = 'B003'  # 3000~4000円
+            elif budget == 'high':
+                params['budget'] = 'B001'  # 4000円~
+        
+        return params, location
+    
+    def _accept_hotpepper_shop(self, shop: Dict[str, Any], search_params: Dict[str, Any], seen_ids: set) -> bool:
+        """重複とジャンル不一致を除外し、採用する店舗のIDを seen_ids に登録"""
+        restaurant_id = f"hotpepper_{shop.get('id')}"
+        
+        if restaurant_id in seen_ids:
+            return False
+        
+        # 料理ジャンル情報を取得
+        shop_genre = shop.get('genre', {}).get('name', '')
+        shop_genre_code = shop.get('genre', {}).get('code', '')
+        cuisine = search_params.get('cuisine', '')
+        
+        hotpepper_logger.debug("Shop: %s | Genre: %s (%s)", shop.get('name', ''), shop_genre, shop_genre_code)
+        
+        # ジャンルフィルタリング：指定したジャンルと一致するかチェック
+        if cuisine:
+            # 指定したジャンルコードと一致するかチェック
+            expected_genre_code = Config.HOTPEPPER_GENRE_CODES.get(cuisine)
+            if expected_genre_code and shop_genre_code != expected_genre_code:
+                # ジャンル名での部分マッチもチェック
+                if cuisine not in shop_genre and shop_genre not in cuisine:
+                    hotpepper_logger.debug("Filtered out: expected %s (%s), got %s (%s)", cuisine, expected_genre_code, shop_genre, shop_genre_code)
+                    # ジャンルが一致しない場合はスキップ
+                    return False
+        
+        seen_ids.add(restaurant_id)
+        return True
+    
+    def _build_hotpepper_restaurant(self, shop: Dict[str, Any], match_score: float, rating: float) -> RestaurantRecord:
+        """ホットペッパーの店舗データをレストラン情報に変換"""
+        shop_genre = shop.get('genre', {}).get('name', '')
+        
+        # 地域情報を取得
+        shop_area = shop.get('middle_area', {}).get('name', '')
+        
+        # 特徴の追加
+        features = []
+        if shop.get('private_room', '') == 'あり':
+            features.append('個室あり')
+        if shop.get('parking', '') == 'あり':
+            features.append('駐車場')
+        if shop.get('card', '') == '利用可':
+            features.append('クレジット可')
+        if shop.get('non_smoking', '') == '全面禁煙':
+            features.append('禁煙')
+        
+        restaurant = RestaurantRecord(
+            id=f"hotpepper_{shop.get('id')}",
+            name=shop.get('name', ''),
+            cuisine=shop_genre,
+            location=shop_area,
+            address=shop.get('address', ''),
+            phone=shop.get('tel', ''),
+            rating=rating,  # 店舗データから推定した評価
+            price_range=shop.get('budget', {}).get('name', ''),
+            description=shop.get('catch', ''),
+            image=shop.get('photo', {}).get('pc', {}).get('l', ''),
+            features=tuple(features),
+            match_score=match_score,
+            source='hotpepper'
+        )
+        
+        hotpepper_logger.debug("Added: %s | Genre: %s", shop.get('name', ''), shop_genre)
+        return restaurant
+    
+    def _iter_hotpepper_shop_batches(self, params: Dict[str, Any], location: Optional[str],
+                                     planner: RankingPagePlanner) -> Iterator[Tuple[str, List[Dict[str, Any]], bool]]:
+        """ホットペッパーAPIから複数ページ（＋フォールバック）を並列取得
+
+        (ラベル, 店舗リスト, それまでの結果を置き換えるか) をページ順にyieldする。
+        呼び出し元はyieldされたページの採用結果を planner に記録し、続けて取得するページ数は
+        その時点の planner の判断（上位候補が確定したか・埋まっていないか）で決める。
+        呼び出し制御の順番待ちは、検索の締め切り（HOTPEPPER_SEARCH_DEADLINE）まで打ち切らずに待つ。
+        """
+        deadline = time.monotonic() + Config.HOTPEPPER_SEARCH_DEADLINE
+        # 1ページ目：results_available から取得できるページ数とフォールバック要否を判断
+        try:
+            first_results = self._fetch_hotpepper_page(self._hotpepper_page_params(params, 0), 'page 1', deadline)
+        except RateLimitExceeded:
+            self._record_first_page_shed()
+            first_results = None
+        if first_results is None:
+            return  # 1ページ目が失敗した場合のみエラー
+
+        first_shops = first_results.get('shop', [])
+        available_count = first_results.get('results_available', 0)
+        pages, fallback_params = self._plan_hotpepper_requests(params, location, first_results)
+        total_pages = len(pages) + 1
+
+        # フォールバック検索（1ページ目で結果が少ない場合）は並行して実行
+        fallback_future = None
+        if fallback_params is not None:
+            fallback_future = submit_in_context(
+                self._hotpepper_executor, self._fetch_hotpepper_page, fallback_params, 'fallback', deadline
+            )
+
+        page_futures: Dict[int, Future] = {}
+        try:
+            # ページ順にマージ（失敗したページはスキップし、成功したページは残す）
+            yield 'page 1', first_shops, False
+            shop_count = len(first_shops)
+            for page in pages:
+                # 必要なページ数まで先に取得を始めておく
+                page_limit = self._hotpepper_page_limit(planner, page, total_pages)
+                if page >= page_limit:
+                    break
+                for ahead in range(page, page_limit):
+                    if ahead not in page_futures:
+                        page_futures[ahead] = submit_in_context(
+                            self._hotpepper_executor, self._fetch_hotpepper_page,
+                            self._hotpepper_page_params(params, ahead), f"page {ahead + 1}", deadline
+                        )
+
+                try:
+                    page_results = page_futures.pop(page).result()
+                except RateLimitExceeded:
+                    # 間のページを欠いたまま続けないよう、打ち切られたページ以降は取得しない
+                    self._record_partial_search(f"page {page + 1}")
+                    break
+                except Exception as e:
+                    hotpepper_logger.error(f"Page {page + 1} unexpected error: {describe_error(e)}")
+                    page_results = None
+
+                if page_results is None:
+                    continue  # 2ページ目以降の失敗は継続
+
+                shops = page_results.get('shop', [])
+                shop_count += len(shops)
+                yield f"page {page + 1}", shops, False
+
                 # これ以上結果がない場合は終了
-                if len(shops) == 0 or len(all_shops) >= available_count:
+                if len(shops) == 0 or shop_count >= available_count:
                     break
-            
-            # フォールバック検索（1ページ目で結果が少ない場合）
-            if len(all_shops) < 5 and location:
-                print("[HOTPEPPER] Few results in 1st attempt, trying broader search...")
-                
-                # 2回目：キーワード検索で再試行
-                fallback_params = params.copy()
-                fallback_params['start'] = 1
-                
-                # middle_areaを削除してキーワード検索に変更
-                if 'middle_area' in fallback_params:
-                    del fallback_params['middle_area']
-                fallback_params['keyword'] = location
-                
-                print(f"[HOTPEPPER] Request params (fallback): {fallback_params}")
-                
-                fallback_response = requests.get(self.hotpepper_api, params=fallback_params, timeout=Config.REQUEST_TIMEOUT)
-                if fallback_response.status_code == 200:
-                    fallback_data = fallback_response.json()
-                    fallback_results = fallback_data.get('results', {})
+
+            if fallback_future is not None:
+                try:
+                    fallback_results = fallback_future.result()
+                except RateLimitExceeded:
+                    self._record_partial_search('fallback')
+                    fallback_results = None
+                except Exception as e:
+                    hotpepper_logger.error(f"Fallback unexpected error: {describe_error(e)}")
+                    fallback_results = None
+
+                if fallback_results is not None:
                     fallback_shops = fallback_results.get('shop', [])
-                    print(f"[HOTPEPPER] Fallback - Raw shop count: {len(fallback_shops)}")
-                    
+                    hotpepper_logger.info(f"Fallback - Raw shop count: {len(fallback_shops)}")
+
                     # より多くの結果が得られた場合は2回目の結果を使用
-                    if len(fallback_shops) > len(all_shops):
-                        all_shops = fallback_shops
-                        print("[HOTPEPPER] Using fallback results")
-            
-            print(f"[HOTPEPPER] Total shop count from all pages: {len(all_shops)}")
-            
-            for shop in all_shops:
-                restaurant_id = f"hotpepper_{shop.get('id')}"
-                
-                if restaurant_id not in seen_ids:
-                    # 料理ジャンル情報を取得
-                    shop_genre = shop.get('genre', {}).get('name', '')
-                    shop_genre_code = shop.get('genre', {}).get('code', '')
-                    cuisine = search_params.get('cuisine', '')
-                    
-                    print(f"[HOTPEPPER] Shop: {shop.get('name', '')} | Genre: {shop_genre} ({shop_genre_code})")
-                    
-                    # ジャンルフィルタリング：指定したジャンルと一致するかチェック
-                    genre_match = True
-                    if cuisine:
-                        # 指定したジャンルコードと一致するかチェック
-                        expected_genre_code = Config.HOTPEPPER_GENRE_CODES.get(cuisine)
-                        if expected_genre_code and shop_genre_code != expected_genre_code:
-                            # ジャンル名での部分マッチもチェック
-                            if cuisine not in shop_genre and shop_genre not in cuisine:
-                                genre_match = False
-                                print(f"[HOTPEPPER] FILTERED OUT: Expected {cuisine} ({expected_genre_code}), got {shop_genre} ({shop_genre_code})")
-                    
-                    # ジャンルが一致しない場合はスキップ
-                    if not genre_match:
-                        continue
-                    
-                    # マッチスコア計算
-                    match_score = self._calculate_match_score(shop, search_params)
-                    
-                    # 地域情報を取得
-                    shop_area = shop.get('middle_area', {}).get('name', '')
-                    
-                    restaurant = {
-                        'id': restaurant_id,
-                        'name': shop.get('name', ''),
-                        'cuisine': shop_genre,
-                        'location': shop_area,
-                        'address': shop.get('address', ''),
-                        'phone': shop.get('tel', ''),
-                        'rating': self._estimate_rating_from_shop_data(shop),  # 店舗データから評価を推定
-                        'price_range': shop.get('budget', {}).get('name', ''),
-                        'description': shop.get('catch', ''),
-                        'image': shop.get('photo', {}).get('pc', {}).get('l', ''),
-                        'features': [],
-                        'match_score': match_score,
-                        'source': 'hotpepper'
-                    }
-                    
-                    # 特徴の追加
-                    if shop.get('private_room', '') == 'あり':
-                        restaurant['features'].append('個室あり')
-                    if shop.get('parking', '') == 'あり':
-                        restaurant['features'].append('駐車場')
-                    if shop.get('card', '') == '利用可':
-                        restaurant['features'].append('クレジット可')
-                    if shop.get('non_smoking', '') == '全面禁煙':
-                        restaurant['features'].append('禁煙')
-                    
-                    restaurants.append(restaurant)
-                    seen_ids.add(restaurant_id)
-                    print(f"[HOTPEPPER] ADDED: {shop.get('name', '')} | Genre: {shop_genre}")
-            
-            print(f"[HOTPEPPER] After genre filtering: {len(restaurants)} restaurants")
-            
-            # マッチスコア順にソート
-            restaurants.sort(key=lambda x: x.get('match_score', 0), reverse=True)
-            
-            print(f"[HOTPEPPER] Found {len(restaurants)} restaurants")
-            return restaurants
-            
-        except requests.RequestException as e:
-            print(f"[HOTPEPPER] API request error: {e}")
-            if hasattr(e, 'response') and e.response:
-                print(f"[HOTPEPPER] Response status: {e.response.status_code}")
-                print(f"[HOTPEPPER] Response text: {e.response.text}")
-            return []
-        except json.JSONDecodeError as e:
-            print(f"[HOTPEPPER] JSON decode error: {e}")
-            print(f"[HOTPEPPER] Response text: {response.text}")
-            return []
+                    if len(fallback_shops) > shop_count:
+                        hotpepper_logger.info("Using fallback results")
+                        yield 'fallback', fallback_shops, True
+        finally:
+            # 不要になった先読みはまだ始まっていなければ取り消す（取得中のものはキャッシュに入る）
+            for future in page_futures.values():
+                future.cancel()
+
+    @staticmethod
+    def _record_partial_search(label: str) -> None:
+        """呼び出し制御で打ち切られたページがあり、検索結果が一部だけになったことを記録"""
+        hotpepper_logger.warning(f"Partial search: {label} was shed by the rate limiter, skipping remaining pages")
+        HOTPEPPER_PAGING_TOTAL.inc(decision='rate_limited')
+
+    @staticmethod
+    def _record_first_page_shed() -> None:
+        """1ページ目が呼び出し制御で打ち切られ、ホットペッパーの結果なし（サンプルデータで補完）になったことを記録"""
+        hotpepper_logger.warning("Page 1 was shed by the rate limiter, no HotPepper results (sample data will be used)")
+        HOTPEPPER_PAGING_TOTAL.inc(decision='first_page_shed')
+
+    @staticmethod
+    def _hotpepper_page_limit(planner: RankingPagePlanner, next_page: int, total_pages: int) -> int:
+        """planner の判断で取得するページ数を決め、打ち切り・延長をログとメトリクスに記録"""
+        page_limit = planner.page_limit(next_page, total_pages)
+        if page_limit <= next_page and planner.settled() and next_page < min(Config.HOTPEPPER_MAX_PAGES, total_pages):
+            hotpepper_logger.info(
+                f"Top {TOP_RESTAURANTS_LIMIT} settled after {next_page} page(s) "
+                f"({planner.kept_count}/{planner.shop_count} shops kept), skipping remaining pages"
+            )
+            HOTPEPPER_PAGING_TOTAL.inc(decision='early_stop')
+        elif page_limit > Config.HOTPEPPER_MAX_PAGES and not planner.extended:
+            planner.extended = True
+            hotpepper_logger.info(
+                f"Genre filter pass rate {planner.pass_rate:.2f} ({planner.kept_count} kept), "
+                f"extending to {page_limit} page(s)"
+            )
+            HOTPEPPER_PAGING_TOTAL.inc(decision='extended')
+        return page_limit
+
+    @staticmethod
+    def _hotpepper_page_params(params: Dict[str, Any], page: int) -> Dict[str, Any]:
+        """page ページ目（0始まり）を取得するパラメータ"""
+        page_params = params.copy()
+        page_params['start'] = page * params.get('count', Config.HOTPEPPER_PAGE_SIZE) + 1  # 開始位置を設定
+        return page_params
+
+    def _plan_hotpepper_requests(self, params: Dict[str, Any], location: Optional[str],
+                                 first_results: Dict[str, Any]) -> Tuple[List[int], Optional[Dict[str, Any]]]:
+        """1ページ目の結果から、続けて取得できるページ番号とフォールバック検索のパラメータを決める"""
+        page_size = params.get('count', Config.HOTPEPPER_PAGE_SIZE)
+        first_shops = first_results.get('shop', [])
+        available_count = first_results.get('results_available', 0)
+
+        if first_shops and debug_enabled():
+            self._log_first_shops(first_shops)
+
+        # 取得できるページ（実際に取得するかはページごとに RankingPagePlanner が決める）
+        pages: List[int] = []
+        if first_shops and len(first_shops) < available_count:
+            max_pages = max(Config.HOTPEPPER_MAX_PAGES, Config.HOTPEPPER_PREFETCH_MAX_PAGES)
+            total_pages = min(max_pages, -(-available_count // page_size))
+            pages = list(range(1, total_pages))
+
+        fallback_params = None
+        if available_count < 5 and location:
+            hotpepper_logger.info("Few results in 1st attempt, trying broader search...")
+
+            # 2回目：キーワード検索で再試行
+            fallback_params = params.copy()
+            fallback_params['start'] = 1
+
+            # middle_areaを削除してキーワード検索に変更
+            if 'middle_area' in fallback_params:
+                del fallback_params['middle_area']
+            fallback_params['keyword'] = location
+        return pages, fallback_params
+
+    @staticmethod
+    def _log_first_shops(first_shops: List[Dict[str, Any]]) -> None:
+        """最初の5件の詳細情報をDEBUGログに出力"""
+        hotpepper_logger.debug("First 5 shops detailed info:")
+        for i, shop in enumerate(first_shops[:5]):
+            shop_name = shop.get('name', 'Unknown')
+            shop_genre = shop.get('genre', {})
+            genre_code = shop_genre.get('code', 'N/A')
+            genre_name = shop_genre.get('name', 'N/A')
+
+            # 評価関連のフィールドをチェック
+            rating_fields = ['rating', 'score', 'evaluation', 'review', 'stars']
+            rating_info = []
+            for field in rating_fields:
+                if field in shop and shop[field]:
+                    rating_info.append(f"{field}: {shop[field]}")
+
+            rating_str = ', '.join(rating_info) if rating_info else 'No rating fields'
+            hotpepper_logger.debug(f"  {i+1}. {shop_name} | {genre_code}: {genre_name} | {rating_str}")
+
+            # 全フィールド一覧を表示（デバッグ用）
+            if i == 0:  # 最初の店舗のみ
+                hotpepper_logger.debug(f"    Available fields: {list(shop.keys())}")
+
+    @staticmethod
+    def _hotpepper_cache_key(page_params: Dict[str, Any]) -> tuple:
+        """グルメサーチのキャッシュキー（APIキーを除いた正規化済みパラメータ）"""
+        keyword = page_params.get('keyword')
+        if keyword:
+            keyword = ' '.join(keyword.split())
+        return (
+            page_params.get('middle_area'),
+            page_params.get('genre'),
+            keyword or None,
+            page_params.get('budget'),
+            int(page_params.get('start', 1))
+        )
+
+    def _search_local_store(self, page_params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """中エリア指定の検索をローカルストアから返す（未取得・期限切れ・キーワード検索はNone）"""
+        if self.shop_store is None:
+            return None
+        
+        middle_area = page_params.get('middle_area')
+        if not middle_area or page_params.get('keyword') or not self.shop_store.is_fresh(middle_area):
+            return None
+        
+        try:
+            return self.shop_store.search(
+                middle_area,
+                genre=page_params.get('genre'),
+                budget=page_params.get('budget'),
+                start=int(page_params.get('start', 1)),
+                count=int(page_params.get('count', Config.HOTPEPPER_PAGE_SIZE))
+            )
         except Exception as e:
-            print(f"[HOTPEPPER] Unexpected error: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+            hotpepper_logger.warning(f"Local store error: {e}")
+            return None
+    
+    def _fetch_hotpepper_page(self, page_params: Dict[str, Any], label: str,
+                              deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """ホットペッパーAPIの1リクエスト分を取得（失敗時はNone、呼び出し制御で打ち切られた場合は RateLimitExceeded）
+
+        deadline: 呼び出し制御の順番待ちをやめる時刻（time.monotonic() 基準、検索の締め切り）
+        """
+        stage = 'hotpepper_fallback' if label == 'fallback' else 'hotpepper_page'
+        with STAGE_DURATION.time(stage=stage, target=label):
+            return self._request_hotpepper_page(page_params, label, deadline)
     
+    def _request_hotpepper_page(self, page_params: Dict[str, Any], label: str,
+                                deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+        cache_key, stored = self._lookup_hotpepper_page(page_params, label)
+        if stored is not None:
+            return stored
+        
+        # 同じページを取得中の検索があればその応答を共有する
+        return self._hotpepper_page_flight.do(
+            cache_key, lambda: self._download_hotpepper_page(page_params, cache_key, label, deadline)
+        )
+    
+    def _download_hotpepper_page(self, page_params: Dict[str, Any], cache_key: tuple, label: str,
+                                 deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            self.hotpepper_scheduler.acquire(self._hotpepper_page_priority(label), deadline)
+        except RateLimitExceeded as e:
+            hotpepper_logger.warning(f"Skipped {label}: {e}")
+            raise
+        
+        hotpepper_logger.info(f"Request params ({label}): {mask_secrets(page_params)}")
+
+        try:
+            response = self.http.get(self.hotpepper_api, params=page_params, timeout=Config.REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            hotpepper_logger.error(f"API request error on {label}: {describe_error(e)}")
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='hotpepper', status='timeout' if isinstance(e, requests.Timeout) else 'connection')
+            return None
+
+        return self._handle_hotpepper_response(response, cache_key, label)
+
+    @staticmethod
+    def _hotpepper_page_priority(label: str) -> Priority:
+        """1ページ目はユーザーが待っている呼び出し、2ページ目以降・フォールバックは先読み"""
+        return Priority.INTERACTIVE if label == 'page 1' else Priority.SPECULATIVE
+
+    def _lookup_hotpepper_page(self, page_params: Dict[str, Any], label: str) -> Tuple[tuple, Optional[Dict[str, Any]]]:
+        """応答キャッシュとローカルストアを参照（(キャッシュキー, 結果またはNone) を返す）"""
+        cache_key = self._hotpepper_cache_key(page_params)
+        cached = self.hotpepper_cache.get(cache_key)
+        CACHE_REQUESTS_TOTAL.inc(cache='hotpepper', result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            hotpepper_logger.info(f"Cache hit ({label}): {cache_key}")
+            return cache_key, cached
+
+        # ローカルストアで取得済み・鮮度十分なエリアはAPIを呼ばずに応答
+        local_results = self._search_local_store(page_params)
+        if self.shop_store is not None:
+            CACHE_REQUESTS_TOTAL.inc(cache='local_store', result='hit' if local_results is not None else 'miss')
+        if local_results is not None:
+            hotpepper_logger.info(f"Served from local store ({label}): {cache_key}")
+            return cache_key, self._compact_results(local_results)
+        return cache_key, None
+
+    def _handle_hotpepper_response(self, response: Any, cache_key: tuple, label: str) -> Optional[Dict[str, Any]]:
+        """グルメサーチAPIの応答を検証してキャッシュに保存（失敗時はNone）
+
+        response は requests / httpx どちらのレスポンスでもよい（status_code / text / json() を使用）。
+        """
+        hotpepper_logger.debug("%s response status: %s", label, response.status_code)
+
+        if response.status_code != 200:
+            hotpepper_logger.error(f"HTTP Error on {label}: {response.status_code} - {response.text}")
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='hotpepper', status=response.status_code)
+            return None
+
+        try:
+            data = response.json()
+        except json.JSONDecodeError as e:
+            hotpepper_logger.error(f"JSON decode error on {label}: {e}")
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='hotpepper', status='invalid_response')
+            hotpepper_logger.debug("Response text: %s", response.text)
+            return None
+
+        results = data.get('results', {})
+        hotpepper_logger.info(
+            f"{label} fetched",
+            extra={'data': {
+                'shop_count': len(results.get('shop', [])),
+                'available': results.get('results_available', 0),
+                'returned': results.get('results_returned', 'N/A'),
+                'start': results.get('results_start', 'N/A')
+            }}
+        )
+
+        # エラー応答（results.error）はキャッシュしない
+        if 'error' in results:
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='hotpepper', status='api_error')
+        else:
+            results = self._compact_results(results)
+            self.hotpepper_cache.set(cache_key, results, size=len(json.dumps(results, ensure_ascii=False).encode('utf-8')))
+        return results
+
+    @staticmethod
+    def _compact_results(results: Dict[str, Any]) -> Dict[str, Any]:
+        """APIの results から店舗データを必要な項目だけに絞った複製を作る"""
+        compact = {key: value for key, value in results.items() if key != 'shop'}
+        compact['shop'] = [compact_shop(shop) for shop in results.get('shop', [])]
+        return compact
+
     def _search_tabelog(self, search_params: Dict[str, Any], seen_ids: set) -> List[Dict[str, Any]]:
         """食べログAPI検索（サンプル実装）"""
         if not self.tabelog_api_key:
-            print("[TABELOG] API key not configured")
+            search_logger.debug("Tabelog API key not configured")
             return []
         
         # 食べログAPIの実装は要確認
         # 実際のAPIエンドポイントとパラメータが不明なため、現在はサンプル実装
-        print("[TABELOG] API integration pending - sample data returned")
+        search_logger.info("Tabelog API integration pending - sample data returned")
         return []
     
     def get_restaurant_prices(self, restaurant_id: str) -> List[Dict[str, Any]]:
         """レストランの価格・予約情報を複数サイトから取得"""
         results = []
         
-        print(f"[PRICE] Getting restaurant prices for ID: {restaurant_id}", flush=True)
+        price_logger.info(f"Getting restaurant prices for ID: {restaurant_id}")
+        
+        # 全サイトを並列に問い合わせ、サイト別タイムアウトと全体の締め切りで打ち切る
+        started_at = time.monotonic()
+        overall_deadline = started_at + Config.PRICE_OVERALL_DEADLINE
+        futures = []
+        for site_name, price_function in self._price_sources():
+            price_logger.debug("Checking %s...", site_name)
+            futures.append((site_name, submit_in_context(self._price_executor, self._timed_price_lookup, site_name, price_function, restaurant_id)))
+        
+        for site_name, future in futures:
+            site_deadline = min(started_at + Config.PRICE_SITE_TIMEOUT, overall_deadline)
+            try:
+                result = future.result(timeout=max(0.0, site_deadline - time.monotonic()))
+                self._record_price_result(results, site_name, result)
+            except FuturesTimeoutError:
+                future.cancel()
+                results.append(self._price_timeout_result(site_name))
+            except Exception as e:
+                price_logger.error(f"{site_name} error: {describe_error(e)}")
+                UPSTREAM_ERRORS_TOTAL.inc(upstream=f"price:{site_name}", status='exception')
         
-        # 価格・予約サイト一覧
-        price_sources = [
+        self._log_price_summary(results)
+        return results
+    
+    def _price_sources(self) -> List[Tuple[str, Callable[[str], Optional[Dict[str, Any]]]]]:
+        """価格・予約サイト一覧"""
+        return [
             ("ぐるなび", self._get_gurunavi_price),
             ("ホットペッパー", self._get_hotpepper_price), 
             ("食べログ", self._get_tabelog_price),
@@ -1068,21 +1838,39 @@ class RestaurantSearchService:
             ("一休.com", self._get_ikyu_price),
             ("Yahoo!グルメ", self._get_yahoo_gourmet_price)
         ]
-        
-        for site_name, price_function in price_sources:
-            try:
-                print(f"[PRICE] Checking {site_name}...", flush=True)
-                result = price_function(restaurant_id)
-                if result:
-                    results.append(result)
-                    print(f"[PRICE] {site_name}: {result.get('price_info', 'N/A')}", flush=True)
-                else:
-                    print(f"[PRICE] {site_name}: No data", flush=True)
-            except Exception as e:
-                print(f"[PRICE] {site_name} error: {e}", flush=True)
-        
-        print(f"[PRICE] Price comparison completed: {len(results)} sites found", flush=True)
-        return results
+    
+    @staticmethod
+    def _record_price_result(results: List[Dict[str, Any]], site_name: str, result: Optional[Dict[str, Any]]) -> None:
+        if result:
+            results.append(result)
+            price_logger.info(f"{site_name}: {result.get('price_info', 'N/A')}")
+        else:
+            price_logger.info(f"{site_name}: No data")
+    
+    @staticmethod
+    def _price_timeout_result(site_name: str) -> Dict[str, Any]:
+        """締め切りまでに応答がなかったサイトの結果"""
+        price_logger.warning(f"{site_name}: Timed out")
+        UPSTREAM_ERRORS_TOTAL.inc(upstream=f"price:{site_name}", status='timeout')
+        return {
+            "site": site_name,
+            "price_info": None,
+            "reservation_available": False,
+            "url": "",
+            "features": [],
+            "timed_out": True
+        }
+    
+    @staticmethod
+    def _log_price_summary(results: List[Dict[str, Any]]) -> None:
+        timed_out_count = sum(1 for result in results if result.get('timed_out'))
+        price_logger.info(f"Price comparison completed: {len(results) - timed_out_count} sites found, {timed_out_count} timed out")
+    
+    def _timed_price_lookup(self, site_name: str, price_function: Callable[[str], Optional[Dict[str, Any]]],
+                            restaurant_id: str) -> Optional[Dict[str, Any]]:
+        """価格サイト1件の問い合わせ（所要時間をメトリクスに記録）"""
+        with STAGE_DURATION.time(stage='price_provider', target=site_name):
+            return price_function(restaurant_id)
     
     def _get_gurunavi_price(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
         """ぐるなび価格情報取得"""
@@ -1103,58 +1891,80 @@ class RestaurantSearchService:
                 "features": ["クーポンあり", "ネット予約", "コース料理"] if reservation_available else ["情報のみ"]
             }
         except Exception as e:
-            print(f"[ERROR] Gurunavi price error: {e}", flush=True)
+            price_logger.error(f"Gurunavi price error: {e}")
             return None
     
     def _get_hotpepper_price(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
         """ホットペッパー価格情報取得"""
         try:
             # ホットペッパーのレストランIDから実際の店舗情報を取得
-            if restaurant_id.startswith('hotpepper_'):
-                shop_id = restaurant_id.replace('hotpepper_', '')
+            params = self._hotpepper_price_params(restaurant_id)
+            if params is not None:
+                self.hotpepper_scheduler.acquire(Priority.INTERACTIVE)
+                response = self.http.get(self.hotpepper_api, params=params, timeout=Config.REQUEST_TIMEOUT)
+                response.raise_for_status()
                 
-                if self.hotpepper_api_key:
-                    # 実際のAPIリクエスト
-                    params = {
-                        'key': self.hotpepper_api_key,
-                        'id': shop_id,
-                        'format': 'json'
-                    }
-                    
-                    response = requests.get(self.hotpepper_api, params=params, timeout=Config.REQUEST_TIMEOUT)
-                    response.raise_for_status()
-                    
-                    data = response.json()
-                    shop = data.get('results', {}).get('shop', [])
-                    
-                    if shop:
-                        shop_data = shop[0] if isinstance(shop, list) else shop
-                        
-                        return {
-                            "site": "ホットペッパー",
-                            "price_info": shop_data.get('budget', {}).get('name', '価格情報なし'),
-                            "reservation_available": True,
-                            "url": shop_data.get('urls', {}).get('pc', ''),
-                            "features": ["即予約", "ポイント付与", "クーポン", "写真豊富"]
-                        }
-            
-            # フォールバック（サンプルデータ）
-            price_ranges = ["¥1,500-2,500", "¥2,500-3,500", "¥3,500-5,000", "¥5,000-7,000"]
-            restaurant_int = hash(restaurant_id) % len(price_ranges)
-            price_range = price_ranges[restaurant_int]
+                price = self._hotpepper_price_from_data(response.json())
+                if price is not None:
+                    return price
             
-            reservation_available = (hash(restaurant_id) % 10) > 1  # 90%の確率で予約可能
-            
-            return {
-                "site": "ホットペッパー",
-                "price_info": price_range,
-                "reservation_available": reservation_available,
-                "url": f"https://www.hotpepper.jp/strJ{restaurant_id}/",
-                "features": ["即予約", "ポイント付与", "クーポン"] if reservation_available else ["情報のみ"]
-            }
+            return self._sample_hotpepper_price(restaurant_id)
         except Exception as e:
-            print(f"[ERROR] HotPepper price error: {e}", flush=True)
+            if isinstance(e, RateLimitExceeded):
+                status = 'rate_limited'
+            elif isinstance(e, requests.HTTPError) and e.response is not None:
+                status = e.response.status_code
+            else:
+                status = 'exception'
+            return self._hotpepper_price_failed(e, status)
+    
+    def _hotpepper_price_params(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
+        """店舗取得のAPIパラメータ（ホットペッパー以外のIDやAPIキー未設定ならNone）"""
+        if not restaurant_id.startswith('hotpepper_') or not self.hotpepper_api_key:
             return None
+        return {
+            'key': self.hotpepper_api_key,
+            'id': restaurant_id.replace('hotpepper_', ''),
+            'format': 'json'
+        }
+    
+    @staticmethod
+    def _hotpepper_price_from_data(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        shop = data.get('results', {}).get('shop', [])
+        if not shop:
+            return None
+        
+        shop_data = shop[0] if isinstance(shop, list) else shop
+        return {
+            "site": "ホットペッパー",
+            "price_info": shop_data.get('budget', {}).get('name', '価格情報なし'),
+            "reservation_available": True,
+            "url": shop_data.get('urls', {}).get('pc', ''),
+            "features": ["即予約", "ポイント付与", "クーポン", "写真豊富"]
+        }
+    
+    @staticmethod
+    def _sample_hotpepper_price(restaurant_id: str) -> Dict[str, Any]:
+        """フォールバック（サンプルデータ）"""
+        price_ranges = ["¥1,500-2,500", "¥2,500-3,500", "¥3,500-5,000", "¥5,000-7,000"]
+        restaurant_int = hash(restaurant_id) % len(price_ranges)
+        price_range = price_ranges[restaurant_int]
+        
+        reservation_available = (hash(restaurant_id) % 10) > 1  # 90%の確率で予約可能
+        
+        return {
+            "site": "ホットペッパー",
+            "price_info": price_range,
+            "reservation_available": reservation_available,
+            "url": f"https://www.hotpepper.jp/strJ{restaurant_id}/",
+            "features": ["即予約", "ポイント付与", "クーポン"] if reservation_available else ["情報のみ"]
+        }
+    
+    @staticmethod
+    def _hotpepper_price_failed(error: Exception, status: Any) -> None:
+        price_logger.error(f"HotPepper price error: {describe_error(error)}")
+        UPSTREAM_ERRORS_TOTAL.inc(upstream='price:ホットペッパー', status=status)
+        return None
     
     def _get_tabelog_price(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
         """食べログ価格情報取得"""
@@ -1175,7 +1985,7 @@ class RestaurantSearchService:
                 "features": ["口コミ", "写真", "評価"]
             }
         except Exception as e:
-            print(f"[ERROR] Tabelog price error: {e}", flush=True)
+            price_logger.error(f"Tabelog price error: {e}")
             return None
     
     def _get_opentable_price(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
@@ -1195,7 +2005,7 @@ class RestaurantSearchService:
                 "features": ["リアルタイム予約", "キャンセル可", "国際対応"] if reservation_available else ["情報のみ"]
             }
         except Exception as e:
-            print(f"[ERROR] OpenTable price error: {e}", flush=True)
+            price_logger.error(f"OpenTable price error: {e}")
             return None
     
     def _get_ikyu_price(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
@@ -1215,7 +2025,7 @@ class RestaurantSearchService:
                 "features": ["高級店専門", "ポイント", "特典"] if reservation_available else ["情報のみ"]
             }
         except Exception as e:
-            print(f"[ERROR] Ikyu price error: {e}", flush=True)
+            price_logger.error(f"Ikyu price error: {e}")
             return None
     
     def _get_yahoo_gourmet_price(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
@@ -1235,59 +2045,277 @@ class RestaurantSearchService:
                 "features": ["Yahoo!ポイント", "クーポン", "口コミ"] if reservation_available else ["情報のみ"]
             }
         except Exception as e:
-            print(f"[ERROR] Yahoo Gourmet price error: {e}", flush=True)
+            price_logger.error(f"Yahoo Gourmet price error: {e}")
             return None
 
-restaurant_service = RestaurantSearchService()
+_restaurant_service: Optional[RestaurantSearchService] = None
+_restaurant_service_lock = threading.Lock()
+
+def get_restaurant_service() -> RestaurantSearchService:
+    """Flask版の検索サービス（最初に使われた時点で作成）
+
+    ASGIモード（asgi_app.py）は下のヘルパーを使うためにこのモジュールを import するが、
+    サービスは非同期版を別に作る。import しただけで同期版まで作ると、呼び出し制御・
+    回路遮断・キャッシュ・ワーカープールがプロセス内に2組でき、使われない方が残るため。
+    """
+    global _restaurant_service
+    if _restaurant_service is None:
+        with _restaurant_service_lock:
+            if _restaurant_service is None:
+                _restaurant_service = RestaurantSearchService()
+    return _restaurant_service
+
+def __getattr__(name: str) -> Any:
+    # from app import restaurant_service（バッチ検索・ベンチマーク）は従来どおり使える
+    if name == 'restaurant_service':
+        return get_restaurant_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# カーソル付きページングで参照する検索結果（検索条件のハッシュ → 上位候補）
+# 共有バックエンドにすると、別のワーカーが発行したカーソルでも続きを返せる
+search_result_cache = create_cache(
+    'search_results',
+    ttl=Config.SEARCH_RESULT_CACHE_TTL,
+    max_entries=Config.SEARCH_RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=Config.SEARCH_RESULT_CACHE_MAX_BYTES
+)
+
+# /search のエンコード済みレスポンス（検索条件 + fields + limit ごと）
+search_response_cache = EncodedResponseCache(
+    ttl=Config.SEARCH_RESPONSE_CACHE_TTL,
+    max_entries=Config.SEARCH_RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=Config.SEARCH_RESPONSE_CACHE_MAX_BYTES
+)
+
+def build_search_response(search_params: Dict[str, Any], candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """/search のレスポンス本体を組み立てる"""
+    if candidates:
+        return {
+            "status": "restaurants_found",
+            "restaurants": restaurants_to_dicts(candidates),
+            "search_params": search_params,
+            "total_count": len(candidates)
+        }
+    return {
+        "status": "no_results",
+        "message": "該当するレストランが見つかりませんでした",
+        "search_params": search_params
+    }
+
+def parse_limit(value: Any) -> Optional[int]:
+    """limit パラメータを1〜TOP_RESTAURANTS_LIMITの整数に正規化（未指定ならNone）"""
+    if value is None or value == '':
+        return None
+    # JSONの配列・オブジェクト・真偽値・小数は受け付けない（int() の TypeError で500にしない）
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"Invalid limit: {value!r}")
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError(f"Invalid limit: {value}")
+    return min(limit, TOP_RESTAURANTS_LIMIT)
+
+def encode_cursor(token: str, offset: int, limit: int, fields: Optional[Tuple[str, ...]]) -> str:
+    """検索結果のトークン・次の開始位置・件数・fields を不透明なカーソル文字列にする"""
+    raw = json.dumps([token, offset, limit, fields], separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int, Optional[Tuple[str, ...]]]:
+    """カーソル文字列を (トークン, 開始位置, 件数, fields) に戻す（不正な場合はValueError）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        token, offset, limit, fields = json.loads(raw)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(token, str) or not isinstance(offset, int) or not isinstance(limit, int) or offset < 0 or limit <= 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return token, offset, min(limit, TOP_RESTAURANTS_LIMIT), parse_fields(fields)
+
+def search_result_token(params_key: str) -> str:
+    """検索条件に対応するカーソル用の結果キャッシュのキー"""
+    return hashlib.sha256(params_key.encode('utf-8')).hexdigest()[:24]
+
+def make_search_result_entry(search_params: Dict[str, Any], candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        'search_params': search_params,
+        'restaurants': restaurants_to_dicts(candidates),
+        'created_at': time.time()
+    }
+
+def store_search_result(token: str, entry: Dict[str, Any]) -> None:
+    """検索結果をカーソル用の結果キャッシュに保存（サイズはJSONのバイト数）"""
+    search_result_cache.set(token, entry, size=len(json.dumps(entry, ensure_ascii=False).encode('utf-8')))
+
+def get_search_results(search_params: Dict[str, Any], params_key: str) -> Tuple[str, Dict[str, Any]]:
+    """検索条件に対応する上位候補をカーソル用の結果キャッシュから取得（なければ検索して保存）"""
+    token = search_result_token(params_key)
+    entry = search_result_cache.get(token)
+    if entry is None:
+        entry = make_search_result_entry(search_params, get_restaurant_service().search_restaurants(search_params))
+        store_search_result(token, entry)
+    return token, entry
+
+def build_search_page(entry: Dict[str, Any], token: str, offset: int, limit: int,
+                      fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """キャッシュ済みの検索結果から offset 以降の limit 件を /search のレスポンスにする"""
+    restaurants = entry['restaurants']
+    page = restaurants[offset:offset + limit]
+    response_body = build_search_response(entry['search_params'], page)
+    next_offset = offset + len(page)
+    if 'restaurants' in response_body:
+        response_body['restaurants'] = project_fields(response_body['restaurants'], fields)
+        response_body['total_count'] = len(restaurants)
+        response_body['returned_count'] = len(page)
+    response_body['next_cursor'] = encode_cursor(token, next_offset, limit, fields) if next_offset < len(restaurants) else None
+    return response_body
+
+def format_sse_event(event: str, payload: Dict[str, Any]) -> str:
+    """Server-Sent Events 形式の1イベントを作成"""
+    return f"event: {event}\ndata: {dumps_json(payload).decode('utf-8')}\n\n"
+
+def stream_search_events(query: str) -> Iterator[str]:
+    """検索の進捗をSSEイベントとして順次送信（params → page × N → results）"""
+    try:
+        # Step 1: クエリ解析
+        search_params = get_restaurant_service().query_llm(query)
+        yield format_sse_event('params', {"search_params": search_params})
+        
+        # Step 2: ページごとにスコア付きレストランを送信
+        search = get_restaurant_service().iter_search_restaurants(search_params)
+        while True:
+            try:
+                page = next(search)
+            except StopIteration as stop:
+                candidates = stop.value
+                break
+            yield format_sse_event('page', dict(page, restaurants=restaurants_to_dicts(page['restaurants'])))
+        
+        # Step 3: 最終的な上位候補
+        yield format_sse_event('results', build_search_response(search_params, candidates))
+    except Exception as e:
+        logger.error(f"Streaming search error: {describe_error(e)}")
+        yield format_sse_event('error', {"error": mask_url_secrets(str(e))})
+
+@app.before_request
+def bind_log_context():
+    """リクエストIDとDEBUGログの有効化（X-Debug-Log: 1 / "debug": true / サンプリング）を設定"""
+    data = request.get_json(silent=True)
+    force_debug = request.headers.get('X-Debug-Log', '').lower() in ('1', 'true') or (
+        isinstance(data, dict) and data.get('debug') is True
+    )
+    g.log_context = start_request_context(request.headers.get('X-Request-ID'), force_debug)
+
+@app.after_request
+def add_request_id_header(response: Response) -> Response:
+    response.headers['X-Request-ID'] = current_request_id()
+    return response
+
+@app.teardown_request
+def unbind_log_context(error: Optional[BaseException] = None) -> None:
+    end_request_context(g.pop('log_context', None))
 
 @app.route('/search', methods=['POST'])
 def search_restaurants():
     data = request.get_json()
     query = data.get('query', '')
+    cursor = data.get('cursor') or request.args.get('cursor')
     
-    print("\n" + "="*60)
-    print("*** NEW RESTAURANT SEARCH REQUEST ***")
-    print(f"*** QUERY: '{query}' ***")
-    print("="*60)
+    logger.info(f"New restaurant search request: '{query}'")
+    
+    try:
+        limit = parse_limit(data.get('limit', request.args.get('limit')))
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    
+    # レストランの項目を絞り込む場合は "fields": ["name", "rating"] または ?fields=name,rating
+    fields = parse_fields(data.get('fields') or request.args.get('fields'))
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    
+    # 2ページ目以降：カーソルが指す検索結果をキャッシュから返す（クエリ解析・検索はやり直さない）
+    if cursor:
+        try:
+            token, offset, cursor_limit, cursor_fields = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
+        entry = search_result_cache.get(token)
+        if entry is None:
+            search_logger.info(f"Cursor expired: {token}")
+            return jsonify({"error": "Cursor expired, please search again"}), 410
+        
+        limit = limit or cursor_limit
+        fields = fields or cursor_fields
+        cache_key = ('page', token, entry['created_at'], offset, limit, fields)
+        body, _ = search_response_cache.get_or_build(
+            cache_key, lambda: encode_json(build_search_page(entry, token, offset, limit, fields)), encoding
+        )
+        return encoded_json_response(body, encoding)
     
     if not query:
-        print("*** ERROR: Empty query received ***")
+        logger.warning("Empty query received")
         return jsonify({"error": "Query is required"}), 400
     
-    # Step 1: クエリ解析（地域、料理ジャンル、シチュエーション等を抽出）
-    search_params = restaurant_service.query_llm(query)
+    # ストリーミングモード（"stream": true または Accept: text/event-stream）
+    if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+        return Response(
+            stream_with_context(stream_search_events(query)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
     
-    # Step 2: レストラン検索
-    candidates = restaurant_service.search_restaurants(search_params)
+    # Step 1: クエリ解析（地域、料理ジャンル、シチュエーション等を抽出）
+    search_params = get_restaurant_service().query_llm(query)
+    params_key = json.dumps(search_params, sort_keys=True, ensure_ascii=False)
     
-    if candidates:
-        return jsonify({
-            "status": "restaurants_found",
-            "restaurants": candidates,
-            "search_params": search_params,
-            "total_count": len(candidates)
-        })
+    # Step 2: レストラン検索（同じ検索条件・fields・limit のエンコード済みレスポンスがあればそのまま返す）
+    if limit:
+        def build_body() -> bytes:
+            token, entry = get_search_results(search_params, params_key)
+            return encode_json(build_search_page(entry, token, 0, limit, fields))
     else:
-        return jsonify({
-            "status": "no_results",
-            "message": "該当するレストランが見つかりませんでした",
-            "search_params": search_params
-        })
+        def build_body() -> bytes:
+            return encode_search_response(search_params, get_restaurant_service().search_restaurants(search_params), fields)
+    
+    cache_key = (params_key, fields, limit)
+    body, cache_hit = search_response_cache.get_or_build(cache_key, build_body, encoding)
+    CACHE_REQUESTS_TOTAL.inc(cache='search_response', result='hit' if cache_hit else 'miss')
+    if cache_hit:
+        search_logger.info(f"Response cache hit: {cache_key}")
+    
+    return encoded_json_response(body, encoding)
+
+def encode_search_response(search_params: Dict[str, Any], candidates: List[Dict[str, Any]],
+                           fields: Optional[Tuple[str, ...]]) -> bytes:
+    """全件を返す場合の /search レスポンス（fields で項目を絞り込み）をエンコード"""
+    response_body = build_search_response(search_params, candidates)
+    if 'restaurants' in response_body:
+        response_body['restaurants'] = project_fields(response_body['restaurants'], fields)
+    return encode_json(response_body)
+
+def encode_json(payload: Dict[str, Any]) -> bytes:
+    with STAGE_DURATION.time(stage='serialization'):
+        return dumps_json(payload)
+
+def encoded_json_response(body: bytes, encoding: Optional[str]) -> Response:
+    """エンコード（・圧縮）済みのJSONをレスポンスとして返す"""
+    response = Response(body, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/price-comparison', methods=['POST'])
 def price_comparison():
     data = request.get_json()
     restaurant_id = data.get('restaurant_id')
     
-    app.logger.info(f"=== Restaurant Price Comparison Request ===")
-    app.logger.info(f"Restaurant ID: {restaurant_id}")
+    logger.info(f"Restaurant price comparison request: {restaurant_id}")
     
     if not restaurant_id:
-        app.logger.error("Empty restaurant_id received")
+        logger.warning("Empty restaurant_id received")
         return jsonify({"error": "Restaurant ID is required"}), 400
     
     # 価格・予約情報比較
-    price_results = restaurant_service.get_restaurant_prices(restaurant_id)
+    price_results = get_restaurant_service().get_restaurant_prices(restaurant_id)
     
     return jsonify({
         "restaurant_id": restaurant_id,
@@ -1298,12 +2326,15 @@ def price_comparison():
 def health_check():
     return jsonify({"status": "healthy"})
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """処理段階ごとのレイテンシ・解析方法・キャッシュ・外部エラーの集計（Prometheusテキスト形式）"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/test-log', methods=['GET'])  
 def test_log():
-    print("\n" + "*"*50)
-    print("*** LOG TEST - This should be visible in console ***")
-    print("*** If you see this, logging is working! ***")
-    print("*"*50)
+    logger.info("Log test - this should be visible in console")
+    logger.debug("Log test - debug level (visible with LOG_LEVEL=DEBUG or X-Debug-Log: 1)")
     return jsonify({"message": "Log test completed - check console"})
 
 @app.route('/debug-routes', methods=['GET'])
@@ -1316,54 +2347,84 @@ def debug_routes():
             "methods": list(rule.methods),
             "path": str(rule)
         })
-    print("*** Available routes: ***")
+    logger.info("Available routes:")
     for route in routes:
-        print(f"  {route['path']} -> {route['methods']}")
+        logger.info(f"  {route['path']} -> {route['methods']}")
     return jsonify({"routes": routes})
 
+@app.route('/debug-cache', methods=['GET'])
+def debug_cache():
+    """キャッシュの統計情報を表示"""
+    service = get_restaurant_service()
+    return jsonify({
+        "hotpepper": service.hotpepper_cache.stats(),
+        "llm_parse": service.llm_parse_cache.stats(),
+        "search_response": search_response_cache.stats(),
+        "search_results": search_result_cache.stats()
+    })
+
+@app.route('/debug-store', methods=['GET'])
+def debug_store():
+    """ローカル店舗ストアのエリアごとの件数と鮮度を表示"""
+    service = get_restaurant_service()
+    if service.shop_store is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, "areas": service.shop_store.coverage()})
+
+@app.route('/debug-llm', methods=['GET'])
+def debug_llm():
+    """LLM呼び出しの統計（TTFT・トークン/秒・打ち切り回数・回路遮断の状態）を表示"""
+    service = get_restaurant_service()
+    return jsonify(dict(
+        service.llm_client.stats.snapshot(),
+        circuits={name: breaker.snapshot() for name, breaker in service.llm_breakers.items()},
+        hedge_delay=service.hedged_llm_client.hedge_delay() if Config.LLM_HEDGE_ENABLED else None
+    ))
+
 @app.route('/debug-genres', methods=['GET'])
 def debug_genres():
     """ホットペッパーAPIのジャンル一覧を取得"""
-    if not restaurant_service.hotpepper_api_key:
+    service = get_restaurant_service()
+    if not service.hotpepper_api_key:
         return jsonify({"error": "HotPepper API key not configured"}), 400
     
     try:
         # ジャンルマスターAPI呼び出し
         genre_api_url = 'http://webservice.recruit.co.jp/hotpepper/genre/v1/'
         params = {
-            'key': restaurant_service.hotpepper_api_key,
+            'key': service.hotpepper_api_key,
             'format': 'json'
         }
         
-        response = requests.get(genre_api_url, params=params, timeout=Config.REQUEST_TIMEOUT)
+        service.hotpepper_scheduler.acquire(Priority.INTERACTIVE)
+        response = service.http.get(genre_api_url, params=params, timeout=Config.REQUEST_TIMEOUT)
         response.raise_for_status()
         
         data = response.json()
         genres = data.get('results', {}).get('genre', [])
         
-        print("*** ホットペッパーAPI ジャンル一覧 ***")
+        logger.info("ホットペッパーAPI ジャンル一覧")
         genre_mapping = {}
         for genre in genres:
             code = genre.get('code', '')
             name = genre.get('name', '')
             genre_mapping[code] = name
-            print(f"  {code}: {name}")
+            logger.info(f"  {code}: {name}")
         
         return jsonify({
             "genre_count": len(genres),
             "genres": genre_mapping
         })
         
+    except RateLimitExceeded as e:
+        logger.warning(f"Genre debug skipped: {e}")
+        return jsonify({"error": str(e)}), 429
     except Exception as e:
-        print(f"[ERROR] Genre debug error: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error(f"Genre debug error: {describe_error(e)}")
+        return jsonify({"error": mask_url_secrets(str(e))}), 500
 
 if __name__ == '__main__':
-    print("=" * 50)
-    print("Starting RestaurantSeeker-LLM Backend Server...")
-    print("=" * 50)
-    print("Server will be available at http://localhost:5003")
-    print("Logging enabled - you should see detailed search logs below")
-    print("=" * 50)
+    logger.info("Starting RestaurantSeeker-LLM Backend Server at http://localhost:5003")
+    get_restaurant_service()
     
     app.run(debug=True, host='0.0.0.0', port=5003, use_reloader=False)
\ No newline at end of file
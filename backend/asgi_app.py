@@ -0,0 +1,273 @@
+"""ASGIモードのエントリポイント
+
+/search・/price-comparison・/health・/metrics を非同期版の検索サービスで提供する。
+上流API（LLM・ホットペッパー）の応答待ちはイベントループ上で行うため、
+LLMの応答を待つ検索が多数あってもワーカースレッドを使い切らない。
+レスポンスの形式・キャッシュ・カーソル・SSEの挙動は Flask版（app.py）と同じ。
+
+起動方法（backend ディレクトリで実行）:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5003
+    python asgi_app.py
+"""
+import asyncio
+import contextlib
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app import (build_search_page, build_search_response, decode_cursor, encode_json, encode_search_response,
+                 format_sse_event, logger, make_search_result_entry, parse_limit, search_logger,
+                 search_response_cache, search_result_cache, search_result_token, store_search_result)
+from async_service import AsyncRestaurantSearchService
+from log_config import current_request_id, describe_error, end_request_context, mask_url_secrets, start_request_context
+from metrics import CACHE_REQUESTS_TOTAL, REGISTRY
+from restaurant_record import restaurants_to_dicts
+from serialization import negotiate_encoding, parse_fields
+
+restaurant_service = AsyncRestaurantSearchService()
+
+
+class LogContextMiddleware:
+    """リクエストIDとDEBUGログの有効化（X-Debug-Log: 1 / "debug": true / サンプリング）を設定
+
+    Flask版の before_request / after_request / teardown_request に相当する。
+    本体の "debug" を見るために本体を先に読み込み、読み込んだ内容をそのままアプリに渡す。
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        messages = []
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            messages.append(message)
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False) and message['type'] == 'http.request'
+
+        async def replay_receive() -> Dict[str, Any]:
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        async def send_with_request_id(message: Dict[str, Any]) -> None:
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message)['X-Request-ID'] = current_request_id()
+            await send(message)
+
+        headers = Headers(scope=scope)
+        force_debug = headers.get('X-Debug-Log', '').lower() in ('1', 'true') or _body_requests_debug(body)
+        log_context = start_request_context(headers.get('X-Request-ID'), force_debug)
+        try:
+            await self.app(scope, replay_receive, send_with_request_id)
+        finally:
+            end_request_context(log_context)
+
+
+def _body_requests_debug(body: bytes) -> bool:
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get('debug') is True
+
+
+async def read_json(request: Request) -> Optional[Dict[str, Any]]:
+    """リクエスト本体のJSONオブジェクト（不正な場合はNone）"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def encoded_json_response(body: bytes, encoding: Optional[str]) -> Response:
+    """エンコード（・圧縮）済みのJSONをレスポンスとして返す"""
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, media_type='application/json', headers=headers)
+
+
+async def get_search_results_async(search_params: Dict[str, Any], params_key: str) -> Tuple[str, Dict[str, Any]]:
+    """get_search_results の非同期版（カーソル用の結果キャッシュは Flask版と共通）"""
+    token = search_result_token(params_key)
+    # 共有キャッシュ（sqlite / redis）は同期APIのため、読み書きは別スレッドで行う
+    entry = await asyncio.to_thread(search_result_cache.get, token)
+    if entry is None:
+        entry = make_search_result_entry(search_params, await restaurant_service.search_restaurants_async(search_params))
+        await asyncio.to_thread(store_search_result, token, entry)
+    return token, entry
+
+
+async def stream_search_events(query: str) -> AsyncIterator[str]:
+    """検索の進捗をSSEイベントとして順次送信（params → page × N → results）"""
+    search_task = None
+    try:
+        # Step 1: クエリ解析
+        search_params = await restaurant_service.query_llm_async(query)
+        yield format_sse_event('params', {"search_params": search_params})
+
+        # Step 2: 検索を別タスクで進め、取得できたページから順に送信（None は検索の終了）
+        pages: asyncio.Queue = asyncio.Queue()
+        search_task = asyncio.create_task(restaurant_service.search_restaurants_async(search_params, on_page=pages.put_nowait))
+        search_task.add_done_callback(lambda _: pages.put_nowait(None))
+        while True:
+            page = await pages.get()
+            if page is None:
+                break
+            yield format_sse_event('page', dict(page, restaurants=restaurants_to_dicts(page['restaurants'])))
+
+        # Step 3: 最終的な上位候補
+        candidates = search_task.result()
+        yield format_sse_event('results', build_search_response(search_params, candidates))
+    except Exception as e:
+        logger.error(f"Streaming search error: {describe_error(e)}")
+        yield format_sse_event('error', {"error": mask_url_secrets(str(e))})
+    finally:
+        # クライアントが切断した場合は検索も止める
+        if search_task is not None and not search_task.done():
+            search_task.cancel()
+
+
+async def search_restaurants(request: Request) -> Response:
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    query = data.get('query', '')
+    cursor = data.get('cursor') or request.query_params.get('cursor')
+
+    logger.info(f"New restaurant search request: '{query}'")
+
+    try:
+        limit = parse_limit(data.get('limit', request.query_params.get('limit')))
+    except ValueError:
+        return JSONResponse({"error": "limit must be a positive integer"}, status_code=400)
+
+    # レストランの項目を絞り込む場合は "fields": ["name", "rating"] または ?fields=name,rating
+    fields = parse_fields(data.get('fields') or request.query_params.get('fields'))
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+
+    # 2ページ目以降：カーソルが指す検索結果をキャッシュから返す（クエリ解析・検索はやり直さない）
+    if cursor:
+        try:
+            token, offset, cursor_limit, cursor_fields = decode_cursor(cursor)
+        except ValueError:
+            return JSONResponse({"error": "Invalid cursor"}, status_code=400)
+
+        entry = await asyncio.to_thread(search_result_cache.get, token)
+        if entry is None:
+            search_logger.info(f"Cursor expired: {token}")
+            return JSONResponse({"error": "Cursor expired, please search again"}, status_code=410)
+
+        limit = limit or cursor_limit
+        fields = fields or cursor_fields
+        cache_key = ('page', token, entry['created_at'], offset, limit, fields)
+        body, _ = search_response_cache.get_or_build(
+            cache_key, lambda: encode_json(build_search_page(entry, token, offset, limit, fields)), encoding
+        )
+        return encoded_json_response(body, encoding)
+
+    if not query:
+        logger.warning("Empty query received")
+        return JSONResponse({"error": "Query is required"}, status_code=400)
+
+    # ストリーミングモード（"stream": true または Accept: text/event-stream）
+    if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+        return StreamingResponse(
+            stream_search_events(query),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    # Step 1: クエリ解析（地域、料理ジャンル、シチュエーション等を抽出）
+    search_params = await restaurant_service.query_llm_async(query)
+    params_key = json.dumps(search_params, sort_keys=True, ensure_ascii=False)
+
+    # Step 2: レストラン検索（同じ検索条件・fields・limit のエンコード済みレスポンスがあればそのまま返す）
+    cache_key = (params_key, fields, limit)
+    body = search_response_cache.get(cache_key, encoding)
+    CACHE_REQUESTS_TOTAL.inc(cache='search_response', result='hit' if body is not None else 'miss')
+    if body is not None:
+        search_logger.info(f"Response cache hit: {cache_key}")
+        return encoded_json_response(body, encoding)
+
+    if limit:
+        token, entry = await get_search_results_async(search_params, params_key)
+        body = encode_json(build_search_page(entry, token, 0, limit, fields))
+    else:
+        body = encode_search_response(search_params, await restaurant_service.search_restaurants_async(search_params), fields)
+
+    return encoded_json_response(search_response_cache.put(cache_key, body, encoding), encoding)
+
+
+async def price_comparison(request: Request) -> Response:
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    restaurant_id = data.get('restaurant_id')
+
+    logger.info(f"Restaurant price comparison request: {restaurant_id}")
+
+    if not restaurant_id:
+        logger.warning("Empty restaurant_id received")
+        return JSONResponse({"error": "Restaurant ID is required"}, status_code=400)
+
+    # 価格・予約情報比較
+    price_results = await restaurant_service.get_restaurant_prices_async(restaurant_id)
+
+    return JSONResponse({
+        "restaurant_id": restaurant_id,
+        "price_comparison": price_results
+    })
+
+
+async def health_check(request: Request) -> Response:
+    return JSONResponse({"status": "healthy"})
+
+
+async def metrics(request: Request) -> Response:
+    """処理段階ごとのレイテンシ・解析方法・キャッシュ・外部エラーの集計（Prometheusテキスト形式）"""
+    return Response(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    yield
+    # 終了時に上流APIへの接続プールを閉じる
+    await restaurant_service.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/search', search_restaurants, methods=['POST']),
+        Route('/price-comparison', price_comparison, methods=['POST']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET'])
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(LogContextMiddleware)
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    logger.info("Starting Restaurant Seeker API server (ASGI mode) on port 5003")
+    uvicorn.run(app, host='0.0.0.0', port=5003)
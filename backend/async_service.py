@@ -0,0 +1,314 @@
+"""RestaurantSearchService の非同期版（ASGIモード用）
+
+上流API（LLM・ホットペッパー）の呼び出しを httpx の非同期クライアントで行い、
+ページの並列取得や価格サイトへの問い合わせはスレッドではなく asyncio のタスクで並行させる。
+応答待ちの間はイベントループに制御を返すため、LLMの応答を待つ多数の検索を
+1プロセスで同時に抱えられる。クエリ解析・スコアリング・絞り込みなどの処理は同期版と共通。
+解析キャッシュ・ページのキャッシュ・ローカルストア（SQLite など）の読み書きは同期APIのため、
+asyncio.to_thread で別スレッドに渡してイベントループを止めないようにする。
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app import (RestaurantSearchService, hotpepper_logger, llm_hedge_policy, parse_logger, price_logger, search_logger)
+from config import Config
+from http_client import AsyncHttpClient
+from llm_client import AsyncHedgedLLMClient, AsyncStreamingLLMClient
+from log_config import describe_error, mask_secrets
+from metrics import QUERY_PARSE_TOTAL, STAGE_DURATION, UPSTREAM_ERRORS_TOTAL
+from page_planner import RankingPagePlanner
+from rate_limiter import Priority, RateLimitExceeded
+from singleflight import AsyncSingleFlight
+
+
+class AsyncRestaurantSearchService(RestaurantSearchService):
+    def __init__(self):
+        super().__init__()
+        self.async_http = AsyncHttpClient(
+            max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.ASYNC_HTTP_MAX_KEEPALIVE
+        )
+        # 集計は同期版のクライアントと共有（/debug-llm と同じ値）
+        self.async_llm_client = AsyncStreamingLLMClient(
+            self.async_http, self.llm_endpoint, timeout=Config.LLM_TIMEOUT, stats=self.llm_client.stats
+        )
+        async_hedge_client = None
+        if Config.LLM_HEDGE_ENABLED:
+            async_hedge_client = AsyncStreamingLLMClient(self.async_http, Config.LLM_HEDGE_ENDPOINT, timeout=Config.LLM_TIMEOUT)
+        # 回路遮断の状態と主系の所要時間の計測は同期版と共有する
+        self.async_hedged_llm_client = AsyncHedgedLLMClient(
+            *self._llm_targets(self.async_llm_client, async_hedge_client),
+            latencies=self.hedged_llm_client.latencies,
+            **llm_hedge_policy()
+        )
+        self._async_llm_parse_flight = AsyncSingleFlight('llm_parse')
+        self._async_hotpepper_page_flight = AsyncSingleFlight('hotpepper_page')
+
+    async def aclose(self) -> None:
+        await self.async_http.aclose()
+
+    async def query_llm_async(self, user_query: str) -> Dict[str, Any]:
+        # 解析キャッシュ（SQLite）の読み込みはイベントループを止めないよう別スレッドで行う
+        direct_or_cached, cache_key = await asyncio.to_thread(self._parse_query_without_llm, user_query)
+        if direct_or_cached is not None:
+            return direct_or_cached
+
+        # 直接マッチングが失敗した場合のみLLMを使用（同じ言い回しを解析中ならその結果を待つ）
+        return await self._async_llm_parse_flight.do(cache_key, lambda: self._parse_with_llm_async(user_query, cache_key))
+
+    async def _parse_with_llm_async(self, user_query: str, cache_key: str) -> Dict[str, Any]:
+        parse_logger.info(f"No direct match found, querying LLM for: {user_query}")
+        QUERY_PARSE_TOTAL.inc(source='llm')
+        with STAGE_DURATION.time(stage='llm_call'):
+            llm_result = await self._query_llm_for_restaurant_async(user_query)
+
+        if llm_result is None:
+            # LLMに問い合わせられなかった場合はキャッシュせず、復旧後に解析し直す
+            return self._empty_llm_result()
+        await asyncio.to_thread(self._store_llm_parse_result, cache_key, llm_result)
+        return llm_result
+
+    async def _query_llm_for_restaurant_async(self, user_query: str) -> Optional[Dict[str, Any]]:
+        try:
+            stream_result = await self.async_hedged_llm_client.generate_json(self._build_llm_payload(user_query))
+            return self._interpret_llm_result(stream_result)
+        except Exception as e:
+            return self._llm_query_failed(e, self._llm_error_status(e, httpx.HTTPError))
+
+    async def search_restaurants_async(self, search_params: Dict[str, Any],
+                                       on_page: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """レストラン検索（ページごとのレストランは on_page に渡し、上位候補を返す）"""
+        candidates = []
+        seen_ids = set()
+
+        search_logger.info(f"Searching restaurants with params: {search_params}")
+
+        # ホットペッパーAPIの結果を優先
+        if self.hotpepper_api_key:
+            hotpepper_results = await self._search_hotpepper_async(search_params, seen_ids, on_page)
+            candidates.extend(hotpepper_results)
+            search_logger.info(f"HotPepper added {len(hotpepper_results)} results")
+
+        return self._complete_search(candidates, search_params, seen_ids)
+
+    async def _search_hotpepper_async(self, search_params: Dict[str, Any], seen_ids: set,
+                                      on_page: Optional[Callable[[Dict[str, Any]], None]]) -> List[Dict[str, Any]]:
+        if not self.hotpepper_api_key:
+            hotpepper_logger.warning("API key not configured")
+            return []
+
+        try:
+            params, location = self._build_hotpepper_params(search_params)
+            planner = self._create_page_planner(search_params)
+
+            restaurants = []
+            total_shop_count = 0
+            async for label, shops, replaces_previous in self._aiter_hotpepper_shop_batches(params, location, planner):
+                if replaces_previous:
+                    # フォールバック結果で置き換える場合はそれまでの結果を破棄
+                    for restaurant in restaurants:
+                        seen_ids.discard(restaurant['id'])
+                    restaurants = []
+                    total_shop_count = 0
+
+                total_shop_count += len(shops)
+                page_restaurants = self._restaurants_from_shops(shops, search_params, seen_ids)
+                restaurants.extend(page_restaurants)
+                planner.record_page(len(shops), page_restaurants)
+                if on_page is not None:
+                    on_page({
+                        'source': 'hotpepper',
+                        'label': label,
+                        'replaces_previous': replaces_previous,
+                        'restaurants': page_restaurants
+                    })
+
+            return self._finish_hotpepper_results(restaurants, total_shop_count)
+
+        except Exception as e:
+            hotpepper_logger.exception(f"Unexpected error: {describe_error(e)}")
+            return []
+
+    async def _aiter_hotpepper_shop_batches(self, params: Dict[str, Any], location: Optional[str],
+                                            planner: RankingPagePlanner) -> AsyncIterator[Tuple[str, List[Dict[str, Any]], bool]]:
+        """_iter_hotpepper_shop_batches の非同期版（2ページ目以降とフォールバックはタスクで並行取得）"""
+        deadline = time.monotonic() + Config.HOTPEPPER_SEARCH_DEADLINE
+        try:
+            first_results = await self._fetch_hotpepper_page_async(self._hotpepper_page_params(params, 0), 'page 1', deadline)
+        except RateLimitExceeded:
+            self._record_first_page_shed()
+            first_results = None
+        if first_results is None:
+            return  # 1ページ目が失敗した場合のみエラー
+
+        first_shops = first_results.get('shop', [])
+        available_count = first_results.get('results_available', 0)
+        pages, fallback_params = self._plan_hotpepper_requests(params, location, first_results)
+        total_pages = len(pages) + 1
+
+        fallback_task = None
+        if fallback_params is not None:
+            fallback_task = asyncio.create_task(self._fetch_hotpepper_page_async(fallback_params, 'fallback', deadline))
+
+        page_tasks: Dict[int, asyncio.Task] = {}
+        try:
+            # ページ順にマージ（失敗したページはスキップし、成功したページは残す）
+            yield 'page 1', first_shops, False
+            shop_count = len(first_shops)
+            for page in pages:
+                # 必要なページ数まで先に取得を始めておく
+                page_limit = self._hotpepper_page_limit(planner, page, total_pages)
+                if page >= page_limit:
+                    break
+                for ahead in range(page, page_limit):
+                    if ahead not in page_tasks:
+                        page_tasks[ahead] = asyncio.create_task(self._fetch_hotpepper_page_async(
+                            self._hotpepper_page_params(params, ahead), f"page {ahead + 1}", deadline
+                        ))
+
+                try:
+                    page_results = await page_tasks.pop(page)
+                except RateLimitExceeded:
+                    # 間のページを欠いたまま続けないよう、打ち切られたページ以降は取得しない
+                    self._record_partial_search(f"page {page + 1}")
+                    break
+                except Exception as e:
+                    hotpepper_logger.error(f"Page {page + 1} unexpected error: {describe_error(e)}")
+                    page_results = None
+
+                if page_results is None:
+                    continue  # 2ページ目以降の失敗は継続
+
+                shops = page_results.get('shop', [])
+                shop_count += len(shops)
+                yield f"page {page + 1}", shops, False
+
+                # これ以上結果がない場合は終了
+                if len(shops) == 0 or shop_count >= available_count:
+                    break
+
+            if fallback_task is not None:
+                try:
+                    fallback_results = await fallback_task
+                except RateLimitExceeded:
+                    self._record_partial_search('fallback')
+                    fallback_results = None
+                except Exception as e:
+                    hotpepper_logger.error(f"Fallback unexpected error: {describe_error(e)}")
+                    fallback_results = None
+
+                if fallback_results is not None:
+                    fallback_shops = fallback_results.get('shop', [])
+                    hotpepper_logger.info(f"Fallback - Raw shop count: {len(fallback_shops)}")
+
+                    # より多くの結果が得られた場合は2回目の結果を使用
+                    if len(fallback_shops) > shop_count:
+                        hotpepper_logger.info("Using fallback results")
+                        yield 'fallback', fallback_shops, True
+        finally:
+            # 不要になった先読みや、検索自体がキャンセルされた場合（クライアント切断など）の取得中のページを止める
+            # （取得そのものは相乗り用のタスクで行うため、始まっていればキャッシュに入る）
+            for task in page_tasks.values():
+                task.cancel()
+            if fallback_task is not None:
+                fallback_task.cancel()
+
+    async def _fetch_hotpepper_page_async(self, page_params: Dict[str, Any], label: str,
+                                          deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """_fetch_hotpepper_page の非同期版（失敗時はNone、呼び出し制御で打ち切られた場合は RateLimitExceeded）"""
+        stage = 'hotpepper_fallback' if label == 'fallback' else 'hotpepper_page'
+        with STAGE_DURATION.time(stage=stage, target=label):
+            # 応答キャッシュ・ローカルストアの参照は別スレッドで行う
+            cache_key, stored = await asyncio.to_thread(self._lookup_hotpepper_page, page_params, label)
+            if stored is not None:
+                return stored
+
+            # 同じページを取得中の検索があればその応答を共有する
+            return await self._async_hotpepper_page_flight.do(
+                cache_key, lambda: self._download_hotpepper_page_async(page_params, cache_key, label, deadline)
+            )
+
+    async def _download_hotpepper_page_async(self, page_params: Dict[str, Any], cache_key: tuple,
+                                             label: str, deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            await self.hotpepper_scheduler.acquire_async(self._hotpepper_page_priority(label), deadline)
+        except RateLimitExceeded as e:
+            hotpepper_logger.warning(f"Skipped {label}: {e}")
+            raise
+
+        hotpepper_logger.info(f"Request params ({label}): {mask_secrets(page_params)}")
+
+        try:
+            response = await self.async_http.get(self.hotpepper_api, params=page_params, timeout=Config.REQUEST_TIMEOUT)
+        except httpx.HTTPError as e:
+            hotpepper_logger.error(f"API request error on {label}: {describe_error(e)}")
+            UPSTREAM_ERRORS_TOTAL.inc(upstream='hotpepper', status='timeout' if isinstance(e, httpx.TimeoutException) else 'connection')
+            return None
+
+        # 応答の解析とキャッシュへの保存は別スレッドで行う
+        return await asyncio.to_thread(self._handle_hotpepper_response, response, cache_key, label)
+
+    async def get_restaurant_prices_async(self, restaurant_id: str) -> List[Dict[str, Any]]:
+        """get_restaurant_prices の非同期版（サイトごとにタスクで並行して問い合わせる）"""
+        results = []
+
+        price_logger.info(f"Getting restaurant prices for ID: {restaurant_id}")
+
+        # 上流APIを呼ぶサイトは非同期版の関数に差し替える（他はサンプルデータを返すだけ）
+        async_price_functions = {"ホットペッパー": self._get_hotpepper_price_async}
+
+        started_at = time.monotonic()
+        overall_deadline = started_at + Config.PRICE_OVERALL_DEADLINE
+        tasks = []
+        for site_name, price_function in self._price_sources():
+            price_logger.debug("Checking %s...", site_name)
+            price_function = async_price_functions.get(site_name, price_function)
+            tasks.append((site_name, asyncio.create_task(self._timed_price_lookup_async(site_name, price_function, restaurant_id))))
+
+        for site_name, task in tasks:
+            site_deadline = min(started_at + Config.PRICE_SITE_TIMEOUT, overall_deadline)
+            try:
+                # 締め切りを過ぎたタスクは wait_for がキャンセルする
+                result = await asyncio.wait_for(task, timeout=max(0.0, site_deadline - time.monotonic()))
+                self._record_price_result(results, site_name, result)
+            except asyncio.TimeoutError:
+                results.append(self._price_timeout_result(site_name))
+            except Exception as e:
+                price_logger.error(f"{site_name} error: {describe_error(e)}")
+                UPSTREAM_ERRORS_TOTAL.inc(upstream=f"price:{site_name}", status='exception')
+
+        self._log_price_summary(results)
+        return results
+
+    async def _timed_price_lookup_async(self, site_name: str, price_function: Callable[[str], Any],
+                                        restaurant_id: str) -> Optional[Dict[str, Any]]:
+        with STAGE_DURATION.time(stage='price_provider', target=site_name):
+            if asyncio.iscoroutinefunction(price_function):
+                return await price_function(restaurant_id)
+            return price_function(restaurant_id)
+
+    async def _get_hotpepper_price_async(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
+        """ホットペッパー価格情報取得（非同期版）"""
+        try:
+            params = self._hotpepper_price_params(restaurant_id)
+            if params is not None:
+                await self.hotpepper_scheduler.acquire_async(Priority.INTERACTIVE)
+                response = await self.async_http.get(self.hotpepper_api, params=params, timeout=Config.REQUEST_TIMEOUT)
+                response.raise_for_status()
+
+                price = self._hotpepper_price_from_data(response.json())
+                if price is not None:
+                    return price
+
+            return self._sample_hotpepper_price(restaurant_id)
+        except Exception as e:
+            if isinstance(e, RateLimitExceeded):
+                status = 'rate_limited'
+            elif isinstance(e, httpx.HTTPStatusError):
+                status = e.response.status_code
+            else:
+                status = 'exception'
+            return self._hotpepper_price_failed(e, status)
@@ -0,0 +1,153 @@
+"""検索クエリのバッチ実行（JSONL入力 → ランキング済み結果をJSONL出力）
+
+使い方:
+    python batch_search.py queries.jsonl results.jsonl --concurrency 8
+
+入力は1行1クエリのJSONL（{"query": "新宿でデートにおすすめのイタリアン", "id": ...}）。
+結果は入力と同じ順序で1行ずつ書き出し、バッチ全体をメモリに保持しない。
+同じクエリ・同じ検索条件が同時に処理中であれば1回だけ実行して結果を共有する。処理が終わった
+結果は保持せず、後から来た同じ検索はサービスの応答キャッシュ（ホットペッパーのページ・LLM解析）で賄う。
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, IO
+
+from log_config import mask_url_secrets
+
+if TYPE_CHECKING:
+    from app import RestaurantSearchService
+
+
+class BatchSearchRunner:
+    """query_llm → search_restaurants（→ _filter_top_restaurants）を並列実行する"""
+
+    def __init__(self, service: 'RestaurantSearchService', build_response: Callable[[Dict[str, Any], list], Dict[str, Any]],
+                 concurrency: int = 8):
+        self.service = service
+        self.build_response = build_response
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        # 実行中の解析/検索を共有するためのFuture（完了したら外すため、最大でも書き出し待ちの件数まで）
+        self._parse_futures: Dict[str, Future] = {}
+        self._search_futures: Dict[str, Future] = {}
+        self.processed = 0
+        self.errors = 0
+        self.deduped_parses = 0
+        self.deduped_searches = 0
+
+    def run(self, input_stream: IO[str], output_stream: IO[str]) -> None:
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='batch') as executor:
+            for line_number, line in enumerate(input_stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+
+                pending.append(executor.submit(self._process_line, line_number, line))
+
+                # 書き出し待ちを並列数の2倍までに抑え、入力順に書き出す
+                while len(pending) >= self.concurrency * 2:
+                    self._write(pending.popleft().result(), output_stream)
+
+            while pending:
+                self._write(pending.popleft().result(), output_stream)
+
+    def _process_line(self, line_number: int, line: str) -> Dict[str, Any]:
+        try:
+            record = json.loads(line)
+            query = record.get('query', '') if isinstance(record, dict) else ''
+            if not query:
+                raise ValueError('Query is required')
+
+            parse_key = self.service._canonicalize_query(query)
+            search_params = self._shared(self._parse_futures, parse_key, lambda: self.service.query_llm(query), 'parse')
+
+            search_key = json.dumps(search_params, sort_keys=True, ensure_ascii=False)
+            candidates = self._shared(self._search_futures, search_key, lambda: self.service.search_restaurants(search_params), 'search')
+
+            result = {'line': line_number, 'id': record.get('id'), 'query': query}
+            result.update(self.build_response(search_params, candidates))
+            return result
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            return {'line': line_number, 'status': 'error', 'error': mask_url_secrets(str(e))}
+
+    def _shared(self, futures: Dict[str, Future], key: str, compute: Callable[[], Any], kind: str) -> Any:
+        """同じキーの処理が実行中なら新たに実行せず、その結果を待つ（SingleFlight と同じ）"""
+        with self._lock:
+            future = futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                futures[key] = future
+            elif kind == 'parse':
+                self.deduped_parses += 1
+            else:
+                self.deduped_searches += 1
+
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                # 結果は待っている呼び出し元だけが受け取り、バッチ内には残さない
+                with self._lock:
+                    futures.pop(key, None)
+        return future.result()
+
+    def _write(self, result: Dict[str, Any], output_stream: IO[str]) -> None:
+        output_stream.write(json.dumps(result, ensure_ascii=False) + '\n')
+        output_stream.flush()
+        self.processed += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='JSONLの検索クエリをまとめて実行し、結果をJSONLで出力します')
+    parser.add_argument('input', help="入力JSONLファイル（'-' で標準入力）")
+    parser.add_argument('output', help="出力JSONLファイル（'-' で標準出力）")
+    parser.add_argument('--concurrency', type=int, default=8, help='同時に処理するクエリ数')
+    args = parser.parse_args()
+
+    input_stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    if args.output == '-':
+        # 標準出力は結果専用にし、検索処理のログはすべて標準エラーへ回す
+        output_stream = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    else:
+        output_stream = open(args.output, 'w', encoding='utf-8')
+
+    # appのインポート時にサービスが初期化されるため、出力先の切り替え後に読み込む
+    from app import build_search_response, restaurant_service
+
+    runner = BatchSearchRunner(
+        restaurant_service,
+        build_search_response,
+        concurrency=args.concurrency
+    )
+    started_at = time.monotonic()
+    try:
+        runner.run(input_stream, output_stream)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        output_stream.close()
+
+    elapsed = time.monotonic() - started_at
+    print(
+        f"[BATCH] Processed {runner.processed} queries in {elapsed:.1f}s "
+        f"(errors: {runner.errors}, deduped parses: {runner.deduped_parses}, deduped searches: {runner.deduped_searches})",
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
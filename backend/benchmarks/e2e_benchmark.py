@@ -0,0 +1,290 @@
+"""エンドツーエンドのベンチマーク
+
+ローカルのスタブサーバー（ホットペッパー / Ollama）を起動し、それを向くように
+設定したアプリに /search と /price-comparison のリクエストを並列に送って、
+エンドポイントごとのレイテンシ（p50 / p95 / p99）とスループットを出力する。
+APIキーやネットワーク接続は不要。
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/e2e_benchmark.py --requests 500 --concurrency 16
+    python benchmarks/e2e_benchmark.py --hotpepper-latency 0.2 --error-rate 0.05 --json result.json
+    python benchmarks/e2e_benchmark.py --server asgi --concurrency 64
+    python benchmarks/e2e_benchmark.py --timeout-rate 0.05 --drop-rate 0.05 --request-timeout 1
+
+計測中にアプリが出力したログにAPIキーが含まれていた場合は、件数を表示して終了コード1で終わる。
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.stub_servers import HotPepperStub, OllamaStub
+
+# スタブに渡すAPIキー（ログへの漏れを検出できるよう、他の文字列と紛れない値にする）
+BENCHMARK_API_KEY = 'e2e-benchmark-secret-key'
+
+# 辞書マッチで解析できるクエリ
+DIRECT_QUERIES = [
+    '渋谷 イタリアン', '新宿の居酒屋', '銀座で高級な寿司', '池袋 ラーメン', '恵比寿でデート ディナー',
+    '六本木 焼肉', '表参道のカフェ', '上野 中華 安い', '品川で接待', '吉祥寺 フレンチ'
+]
+
+# 辞書マッチに掛からず LLM にフォールバックするクエリ
+LLM_QUERIES = [
+    '落ち着いた雰囲気で話せるお店', '記念日にふさわしい特別な場所', '友達とわいわい楽しめるところ',
+    '静かに一人で過ごせる店', '仕事帰りにさくっと寄れる店'
+]
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(ratio * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def reserve_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(args: argparse.Namespace, hotpepper_url: str, llm_url: str, work_dir: str) -> None:
+    """スタブを向くよう環境変数を設定（config は最初の import 時に環境変数を読むため、スタブやアプリより前に呼ぶ）"""
+    os.environ.update({
+        'HOTPEPPER_API_KEY': BENCHMARK_API_KEY,
+        'HOTPEPPER_API_URL': hotpepper_url + '/hotpepper/gourmet/v1/',
+        'LLM_ENDPOINT': llm_url + '/api/generate',
+        'LLM_PARSE_CACHE_PATH': os.path.join(work_dir, 'llm_parse_cache.sqlite3'),
+        'SHOP_STORE_ENABLED': 'False',
+        'REQUEST_TIMEOUT': str(args.request_timeout),
+        'HOTPEPPER_RATE_LIMIT': str(args.hotpepper_rate_limit),
+        'LOG_LEVEL': args.log_level
+    })
+    if not args.with_caches:
+        # キャッシュを無効にして毎回アップストリームまでの経路を計測する
+        for name in ('HOTPEPPER_CACHE_TTL', 'SEARCH_RESPONSE_CACHE_TTL', 'LLM_PARSE_CACHE_TTL', 'LLM_PARSE_CACHE_NEGATIVE_TTL'):
+            os.environ[name] = '0'
+
+
+class SecretLeakHandler(logging.Handler):
+    """アプリのログにAPIキーがそのまま含まれていないかを数える
+
+    出力時のフォーマッタでも伏せられるが、ここでは伏せる前のメッセージと付加項目を調べ、
+    呼び出し側で例外メッセージ（要求URL）などをそのまま渡していないかを確認する。
+    """
+
+    def __init__(self, secret: str):
+        super().__init__()
+        self.secret = secret
+        self.leaks: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        text = f"{record.getMessage()} {getattr(record, 'data', '')}"
+        if self.secret in text:
+            self.leaks.append(f"{record.name}: {record.getMessage()[:200]}")
+
+
+def start_app() -> Tuple[Any, str]:
+    from werkzeug.serving import make_server
+    from app import app
+
+    # リクエストごとのアクセスログは計測の妨げになるので出さない
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class _UvicornServer:
+    """uvicorn をバックグラウンドスレッドで動かす（start_app と同じく shutdown() で止める）"""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from asgi_app import app
+
+        self._server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started and self._thread.is_alive():
+            time.sleep(0.01)
+
+    def shutdown(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def start_asgi_app() -> Tuple[Any, str]:
+    port = reserve_port()
+    return _UvicornServer(port), f"http://127.0.0.1:{port}"
+
+
+def build_plan(args: argparse.Namespace, shop_ids: List[str], count: int, rng: random.Random) -> List[Tuple[str, Dict[str, Any]]]:
+    """送信するリクエスト（エンドポイント, JSON本体）の一覧を作成"""
+    plan = []
+    for index in range(count):
+        if rng.random() < args.price_ratio:
+            plan.append(('/price-comparison', {'restaurant_id': f"hotpepper_{rng.choice(shop_ids)}"}))
+        elif rng.random() < args.llm_query_ratio:
+            # 番号を付けて言い回しを変え、解析キャッシュに当たらないようにする
+            plan.append(('/search', {'query': f"{rng.choice(LLM_QUERIES)} {index}"}))
+        else:
+            body: Dict[str, Any] = {'query': rng.choice(DIRECT_QUERIES)}
+            if args.limit:
+                body['limit'] = args.limit
+            plan.append(('/search', body))
+    return plan
+
+
+def run_plan(base_url: str, plan: List[Tuple[str, Dict[str, Any]]], concurrency: int) -> Tuple[Dict[str, Dict[str, list]], float]:
+    """計画したリクエストを並列に送り、エンドポイントごとのレイテンシとエラーを集計"""
+    local = threading.local()
+    results: Dict[str, Dict[str, list]] = {}
+    results_lock = threading.Lock()
+
+    def send(item: Tuple[str, Dict[str, Any]]) -> None:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        path, body = item
+        started_at = time.perf_counter()
+        try:
+            response = local.session.post(base_url + path, json=body, headers={'Accept-Encoding': 'gzip'}, timeout=120)
+            ok = response.status_code == 200
+            response.content
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started_at
+        with results_lock:
+            entry = results.setdefault(path, {'latencies': [], 'errors': []})
+            entry['latencies'].append(elapsed)
+            if not ok:
+                entry['errors'].append(elapsed)
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, plan))
+    return results, time.perf_counter() - started_at
+
+
+def summarize(results: Dict[str, Dict[str, list]], duration: float) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {'duration_seconds': round(duration, 3), 'endpoints': {}}
+    total = 0
+    for path, entry in sorted(results.items()):
+        latencies = entry['latencies']
+        total += len(latencies)
+        summary['endpoints'][path] = {
+            'requests': len(latencies),
+            'errors': len(entry['errors']),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+            'throughput_rps': round(len(latencies) / duration, 2) if duration else 0.0
+        }
+    summary['throughput_rps'] = round(total / duration, 2) if duration else 0.0
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"{'endpoint':<20}{'requests':>9}{'errors':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'mean(ms)':>10}{'rps':>9}")
+    for path, stats in summary['endpoints'].items():
+        print(f"{path:<20}{stats['requests']:>9}{stats['errors']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['mean_ms']:>10}{stats['throughput_rps']:>9}")
+    print(f"total: {summary['throughput_rps']} req/s in {summary['duration_seconds']}s")
+    print(f"hotpepper stub: {summary['hotpepper_stub']}")
+    print(f"ollama stub: {summary['ollama_stub']}")
+    print(f"secret leaks in logs: {summary['secret_leaks']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ローカルスタブを使ったエンドツーエンドベンチマーク')
+    parser.add_argument('--requests', type=int, default=200, help='計測するリクエスト数')
+    parser.add_argument('--warmup', type=int, default=20, help='計測前に送るリクエスト数')
+    parser.add_argument('--concurrency', type=int, default=8, help='同時に送るリクエスト数')
+    parser.add_argument('--llm-query-ratio', type=float, default=0.2, help='/search のうちLLM解析になるクエリの割合')
+    parser.add_argument('--price-ratio', type=float, default=0.2, help='/price-comparison の割合')
+    parser.add_argument('--limit', type=int, default=0, help='/search の limit（0なら全件）')
+    parser.add_argument('--shops-per-area', type=int, default=250, help='スタブの1エリアあたりの店舗数')
+    parser.add_argument('--hotpepper-latency', type=float, default=0.05, help='ホットペッパースタブの平均応答遅延（秒）')
+    parser.add_argument('--hotpepper-jitter', type=float, default=0.01, help='ホットペッパースタブの遅延の標準偏差（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='ホットペッパースタブが500を返す割合')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='ホットペッパースタブが応答しない（タイムアウトさせる）割合')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='ホットペッパースタブが応答せずに切断する割合')
+    parser.add_argument('--request-timeout', type=float, default=10.0, help='アプリの上流呼び出しのタイムアウト（秒）')
+    parser.add_argument('--hotpepper-rate-limit', type=float, default=0.0,
+                        help='アプリのホットペッパー呼び出し制御（1秒あたり、既定 0 = 制限なしでアプリ自体を計測）')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Ollamaスタブの最初のトークンまでの遅延（秒）')
+    parser.add_argument('--llm-token-interval', type=float, default=0.005, help='Ollamaスタブのトークン間隔（秒）')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Ollamaスタブが500を返す割合')
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask', help='計測するサーバー（Flask / ASGIモード）')
+    parser.add_argument('--with-caches', action='store_true', help='アプリのキャッシュを有効にしたまま計測する')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--log-level', default='WARNING', help='アプリのログレベル')
+    parser.add_argument('--json', help='結果をJSONで書き出すファイル')
+    args = parser.parse_args()
+
+    hotpepper_port = reserve_port()
+    llm_port = reserve_port()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(args, f"http://127.0.0.1:{hotpepper_port}", f"http://127.0.0.1:{llm_port}", work_dir)
+        hotpepper = HotPepperStub(shops_per_area=args.shops_per_area, latency=args.hotpepper_latency,
+                                  jitter=args.hotpepper_jitter, error_rate=args.error_rate, seed=args.seed,
+                                  timeout_rate=args.timeout_rate, drop_rate=args.drop_rate, stall=args.request_timeout + 1)
+        ollama = OllamaStub(latency=args.llm_latency, token_interval=args.llm_token_interval,
+                            error_rate=args.llm_error_rate, seed=args.seed)
+        hotpepper.start(hotpepper_port)
+        ollama.start(llm_port)
+        leak_handler = SecretLeakHandler(BENCHMARK_API_KEY)
+        logging.getLogger('restaurant_seeker').addHandler(leak_handler)
+        server, base_url = start_asgi_app() if args.server == 'asgi' else start_app()
+        try:
+            rng = random.Random(args.seed)
+            shop_ids = sorted(hotpepper.shops_by_id)
+            if args.warmup:
+                run_plan(base_url, build_plan(args, shop_ids, args.warmup, rng), args.concurrency)
+            hotpepper.requests = hotpepper.errors = 0
+            ollama.requests = ollama.errors = 0
+
+            results, duration = run_plan(base_url, build_plan(args, shop_ids, args.requests, rng), args.concurrency)
+        finally:
+            server.shutdown()
+            hotpepper.stop()
+            ollama.stop()
+
+    summary = summarize(results, duration)
+    summary['config'] = vars(args)
+    summary['hotpepper_stub'] = {'requests': hotpepper.requests, 'errors': hotpepper.errors}
+    summary['ollama_stub'] = {'requests': ollama.requests, 'errors': ollama.errors,
+                              'tokens_sent': ollama.tokens_sent, 'cancelled': ollama.cancelled}
+    summary['secret_leaks'] = len(leak_handler.leaks)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump(summary, output, ensure_ascii=False, indent=2)
+
+    if leak_handler.leaks:
+        print(f"APIキーを含むログが {len(leak_handler.leaks)} 件あります:", file=sys.stderr)
+        for leak in leak_handler.leaks[:10]:
+            print(f"  {leak}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""CPU処理のマイクロベンチマーク（回帰チェック付き）
+
+クエリ解析・スコアリング・上位絞り込み・サンプルデータ生成の各関数を、記録済みの
+店舗フィクスチャ（50 / 300 / 5000件）で計測し、保存済みのベースラインと比較する。
+マッチスコア（_calculate_match_score）と推定評価（_estimate_rating_from_shop_data）は、
+検索で実際に使われる置き換え先の _score_shops_batch を score_shops_batch[50 / 300 / 5000] として計測する
+（1店舗ずつの関数は照合用の参照実装として残っているだけなので計測しない）。
+実行環境の速度差を打ち消すため、計測値は固定の較正ループの実行時間で割った相対値で
+保存・比較する。メモリ配置やハッシュのシードによる偏りはプロセスごとに固定されるため、
+計測は別プロセスで --repeats 回繰り返し、その中央値をベースラインとして保存・比較する。
+いずれかの項目がしきい値（既定 1.5倍）を超えて遅くなると終了コード1で終わる
+（ごく短い処理の揺らぎで失敗しないよう、増加が --min-delta-us マイクロ秒未満なら無視する）。
+計測の前に、_score_shops_batch の結果が1店舗ずつの参照実装（_calculate_match_score /
+_estimate_rating_from_shop_data）と全フィクスチャ・全検索条件で一致するかを照合し、
+一致しなければ計測せずに終了コード1で終わる。
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/micro_benchmark.py                     # ベースラインと比較
+    python benchmarks/micro_benchmark.py --update-baselines  # ベースラインを更新
+    python benchmarks/micro_benchmark.py --record-fixtures   # フィクスチャを再生成
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'micro_baselines.json')
+FIXTURE_SIZES = (50, 300, 5000)
+
+# 解析の計測に使うクエリ（単一語・複合・辞書に無い言い回しを混在させる）
+PARSE_QUERIES = [
+    '渋谷 イタリアン', '新宿でデートにおすすめのイタリアン', '銀座で高級な寿司', '池袋 ラーメン 安い',
+    '恵比寿で4人で飲み会', '六本木の焼肉 ディナー', '表参道のカフェでランチ', '「上野」 中華',
+    '品川駅近くで接待に使える和食', '落ち着いた雰囲気で話せるお店', '記念日にふさわしい特別な場所', 'ビール'
+]
+
+# スコアリング・絞り込みの計測に使う検索条件
+SEARCH_PARAMS = [
+    {'location': '渋谷', 'cuisine': 'イタリアン', 'category': 'デート', 'budget': 'medium'},
+    {'location': '新宿', 'cuisine': '居酒屋', 'category': '飲み会', 'budget': 'low'},
+    {'location': '銀座', 'cuisine': '和食', 'category': '接待', 'budget': 'high'},
+    {'location': None, 'cuisine': None, 'category': None, 'budget': None}
+]
+
+
+def fixture_path(size: int) -> str:
+    return os.path.join(FIXTURE_DIR, f"shops_{size}.json.gz")
+
+
+def record_fixtures(seed: int = 0) -> None:
+    """スタブの店舗生成器でフィクスチャを作成（取得時と同じく compact_shop で絞り込んだ形で保存）"""
+    from benchmarks.stub_servers import _areas, generate_shop
+    from restaurant_record import compact_shop
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    areas = _areas()
+    for size in FIXTURE_SIZES:
+        rng = random.Random(seed + size)
+        shops = []
+        for index in range(size):
+            area_code, area_name = areas[index % len(areas)]
+            shops.append(compact_shop(generate_shop(index, area_code, area_name, rng)))
+        with gzip.open(fixture_path(size), 'wt', encoding='utf-8') as output:
+            json.dump(shops, output, ensure_ascii=False, separators=(',', ':'))
+        print(f"recorded {fixture_path(size)}")
+
+
+def load_fixture(size: int) -> List[Dict[str, Any]]:
+    with gzip.open(fixture_path(size), 'rt', encoding='utf-8') as source:
+        return json.load(source)
+
+
+def calibration_loop() -> int:
+    """実行環境の速度を測るための固定処理（文字列操作と辞書参照を中心に、計測対象に近い内容）"""
+    table = {f"key{index}": index for index in range(64)}
+    total = 0
+    for index in range(2000):
+        text = f"東京都渋谷区{index}"
+        if '渋谷' in text:
+            total += table.get(f"key{index % 64}", 0)
+        total += len(text.lower())
+    return total
+
+
+def _loop_count(function: Callable[[], Any], target: float = 0.05) -> int:
+    """1回の計測がおよそ target 秒になるループ回数"""
+    number = 1
+    while True:
+        elapsed = timeit.Timer(function).timeit(number=number)
+        if elapsed >= target / 10:
+            return max(1, int(number * target / elapsed))
+        number *= 10
+
+
+def _time_per_call(function: Callable[[], Any], number: int) -> float:
+    return timeit.Timer(function).timeit(number=number) / number
+
+
+def build_cases(service: Any) -> List[Tuple[str, Callable[[], Any]]]:
+    """計測項目（名前, 関数）の一覧"""
+    from app import QUERY_KEYWORD_MATCHER
+
+    lowered_queries = [query.lower() for query in PARSE_QUERIES]
+    query_matches = [QUERY_KEYWORD_MATCHER.match(query) for query in lowered_queries]
+
+    cases: List[Tuple[str, Callable[[], Any]]] = [
+        ('extract_restaurant_keywords_directly',
+         lambda: [service._extract_restaurant_keywords_directly(query) for query in PARSE_QUERIES]),
+        ('parse_compound_restaurant_query',
+         lambda: [service._parse_compound_restaurant_query(query, None, None, None, matches)
+                  for query, matches in zip(lowered_queries, query_matches)]),
+        ('get_sample_restaurants',
+         lambda: [service._get_sample_restaurants(params, set()) for params in SEARCH_PARAMS])
+    ]
+
+    for size in FIXTURE_SIZES:
+        shops = load_fixture(size)
+        params = SEARCH_PARAMS[0]
+        match_scores, ratings = service._score_shops_batch(shops, params)
+        candidates = [
+            service._build_hotpepper_restaurant(shop, match_score, rating)
+            for shop, match_score, rating in zip(shops, match_scores, ratings)
+        ]
+        cases.extend([
+            # _calculate_match_score / _estimate_rating_from_shop_data の置き換え先（両方をまとめて計算する）
+            (f"score_shops_batch[{size}]",
+             lambda shops=shops: [service._score_shops_batch(shops, params) for params in SEARCH_PARAMS]),
+            (f"filter_top_restaurants[{size}]",
+             lambda candidates=candidates: service._filter_top_restaurants(candidates, params))
+        ])
+    return cases
+
+
+def check_scoring(service: Any) -> List[str]:
+    """_score_shops_batch と1店舗ずつの参照実装の結果を照合（一致しなかった店舗の説明を返す）"""
+    mismatches = []
+    for size in FIXTURE_SIZES:
+        shops = load_fixture(size)
+        for params in SEARCH_PARAMS:
+            match_scores, ratings = service._score_shops_batch(shops, params)
+            for index, shop in enumerate(shops):
+                expected = (service._calculate_match_score(shop, params), service._estimate_rating_from_shop_data(shop))
+                if (match_scores[index], ratings[index]) != expected:
+                    mismatches.append(
+                        f"shops_{size}[{index}] {params}: batch={(match_scores[index], ratings[index])} reference={expected}"
+                    )
+    return mismatches
+
+
+def measure(rounds: int, only: str = '') -> Tuple[float, Dict[str, float]]:
+    """1プロセスでの計測（(較正ループの時間, 計測項目ごとの相対値) を返す）
+
+    一時的な負荷の変動が特定の項目だけに偏らないよう、全項目を1回ずつ計測する巡回を
+    rounds 回繰り返し、項目ごとに直前の較正ループとの比の最小値を採用する。
+    """
+    from app import restaurant_service
+
+    cases = [(name, function) for name, function in build_cases(restaurant_service) if not only or only in name]
+    calibration_number = _loop_count(calibration_loop)
+    numbers = {name: _loop_count(function) for name, function in cases}
+
+    results: Dict[str, float] = {}
+    best_calibration = float('inf')
+    for _ in range(rounds):
+        for name, function in cases:
+            calibration = _time_per_call(calibration_loop, calibration_number)
+            best_calibration = min(best_calibration, calibration)
+            relative = _time_per_call(function, numbers[name]) / calibration
+            results[name] = min(results.get(name, relative), relative)
+    return best_calibration, results
+
+
+def run(repeats: int, rounds: int, only: str = '') -> Tuple[float, Dict[str, float]]:
+    """measure を別プロセスで repeats 回実行し、較正ループの時間と項目ごとの相対値の中央値を返す"""
+    calibrations: List[float] = []
+    samples: Dict[str, List[float]] = {}
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--rounds', str(rounds), '--only', only],
+            check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        # ログもstdoutに出るため、結果は最後の行から読む
+        measured = json.loads(output.strip().splitlines()[-1])
+        calibrations.append(measured['calibration'])
+        for name, value in measured['benchmarks'].items():
+            samples.setdefault(name, []).append(value)
+    return statistics.median(calibrations), {name: statistics.median(values) for name, values in samples.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='解析・スコアリング・絞り込みのマイクロベンチマーク')
+    parser.add_argument('--update-baselines', action='store_true', help='計測結果でベースラインを上書きする')
+    parser.add_argument('--record-fixtures', action='store_true', help='店舗フィクスチャを再生成する')
+    parser.add_argument('--threshold', type=float, default=1.5, help='回帰とみなすベースライン比')
+    parser.add_argument('--min-delta-us', type=float, default=50.0, help='1回あたりの増加がこの時間（マイクロ秒）未満なら誤差として無視する')
+    parser.add_argument('--repeats', type=int, default=5, help='計測するプロセスの数（項目ごとに中央値を採用）')
+    parser.add_argument('--rounds', type=int, default=3, help='1プロセス内で全項目を計測する巡回の回数（項目ごとに最小値を採用）')
+    parser.add_argument('--only', default='', help='名前にこの文字列を含む項目だけ計測する')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # アプリの import 前に、ローカルストアやログ出力など計測に関係しない処理を止める
+    work_dir = tempfile.mkdtemp(prefix='micro_benchmark_')
+    os.environ.update({
+        'SHOP_STORE_ENABLED': 'False',
+        'LLM_PARSE_CACHE_PATH': os.path.join(work_dir, 'llm_parse_cache.sqlite3'),
+        'LOG_LEVEL': 'WARNING'
+    })
+
+    if args.record_fixtures:
+        record_fixtures()
+        return
+
+    if args.worker:
+        calibration, results = measure(args.rounds, args.only)
+        print(json.dumps({'calibration': calibration, 'benchmarks': results}))
+        return
+
+    from app import restaurant_service
+
+    mismatches = check_scoring(restaurant_service)
+    if mismatches:
+        print(f"_score_shops_batch differs from the per-shop reference for {len(mismatches)} shop(s):")
+        for mismatch in mismatches[:10]:
+            print(f"  {mismatch}")
+        sys.exit(1)
+    print(f"scoring check: _score_shops_batch matches the per-shop reference on {', '.join(map(str, FIXTURE_SIZES))} shops")
+
+    calibration, results = run(args.repeats, args.rounds, args.only)
+    baselines: Dict[str, float] = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as source:
+            baselines = json.load(source).get('benchmarks', {})
+
+    print(f"calibration: {calibration * 1e6:.1f} us")
+    print(f"{'benchmark':<42}{'relative':>12}{'baseline':>12}{'ratio':>8}")
+    regressions = []
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        ratio = value / baseline if baseline else None
+        status = ''
+        # 増加量は相対値に較正ループの時間を掛けて実時間に直して判定する
+        if ratio is not None and ratio > args.threshold and (value - baseline) * calibration * 1e6 >= args.min_delta_us:
+            regressions.append(name)
+            status = '  REGRESSION'
+        print(f"{name:<42}{value:>12.3f}{baseline if baseline else float('nan'):>12.3f}"
+              f"{ratio if ratio is not None else float('nan'):>8.2f}{status}")
+
+    if args.update_baselines:
+        merged = dict(baselines, **results)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as output:
+            json.dump({'unit': 'calibration_loop', 'statistic': f"median of {args.repeats} processes",
+                       'benchmarks': dict(sorted(merged.items()))}, output, indent=2)
+            output.write('\n')
+        print(f"baselines updated: {BASELINE_PATH}")
+        return
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed beyond {args.threshold}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
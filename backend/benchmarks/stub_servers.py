@@ -0,0 +1,391 @@
+"""ベンチマーク用のローカルスタブサーバー
+
+- HotPepperStub: グルメサーチAPI（start/count のページング、results_available、
+  middle_area/genre/budget/keyword の絞り込み、id 指定の店舗取得）を模倣
+- OllamaStub: Ollama の /api/generate（NDJSONストリーミング）を模倣
+
+どちらも応答遅延とエラー率を設定でき、ネットワークやAPIキーなしで再現可能な計測ができる。
+HotPepperStub はさらに、応答しないまま待たせる（タイムアウト）・応答せずに切断する（接続エラー）障害も起こせる。
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# グルメサーチAPIの予算コード
+BUDGETS = [
+    ('B009', '～500円'), ('B010', '501～1000円'), ('B011', '1001～1500円'), ('B001', '1501～2000円'),
+    ('B002', '2001～3000円'), ('B003', '3001～4000円'), ('B008', '4001～5000円'), ('B004', '5001～7000円'),
+    ('B005', '7001～10000円'), ('B006', '10001～15000円'), ('B012', '15001～20000円'), ('B013', '20001～30000円'),
+    ('B014', '30001円～')
+]
+
+CATCH_PHRASES = [
+    '厳選食材のこだわり料理', '夜景が見える個室でデートに最適', '飲み放題付き宴会コースあり', '老舗の味を気軽に',
+    'ランチ営業中', 'カウンターで一人でも', 'ファミリー歓迎・キッズメニューあり', '極上の和牛を堪能', ''
+]
+
+
+def _genres() -> List[tuple]:
+    # config はアプリ側の環境変数を設定した後に読み込まれるよう、使う時点で import する
+    from config import Config
+    seen = {}
+    for name, code in Config.HOTPEPPER_GENRE_CODES.items():
+        seen.setdefault(code, name)
+    return sorted((code, name) for code, name in seen.items())
+
+
+def _areas() -> List[tuple]:
+    from config import Config
+    seen = {}
+    for name, code in Config.HOTPEPPER_AREA_CODES.items():
+        seen.setdefault(code, name)
+    return sorted((code, name) for code, name in seen.items())
+
+
+def generate_shop(index: int, area_code: str, area_name: str, rng: random.Random) -> Dict[str, Any]:
+    """グルメサーチAPIの shop と同じ項目構成の店舗データを生成"""
+    genre_code, genre_name = rng.choice(_genres())
+    budget_code, budget_name = rng.choice(BUDGETS)
+    shop_id = f"J{area_code[1:]}{index:06d}"
+    yes_no = lambda probability: 'あり' if rng.random() < probability else 'なし'
+    return {
+        'id': shop_id,
+        'name': f"{genre_name}ダイニング {area_name}{index}号店",
+        'logo_image': f"https://imgfp.hotp.jp/SYS/cmn/images/common/diary/custom/m30_img_noimage.gif",
+        'name_kana': f"だいにんぐ{index}",
+        'address': f"東京都{area_name}区{area_name}{rng.randint(1, 5)}-{rng.randint(1, 30)}-{rng.randint(1, 20)} {area_name}ビル{rng.randint(1, 9)}F",
+        'station_name': area_name,
+        'ktai_coupon': 0,
+        'large_service_area': {'code': 'SS10', 'name': '関東'},
+        'service_area': {'code': 'SA11', 'name': '東京'},
+        'large_area': {'code': 'Z011', 'name': '東京'},
+        'middle_area': {'code': area_code, 'name': area_name},
+        'small_area': {'code': f"X{index % 100:03d}", 'name': f"{area_name}駅周辺"},
+        'lat': 35.6 + rng.random() / 10,
+        'lng': 139.7 + rng.random() / 10,
+        'genre': {'name': genre_name, 'catch': f"{area_name}の{genre_name}", 'code': genre_code},
+        'sub_genre': {'name': rng.choice(_genres())[1], 'code': rng.choice(_genres())[0]},
+        'budget': {'code': budget_code, 'name': budget_name, 'average': budget_name},
+        'budget_memo': 'お通し代300円',
+        'catch': rng.choice(CATCH_PHRASES),
+        'capacity': rng.randint(10, 120),
+        'access': f"{area_name}駅東口徒歩{rng.randint(1, 10)}分",
+        'mobile_access': f"{area_name}駅徒歩{rng.randint(1, 10)}分",
+        'urls': {'pc': f"https://www.hotpepper.jp/str{shop_id}/"},
+        'photo': {
+            'pc': {
+                'l': f"https://imgfp.hotp.jp/IMGH/{index:06d}/{shop_id}_l.jpg" if rng.random() < 0.8 else '',
+                'm': f"https://imgfp.hotp.jp/IMGH/{index:06d}/{shop_id}_m.jpg",
+                's': f"https://imgfp.hotp.jp/IMGH/{index:06d}/{shop_id}_s.jpg"
+            },
+            'mobile': {
+                'l': f"https://imgfp.hotp.jp/IMGH/{index:06d}/{shop_id}_168.jpg",
+                's': f"https://imgfp.hotp.jp/IMGH/{index:06d}/{shop_id}_100.jpg"
+            }
+        },
+        'open': '月～金: 11:30～14:00 （料理L.O. 13:30）17:00～23:00' if rng.random() < 0.9 else '',
+        'close': '年末年始',
+        'party_capacity': rng.randint(10, 80),
+        'wifi': yes_no(0.4),
+        'wedding': 'お気軽にお問い合わせください',
+        'course': yes_no(0.6),
+        'free_drink': yes_no(0.5),
+        'free_food': yes_no(0.2),
+        'private_room': yes_no(0.4),
+        'horigotatsu': yes_no(0.2),
+        'tatami': yes_no(0.2),
+        'card': '利用可' if rng.random() < 0.7 else '利用不可',
+        'non_smoking': '全面禁煙' if rng.random() < 0.6 else '一部禁煙',
+        'charter': '貸切可' if rng.random() < 0.3 else '貸切不可',
+        'ktai': 'あり',
+        'parking': yes_no(0.2),
+        'barrier_free': yes_no(0.2),
+        'other_memo': '',
+        'sommelier': 'なし',
+        'open_air': 'なし',
+        'show': 'なし',
+        'equipment': 'なし',
+        'karaoke': 'なし',
+        'band': '不可',
+        'tv': 'なし',
+        'english': 'なし',
+        'pet': '不可',
+        'child': 'お子様連れ歓迎' if rng.random() < 0.5 else 'お子様連れ不可',
+        'lunch': yes_no(0.5),
+        'midnight': '営業していない',
+        'shop_detail_memo': '',
+        'coupon_urls': {'pc': f"https://www.hotpepper.jp/str{shop_id}/map/", 'sp': f"https://www.hotpepper.jp/str{shop_id}/scoupon/"}
+    }
+
+
+def generate_area_shops(shops_per_area: int, seed: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """全中エリアの店舗データを生成（シードが同じなら同じ内容）"""
+    rng = random.Random(seed)
+    return {
+        area_code: [generate_shop(index, area_code, area_name, rng) for index in range(shops_per_area)]
+        for area_code, area_name in _areas()
+    }
+
+
+class _BacklogHTTPServer(ThreadingHTTPServer):
+    # 既定の listen キュー（5）では多数の同時接続で接続拒否が起きるため広げる
+    request_queue_size = 1024
+
+
+class _StubServer:
+    """ThreadingHTTPServer をバックグラウンドで動かす共通部分"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._server: Optional[_BacklogHTTPServer] = None
+
+    def start(self, port: int = 0) -> str:
+        stub = self
+
+        class Handler(self.handler_class):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+        Handler.stub = stub
+        self._server = _BacklogHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def delay(self) -> float:
+        with self._rng_lock:
+            return max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+
+    def should_fail(self) -> bool:
+        with self._rng_lock:
+            failed = self._rng.random() < self.error_rate
+        with self._stats_lock:
+            self.requests += 1
+            if failed:
+                self.errors += 1
+        return failed
+
+
+class _HotPepperHandler(BaseHTTPRequestHandler):
+    stub: 'HotPepperStub'
+
+    def do_GET(self):
+        stub = self.stub
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        time.sleep(stub.delay())
+
+        fault = stub.fault()
+        if fault == 'timeout':
+            time.sleep(stub.stall)
+        if fault in ('timeout', 'drop'):
+            # 応答を返さずに接続を閉じる
+            self.close_connection = True
+            return
+        if fault == 'error':
+            self._send(500, {'error': 'stub failure'})
+            return
+        if not query.get('key'):
+            self._send(200, {'results': {'api_version': '1.26', 'error': [{'message': 'APIキーまたはIPアドレスの認証エラーです', 'code': 2000}]}})
+            return
+        self._send(200, {'results': stub.search(query)})
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HotPepperStub(_StubServer):
+    """グルメサーチAPIのスタブ"""
+
+    handler_class = _HotPepperHandler
+
+    def __init__(self, shops_per_area: int = 250, latency: float = 0.05, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0, timeout_rate: float = 0.0, drop_rate: float = 0.0,
+                 stall: float = 15.0):
+        super().__init__(latency, jitter, error_rate, seed)
+        self.timeout_rate = timeout_rate  # stall 秒待たせてから応答せずに切断する割合
+        self.drop_rate = drop_rate  # すぐに応答せずに切断する割合
+        self.stall = stall
+        self.shops_by_area = generate_area_shops(shops_per_area, seed)
+        self.shops_by_id = {shop['id']: shop for shops in self.shops_by_area.values() for shop in shops}
+
+    def fault(self) -> Optional[str]:
+        """このリクエストで起こす障害（'error' / 'timeout' / 'drop'、なければNone）"""
+        with self._rng_lock:
+            draw = self._rng.random()
+        if draw < self.error_rate:
+            fault = 'error'
+        elif draw < self.error_rate + self.timeout_rate:
+            fault = 'timeout'
+        elif draw < self.error_rate + self.timeout_rate + self.drop_rate:
+            fault = 'drop'
+        else:
+            fault = None
+        with self._stats_lock:
+            self.requests += 1
+            if fault is not None:
+                self.errors += 1
+        return fault
+
+    def search(self, query: Dict[str, str]) -> Dict[str, Any]:
+        if query.get('id'):
+            shops = [self.shops_by_id[query['id']]] if query['id'] in self.shops_by_id else []
+        else:
+            if query.get('middle_area'):
+                shops = self.shops_by_area.get(query['middle_area'], [])
+            else:
+                shops = [shop for area_shops in self.shops_by_area.values() for shop in area_shops]
+            if query.get('genre'):
+                shops = [shop for shop in shops if shop['genre']['code'] == query['genre']]
+            if query.get('budget'):
+                shops = [shop for shop in shops if shop['budget']['code'] == query['budget']]
+            if query.get('keyword'):
+                words = query['keyword'].split()
+                shops = [
+                    shop for shop in shops
+                    if all(word in f"{shop['name']} {shop['address']} {shop['genre']['name']} {shop['catch']}" for word in words)
+                ]
+
+        start = max(int(query.get('start', 1)), 1)
+        count = min(max(int(query.get('count', 10)), 1), 100)
+        page = shops[start - 1:start - 1 + count]
+        return {
+            'api_version': '1.26',
+            'results_available': len(shops),
+            'results_returned': str(len(page)),
+            'results_start': start,
+            'shop': page
+        }
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    stub: 'OllamaStub'
+
+    def do_POST(self):
+        stub = self.stub
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(stub.delay())
+
+        if stub.should_fail():
+            body = b'{"error": "stub failure"}'
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        text = stub.response_text(payload.get('prompt', ''))
+        if not payload.get('stream', True):
+            body = json.dumps({'model': payload.get('model'), 'response': text, 'done': True}, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for position in range(0, len(text), stub.chars_per_token):
+                self._write_chunk({'model': payload.get('model'), 'response': text[position:position + stub.chars_per_token], 'done': False})
+                stub.count_token()
+                if stub.token_interval:
+                    time.sleep(stub.token_interval)
+            self._write_chunk({'model': payload.get('model'), 'response': '', 'done': True})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアントが生成途中で接続を閉じた（早期打ち切り）
+            stub.count_cancel()
+            self.close_connection = True
+
+    def _write_chunk(self, chunk: Dict[str, Any]) -> None:
+        line = (json.dumps(chunk, ensure_ascii=False) + '\n').encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+
+class OllamaStub(_StubServer):
+    """Ollama /api/generate のスタブ
+
+    プロンプト中のユーザークエリに地域名が含まれていればそれを、なければクエリの
+    ハッシュで選んだ地域を返す。JSONの後ろに説明文が続くため、早期打ち切りの効果も計測できる。
+    """
+
+    handler_class = _OllamaHandler
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, token_interval: float = 0.01,
+                 trailing_tokens: int = 40, chars_per_token: int = 4, error_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency, jitter, error_rate, seed)
+        self.token_interval = token_interval
+        self.trailing_tokens = trailing_tokens
+        self.chars_per_token = chars_per_token
+        self.tokens_sent = 0
+        self.cancelled = 0
+        self.cuisines = [name for _, name in _genres()]
+        self._check_cuisines()
+
+    def _check_cuisines(self) -> None:
+        """解析結果の cuisine がアプリのジャンル指定（HOTPEPPER_GENRE_CODES）で使える名前か確認"""
+        from config import Config
+        unknown = [name for name in self.cuisines if name not in Config.HOTPEPPER_GENRE_CODES]
+        if unknown:
+            raise ValueError(f"OllamaStub cuisines are not genre names known to the app: {unknown}")
+
+    def response_text(self, prompt: str) -> str:
+        found = re.search(r'ユーザークエリ: "(.*)"', prompt)
+        user_query = found.group(1) if found else prompt
+        areas = sorted(name for _, name in _areas())
+        location = next((area for area in areas if area in user_query), areas[sum(map(ord, user_query)) % len(areas)])
+        cuisine = self.cuisines[len(user_query) % len(self.cuisines)]
+        parsed = {
+            'location': location,
+            'cuisine': cuisine,
+            'category': None,
+            'budget': 'medium',
+            'party_size': None,
+            'time_preference': 'dinner'
+        }
+        explanation = '以上の情報を抽出しました。' + '補足説明です。' * self.trailing_tokens
+        return f"以下が抽出結果です。\n{json.dumps(parsed, ensure_ascii=False, indent=2)}\n{explanation}"
+
+    def count_token(self) -> None:
+        with self._stats_lock:
+            self.tokens_sent += 1
+
+    def count_cancel(self) -> None:
+        with self._stats_lock:
+            self.cancelled += 1
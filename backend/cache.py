@@ -0,0 +1,494 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+# 他のプロセスが書き込み中の場合に待つ時間（秒）
+SQLITE_BUSY_TIMEOUT = 5.0
+
+
+def _key_text(key: Hashable) -> str:
+    """プロセス間で共有するキャッシュのキー文字列（タプルなどはJSONにする）"""
+    if isinstance(key, str):
+        return key
+    return json.dumps(key, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class TTLCache:
+    """TTL付きLRUキャッシュ（スレッドセーフ）
+
+    エントリ数とバイト数の両方に上限を持ち、どちらかを超えた場合は
+    最も長く参照されていないエントリから追い出す。
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: int = 1, ttl: Optional[float] = None) -> None:
+        if size > self.max_bytes:
+            return  # 単体で上限を超えるものはキャッシュしない
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class PersistentCache:
+    """SQLiteに保存する永続キャッシュ（再起動後も保持される）
+
+    値はJSONとして保存する。期限切れのエントリは参照時と書き込み時に削除し、
+    エントリ数が上限を超えた場合は最終参照が古いものから追い出す。
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT)
+        # 複数のワーカープロセスが同じファイルを読み書きしても読み込みが待たされないようにする
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+                self._conn.commit()
+                self.misses += 1
+                return default
+
+            self._conn.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), now + ttl, now)
+            )
+            self._conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,))
+
+            # 上限を超えた分を最終参照の古い順に削除
+            count = self._conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    'DELETE FROM cache_entries WHERE key IN '
+                    '(SELECT key FROM cache_entries ORDER BY accessed_at ASC LIMIT ?)',
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SharedSQLiteCache:
+    """同一ホストの複数ワーカープロセスで共有するキャッシュ（SQLite・WALモード）
+
+    TTLCache と同じインターフェースで、値はJSONとして保存する。書き込みは
+    BEGIN IMMEDIATE のトランザクション内で行い、保存と期限切れ・上限超過分の削除を
+    まとめて反映する（エントリ数・size の合計のどちらかが上限を超えた場合は
+    最終参照が古いものから追い出す）。namespace ごとに上限を持つため、
+    複数のキャッシュで1つのファイルを共有できる。接続はプロセスごとに作り直す（fork 後も安全）。
+    読み書きは呼び出したスレッドを止め、他のプロセスが書き込み中なら最大 SQLITE_BUSY_TIMEOUT 秒待つため、
+    イベントループからは asyncio.to_thread などで別スレッドに渡して呼ぶ。
+    """
+
+    # 参照時刻の更新間隔（秒）。参照のたびに書き込むと読み込み同士が書き込みロックを取り合うため
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, path: str, namespace: str, ttl: float, max_entries: int, max_bytes: int):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """現在のプロセス用の接続（ロックを取得した状態で呼ぶ）"""
+        if self._conn is None or self._pid != os.getpid():
+            # isolation_level=None: トランザクションは BEGIN IMMEDIATE で明示的に開始する
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            self._pid = os.getpid()
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS shared_cache ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, key))'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_shared_cache_accessed ON shared_cache (namespace, accessed_at)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_shared_cache_expires ON shared_cache (namespace, expires_at)')
+        return self._conn
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        key_text = _key_text(key)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, expires_at, accessed_at FROM shared_cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key_text)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, accessed_at = row
+            if expires_at <= now:
+                # 期限切れの行は次の書き込み時にまとめて削除する
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            if now - accessed_at >= self.TOUCH_INTERVAL:
+                conn.execute(
+                    'UPDATE shared_cache SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                    (now, self.namespace, key_text)
+                )
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: Hashable, value: Any, size: int = 1, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if size > self.max_bytes or ttl <= 0:
+            return  # 単体で上限を超えるもの・有効期間のないものはキャッシュしない
+
+        key_text = _key_text(key)
+        value_text = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO shared_cache (namespace, key, value, size, expires_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.namespace, key_text, value_text, size, now + ttl, now)
+                )
+                conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND expires_at <= ?', (self.namespace, now))
+                self.evictions += self._evict_overflow(conn)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _evict_overflow(self, conn: sqlite3.Connection) -> int:
+        """上限を超えた分を最終参照の古い順に削除し、削除件数を返す（トランザクション内で呼ぶ）"""
+        entries, total_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM shared_cache WHERE namespace = ?', (self.namespace,)
+        ).fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return 0
+
+        victims = []
+        for key_text, size in conn.execute(
+            'SELECT key, size FROM shared_cache WHERE namespace = ? ORDER BY accessed_at ASC', (self.namespace,)
+        ):
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            victims.append((self.namespace, key_text))
+            entries -= 1
+            total_bytes -= size
+        conn.executemany('DELETE FROM shared_cache WHERE namespace = ? AND key = ?', victims)
+        return len(victims)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._connection().execute(
+                'DELETE FROM shared_cache WHERE namespace = ? AND key = ?', (self.namespace, _key_text(key))
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection().execute('DELETE FROM shared_cache WHERE namespace = ?', (self.namespace,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total_bytes = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM shared_cache WHERE namespace = ? AND expires_at > ?',
+                (self.namespace, time.time())
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'entries': entries,
+                'bytes': total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+class RedisCache:
+    """Redis（互換サーバーを含む）に保存する、複数ホストで共有できるキャッシュ
+
+    TTLCache と同じインターフェースで、値はJSONとして保存する。有効期間は Redis の
+    有効期限（PX）で管理し、エントリ数の上限は namespace ごとのインデックス（sorted set、
+    スコアは期限切れ時刻）で管理する。保存と上限超過分の削除は Lua スクリプトで
+    アトミックに行う（期限切れが近いものから追い出す）。バイト数の上限はサーバー側の
+    maxmemory / maxmemory-policy に任せ、max_bytes は単体で大きすぎる値を保存しない判定にだけ使う。
+    """
+
+    _SET_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+redis.call('ZADD', KEYS[2], tonumber(ARGV[3]) + tonumber(ARGV[2]), KEYS[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])
+local overflow = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if overflow <= 0 then
+    return 0
+end
+local victims = redis.call('ZRANGE', KEYS[2], 0, overflow - 1)
+for _, victim in ipairs(victims) do
+    redis.call('DEL', victim)
+end
+redis.call('ZREM', KEYS[2], unpack(victims))
+return #victims
+"""
+
+    def __init__(self, url: str, namespace: str, ttl: float, max_entries: int, max_bytes: int, prefix: str = 'restaurant_seeker'):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND=redis には redis パッケージが必要です（pip install redis）')
+        self.url = url
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._key_prefix = f"{prefix}:{namespace}:"
+        self._index_key = f"{prefix}:{namespace}:__index__"
+        self._client = redis.Redis.from_url(url)
+        self._set_script = self._client.register_script(self._SET_SCRIPT)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._client.get(self._key_prefix + _key_text(key))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: Hashable, value: Any, size: int = 1, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        ttl_ms = int(ttl * 1000)
+        if size > self.max_bytes or ttl_ms <= 0:
+            return  # 単体で上限を超えるもの・有効期間のないものはキャッシュしない
+
+        value_text = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        evicted = self._set_script(
+            keys=[self._key_prefix + _key_text(key), self._index_key],
+            args=[value_text, ttl_ms, int(time.time() * 1000), self.max_entries]
+        )
+        if evicted:
+            with self._lock:
+                self.evictions += int(evicted)
+
+    def delete(self, key: Hashable) -> None:
+        entry_key = self._key_prefix + _key_text(key)
+        pipeline = self._client.pipeline()
+        pipeline.delete(entry_key)
+        pipeline.zrem(self._index_key, entry_key)
+        pipeline.execute()
+
+    def clear(self) -> None:
+        entry_keys = self._client.zrange(self._index_key, 0, -1)
+        pipeline = self._client.pipeline()
+        if entry_keys:
+            pipeline.delete(*entry_keys)
+        pipeline.delete(self._index_key)
+        pipeline.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._client.zcount(self._index_key, int(time.time() * 1000), '+inf')
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'redis',
+                'url': self.url.split('@')[-1],  # 認証情報は表示しない
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_cache(namespace: str, ttl: float, max_entries: int, max_bytes: int, backend: Optional[str] = None) -> Any:
+    """Config.CACHE_BACKEND（memory / sqlite / redis）に応じたキャッシュを作成
+
+    いずれも get / set / delete / clear / stats を持つ（TTLCache と同じインターフェース）。
+    """
+    from config import Config
+
+    backend = (backend or Config.CACHE_BACKEND).lower()
+    if backend == 'memory':
+        return TTLCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    if backend == 'sqlite':
+        return SharedSQLiteCache(Config.SHARED_CACHE_PATH, namespace, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    if backend == 'redis':
+        return RedisCache(Config.REDIS_URL, namespace, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes,
+                          prefix=Config.CACHE_KEY_PREFIX)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,96 @@
+"""上流サービスの回路遮断（サーキットブレーカー）
+
+連続して failure_threshold 回失敗すると回路を開き（open）、recovery_time 秒の間は
+呼び出しを行わずにすぐ失敗させる。その後は1件だけ試しに呼び出し（half_open）、
+成功すれば閉じ（closed）、失敗すれば再び開く。
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from log_config import get_logger
+from metrics import CIRCUIT_REJECTIONS_TOTAL, CIRCUIT_STATE
+
+logger = get_logger('circuit')
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+# メトリクスで出力する状態の値
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """回路が開いているため呼び出さなかった"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, recovery_time: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_time = recovery_time
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+        CIRCUIT_STATE.set_function(lambda: STATE_VALUES[self.state], name=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_time:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """呼び出してよいか（half_open の間は試しの1件だけ許可する）"""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_time:
+                    CIRCUIT_REJECTIONS_TOTAL.inc(name=self.name)
+                    return False
+                self._transition(HALF_OPEN)
+
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    CIRCUIT_REJECTIONS_TOTAL.inc(name=self.name)
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """結果を待たずに打ち切った呼び出し（成功・失敗のどちらにも数えず、試しの枠だけ戻す）"""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_time': self.recovery_time
+            }
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"Circuit {self.name}: {self._state} -> {state} (consecutive failures: {self._failures})")
+        self._state = state
@@ -8,10 +8,65 @@ class Config:
     # LLM設定
     LLM_ENDPOINT = os.getenv('LLM_ENDPOINT', 'http://localhost:11434/api/generate')
     LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-oss-20b')
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))  # LLM応答の待ち時間上限（秒）
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))  # 連続でこの回数失敗したらLLMへの問い合わせを止める
+    LLM_BREAKER_RECOVERY_TIME = float(os.getenv('LLM_BREAKER_RECOVERY_TIME', '30'))  # 止めてから試しに1件問い合わせるまでの時間（秒）
+    
+    # LLMの予備リクエスト（主系の応答が遅い場合に、別のエンドポイントまたはモデルにも問い合わせる）
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'False').lower() == 'true'
+    LLM_HEDGE_ENDPOINT = os.getenv('LLM_HEDGE_ENDPOINT', '') or LLM_ENDPOINT  # 未指定なら主系と同じエンドポイント
+    LLM_HEDGE_MODEL = os.getenv('LLM_HEDGE_MODEL', '') or LLM_MODEL  # 未指定なら主系と同じモデル
+    LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '0.95'))  # 主系の所要時間のこのパーセンタイルを過ぎたら予備に送る
+    LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '0.5'))  # 予備に送るまでの最短の待ち時間（秒）
+    LLM_HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '3'))  # 所要時間の計測が20件に満たない間の待ち時間（秒）
+    LLM_HEDGE_WORKERS = int(os.getenv('LLM_HEDGE_WORKERS', '32'))  # 予備リクエスト使用時のLLM呼び出し用ワーカー数
+    
+    # LLM解析結果キャッシュ設定
+    LLM_PARSE_CACHE_PATH = os.getenv('LLM_PARSE_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'llm_parse_cache.sqlite3'))
+    LLM_PARSE_CACHE_MAX_ENTRIES = int(os.getenv('LLM_PARSE_CACHE_MAX_ENTRIES', '10000'))  # 保存する最大件数
+    LLM_PARSE_CACHE_MAX_BYTES = int(os.getenv('LLM_PARSE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))  # 最大サイズ（バイト、CACHE_BACKEND=redis の場合）
+    LLM_PARSE_CACHE_TTL = float(os.getenv('LLM_PARSE_CACHE_TTL', str(7 * 24 * 3600)))  # 解析成功時の有効期間（秒）
+    LLM_PARSE_CACHE_NEGATIVE_TTL = float(os.getenv('LLM_PARSE_CACHE_NEGATIVE_TTL', '300'))  # LLMが応答したが何も抽出できなかった結果の有効期間（秒。LLMの障害時はキャッシュしない）
+    
+    # キャッシュのバックエンド（ホットペッパー応答・カーソル用検索結果。redis の場合はLLM解析結果も）
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')  # memory: プロセス内 / sqlite: 同一ホストのワーカーで共有 / redis: 複数ホストで共有
+    SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'shared_cache.sqlite3'))
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'restaurant_seeker')  # Redisのキーの接頭辞
     
     # ホットペッパーAPI設定
     HOTPEPPER_API_KEY = os.getenv('HOTPEPPER_API_KEY', '')
-    HOTPEPPER_API_URL = 'http://webservice.recruit.co.jp/hotpepper/gourmet/v1/'
+    HOTPEPPER_API_URL = os.getenv('HOTPEPPER_API_URL', 'http://webservice.recruit.co.jp/hotpepper/gourmet/v1/')
+    HOTPEPPER_PAGE_SIZE = 100  # 1ページあたりの取得件数（APIの最大値）
+    HOTPEPPER_MAX_PAGES = int(os.getenv('HOTPEPPER_MAX_PAGES', '3'))  # 1検索あたりの最大ページ数（上位50件が埋まっている場合）
+    HOTPEPPER_PREFETCH_MAX_PAGES = int(os.getenv('HOTPEPPER_PREFETCH_MAX_PAGES', '5'))  # ジャンルの絞り込みで上位50件が埋まらない場合に取得する最大ページ数
+    HOTPEPPER_FETCH_WORKERS = int(os.getenv('HOTPEPPER_FETCH_WORKERS', '8'))  # ページ並列取得のワーカー数
+    HOTPEPPER_CACHE_TTL = float(os.getenv('HOTPEPPER_CACHE_TTL', '600'))  # 検索結果キャッシュの有効期間（秒）
+    HOTPEPPER_CACHE_MAX_ENTRIES = int(os.getenv('HOTPEPPER_CACHE_MAX_ENTRIES', '512'))  # キャッシュする最大ページ数
+    HOTPEPPER_CACHE_MAX_BYTES = int(os.getenv('HOTPEPPER_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # キャッシュの最大サイズ（バイト）
+    HOTPEPPER_RATE_LIMIT = float(os.getenv('HOTPEPPER_RATE_LIMIT', '10'))  # 1秒あたりの呼び出し回数の上限（0以下なら制限しない）
+    HOTPEPPER_BURST = int(os.getenv('HOTPEPPER_BURST', '20'))  # 連続して呼び出せる最大回数
+    HOTPEPPER_DAILY_QUOTA = int(os.getenv('HOTPEPPER_DAILY_QUOTA', '0'))  # 1日あたりの呼び出し回数の上限（プロセスごと、0なら無制限）
+    HOTPEPPER_SPECULATIVE_RESERVE = float(os.getenv('HOTPEPPER_SPECULATIVE_RESERVE', '0.2'))  # 残りがこの割合以下なら2ページ目以降・フォールバックは呼ばない
+    HOTPEPPER_BACKGROUND_RESERVE = float(os.getenv('HOTPEPPER_BACKGROUND_RESERVE', '0.5'))  # 残りがこの割合以下ならバックグラウンド更新は呼ばない
+    HOTPEPPER_INTERACTIVE_MAX_WAIT = float(os.getenv('HOTPEPPER_INTERACTIVE_MAX_WAIT', '5'))  # 1ページ目・価格比較の順番待ちの上限（秒）
+    HOTPEPPER_SEARCH_DEADLINE = float(os.getenv('HOTPEPPER_SEARCH_DEADLINE', '8'))  # 1検索のページ取得の締め切り（秒、2ページ目以降・フォールバックはこれまで順番待ちする）
+    HOTPEPPER_MAX_QUEUE = int(os.getenv('HOTPEPPER_MAX_QUEUE', '200'))  # 順番待ちの最大数（超えた分は打ち切る）
+    
+    # ホットペッパー店舗のローカルストア設定
+    SHOP_STORE_ENABLED = os.getenv('SHOP_STORE_ENABLED', 'True').lower() == 'true'
+    SHOP_STORE_PATH = os.getenv('SHOP_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'shops.sqlite3'))
+    SHOP_STORE_MAX_AGE = float(os.getenv('SHOP_STORE_MAX_AGE', str(24 * 3600)))  # エリアデータの有効期間（秒）
+    
+    # /search レスポンスキャッシュ設定（エンコード・圧縮済みのレスポンスを保持）
+    SEARCH_RESPONSE_CACHE_TTL = float(os.getenv('SEARCH_RESPONSE_CACHE_TTL', '300'))  # 有効期間（秒）
+    SEARCH_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_RESPONSE_CACHE_MAX_ENTRIES', '256'))  # 保持する最大件数
+    SEARCH_RESPONSE_CACHE_MAX_BYTES = int(os.getenv('SEARCH_RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # 最大サイズ（バイト）
+    
+    # /search カーソルページング用の検索結果キャッシュ設定
+    SEARCH_RESULT_CACHE_TTL = float(os.getenv('SEARCH_RESULT_CACHE_TTL', '900'))  # カーソルの有効期間（秒）
+    SEARCH_RESULT_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_RESULT_CACHE_MAX_ENTRIES', '1000'))  # 保持する検索結果の最大件数
+    SEARCH_RESULT_CACHE_MAX_BYTES = int(os.getenv('SEARCH_RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 最大サイズ（バイト）
     
     # 食べログAPI設定 
     TABELOG_API_KEY = os.getenv('TABELOG_API_KEY', '')
@@ -21,6 +76,17 @@ class Config:
     REQUEST_TIMEOUT = 10
     REQUEST_DELAY = 1
     USER_AGENT = 'RestaurantSeeker/1.0'
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))  # 保持するホスト別プール数
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))  # 1ホストあたりの最大接続数
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'False').lower() == 'true'  # 接続上限到達時に空きを待つか
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '200'))  # ASGIモードの同時接続数の上限
+    ASYNC_HTTP_MAX_KEEPALIVE = int(os.getenv('ASYNC_HTTP_MAX_KEEPALIVE', '20'))  # ASGIモードで保持するkeep-alive接続数
+    
+    # ログ設定
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()  # 出力する最低レベル
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text または json
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0'))  # DEBUGログを出力するリクエストの割合（0〜1）
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # 出力待ちログの上限（超えた分は破棄）
     
     # デフォルト検索パラメータ
     DEFAULT_MAX_RESULTS = 20
@@ -71,7 +137,10 @@ class Config:
     
     # スクレイピング設定
     SCRAPING_DELAY = 2  # サイト間のリクエスト間隔（秒）
-    REQUEST_TIMEOUT = 10  # リクエストタイムアウト（秒）
+    PRICE_FETCH_WORKERS = int(os.getenv('PRICE_FETCH_WORKERS', '12'))  # 価格比較の並列ワーカー数
+    PRICE_SITE_TIMEOUT = float(os.getenv('PRICE_SITE_TIMEOUT', '5'))  # サイトごとのタイムアウト（秒）
+    PRICE_OVERALL_DEADLINE = float(os.getenv('PRICE_OVERALL_DEADLINE', '8'))  # 価格比較全体の締め切り（秒）
+    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '10'))  # リクエストタイムアウト（秒）
     
     # HTTP設定
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -0,0 +1,76 @@
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class HttpClient:
+    """上流API呼び出し用の共有HTTPクライアント
+
+    requests.Session をひとつだけ持ち、ホストごとのコネクションプールを
+    keep-alive で再利用する。Cookie は保存しないため、複数スレッドから
+    同時に get/post を呼び出してもセッションの状態は変化しない。
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, pool_block: bool = False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._session = self._create_session(pool_connections, pool_maxsize, pool_block)
+
+    @staticmethod
+    def _create_session(pool_connections: int, pool_maxsize: int, pool_block: bool) -> requests.Session:
+        session = requests.Session()
+        # Cookieを一切保存しない（スレッド間で状態を共有しないため）
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        # pool_connections: 保持するホスト別プールの数 / pool_maxsize: 1ホストあたりの接続数
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.post(url, **kwargs)
+
+    def close(self) -> None:
+        """プール中の接続をすべて閉じる"""
+        self._session.close()
+
+
+class AsyncHttpClient:
+    """ASGIモード用の非同期HTTPクライアント
+
+    httpx.AsyncClient をひとつだけ持ち、ノンブロッキングの接続プールを全リクエストで共有する。
+    応答待ちの間もスレッドを占有しないため、1プロセスで多数の上流呼び出しを同時に待てる。
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20):
+        if httpx is None:
+            raise RuntimeError('ASGIモードには httpx が必要です（pip install httpx）')
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        )
+
+    async def get(self, url: str, **kwargs: Any) -> 'httpx.Response':
+        return await self._client.get(url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs: Any):
+        """レスポンス本体を逐次読み込む（async with で使用し、抜けると接続を閉じる）"""
+        return self._client.stream(method, url, **kwargs)
+
+    async def aclose(self) -> None:
+        """プール中の接続をすべて閉じる"""
+        await self._client.aclose()
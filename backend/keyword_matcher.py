@@ -0,0 +1,97 @@
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class KeywordMatch(NamedTuple):
+    vocabulary: str
+    keyword: str
+    value: Any
+    start: int
+    end: int
+
+
+class KeywordMatcher:
+    """複数の語彙をまとめて照合するAho-Corasickオートマトン
+
+    起動時に一度だけ構築し、クエリ文字列を1回走査するだけで全語彙の
+    すべての出現位置（重なりを含む）を列挙する。同じキーワードが複数の
+    語彙に属していてもよい（例: '一人' はカテゴリと人数の両方）。
+    """
+
+    def __init__(self, vocabularies: Dict[str, Dict[str, Any]]):
+        self.vocabularies = list(vocabularies)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[tuple]] = [[]]  # node -> [(keyword, vocabulary, value), ...]
+        self._priority: Dict[tuple, int] = {}  # (vocabulary, keyword) -> 語彙内の定義順
+
+        for vocabulary, keywords in vocabularies.items():
+            for priority, (keyword, value) in enumerate(keywords.items()):
+                self._priority[(vocabulary, keyword)] = priority
+                self._add(keyword, vocabulary, value)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, vocabulary: str, value: Any) -> None:
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((keyword, vocabulary, value))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                # 失敗リンク先で終わるキーワードもこのノードで出力する
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """全語彙のキーワード出現をすべて列挙（重なりも含む）"""
+        matches = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            for keyword, vocabulary, value in self._outputs[node]:
+                matches.append(KeywordMatch(vocabulary, keyword, value, index - len(keyword) + 1, index + 1))
+        return matches
+
+    def match(self, text: str) -> Dict[str, Optional[KeywordMatch]]:
+        """語彙ごとに最良の一致を返す
+
+        同じ語彙内で出現位置が重なる場合は長い方を採用する（'large group' 中の
+        'group' など）。重ならない候補が複数残った場合は語彙の定義順で優先する。
+        """
+        grouped: Dict[str, List[KeywordMatch]] = {}
+        for found in self.find_all(text):
+            grouped.setdefault(found.vocabulary, []).append(found)
+
+        best: Dict[str, Optional[KeywordMatch]] = dict.fromkeys(self.vocabularies)
+        for vocabulary, candidates in grouped.items():
+            if len(candidates) == 1:
+                best[vocabulary] = candidates[0]
+                continue
+
+            kept: List[KeywordMatch] = []
+            for candidate in sorted(candidates, key=lambda m: (m.start - m.end, m.start)):
+                if all(candidate.end <= other.start or other.end <= candidate.start for other in kept):
+                    kept.append(candidate)
+            best[vocabulary] = min(kept, key=lambda m: self._priority[(vocabulary, m.keyword)])
+        return best
@@ -0,0 +1,461 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from http_client import AsyncHttpClient, HttpClient
+from log_config import submit_in_context
+from metrics import LLM_HEDGE_TOTAL
+
+
+class JSONObjectScanner:
+    """ストリームで届くテキストから最初の完全なJSONオブジェクトを検出する
+
+    文字列リテラル内の括弧やエスケープを考慮して '{' と '}' の対応を追跡し、
+    対応が閉じた時点で json.loads に成功すればそのオブジェクトを返す。
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._position = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        self.text += chunk
+        while self._position < len(self.text):
+            char = self.text[self._position]
+            self._position += 1
+
+            if self._start < 0:
+                if char == '{':
+                    self._start = self._position - 1
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self.text[self._start:self._position]
+                    try:
+                        parsed = json.loads(candidate)
+                    except json.JSONDecodeError:
+                        parsed = None
+                    if isinstance(parsed, dict):
+                        return parsed
+
+                    # 不正なオブジェクトだった場合は次の '{' から探し直す
+                    self._position = self._start + 1
+                    self._start = -1
+        return None
+
+
+class LLMStreamResult(NamedTuple):
+    status_code: int
+    text: str
+    parsed: Optional[Dict[str, Any]]
+    token_count: int
+    time_to_first_token: Optional[float]
+    tokens_per_second: Optional[float]
+    terminated_early: bool
+
+
+class LLMStreamReader:
+    """NDJSONの行を順に受け取り、JSONオブジェクトが揃った時点で読み込み終了を知らせる
+
+    同期・非同期クライアントで共通の処理（トークン数・最初のトークンまでの時間の計測を含む）。
+    """
+
+    def __init__(self, timeout: float):
+        self.scanner = JSONObjectScanner()
+        self.parsed: Optional[Dict[str, Any]] = None
+        self.token_count = 0
+        self.first_token_at: Optional[float] = None
+        self.finished = False
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + timeout
+
+    def feed_line(self, line: Any) -> bool:
+        """1行分を処理し、読み込みを打ち切るべきならTrueを返す"""
+        if not line:
+            return False
+
+        chunk = json.loads(line)
+        token = chunk.get('response', '')
+        if token:
+            self.token_count += 1
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+            self.parsed = self.scanner.feed(token)
+
+        if chunk.get('done'):
+            self.finished = True
+            return True
+        return self.parsed is not None or time.monotonic() > self.deadline
+
+    def result(self) -> LLMStreamResult:
+        ended_at = time.monotonic()
+        time_to_first_token = self.first_token_at - self.started_at if self.first_token_at is not None else None
+        tokens_per_second = None
+        if self.first_token_at is not None and ended_at > self.first_token_at:
+            tokens_per_second = self.token_count / (ended_at - self.first_token_at)
+
+        return LLMStreamResult(
+            status_code=200,
+            text=self.scanner.text,
+            parsed=self.parsed,
+            token_count=self.token_count,
+            time_to_first_token=time_to_first_token,
+            tokens_per_second=tokens_per_second,
+            terminated_early=self.parsed is not None and not self.finished
+        )
+
+
+class StreamingLLMClient:
+    """Ollama形式の /api/generate をストリーミングで呼び出すクライアント
+
+    トークンを逐次パースし、完全なJSONオブジェクトを読み終えた時点で
+    接続を閉じて生成を打ち切る（それ以降のトークンは生成させない）。
+    """
+
+    def __init__(self, http: HttpClient, endpoint: str, timeout: float):
+        self.http = http
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.stats = LLMStats()
+
+    def generate_json(self, payload: Dict[str, Any], cancel: Optional[threading.Event] = None) -> LLMStreamResult:
+        """cancel がセットされた場合は次の行を受け取った時点で読み込みを打ち切る"""
+        payload = dict(payload, stream=True)
+        reader = LLMStreamReader(self.timeout)
+
+        # with を抜けるとレスポンスが閉じられ、サーバー側の生成もキャンセルされる
+        with self.http.post(self.endpoint, json=payload, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                return LLMStreamResult(response.status_code, '', None, 0, None, None, False)
+
+            for line in response.iter_lines():
+                if reader.feed_line(line) or (cancel is not None and cancel.is_set()):
+                    break
+
+        result = reader.result()
+        self.stats.record(result)
+        return result
+
+
+class AsyncStreamingLLMClient:
+    """StreamingLLMClient の非同期版（ASGIモード用、待機中にスレッドを占有しない）"""
+
+    def __init__(self, http: AsyncHttpClient, endpoint: str, timeout: float, stats: Optional['LLMStats'] = None):
+        self.http = http
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.stats = stats or LLMStats()
+
+    async def generate_json(self, payload: Dict[str, Any]) -> LLMStreamResult:
+        payload = dict(payload, stream=True)
+        reader = LLMStreamReader(self.timeout)
+
+        # async with を抜けると未読のレスポンスごと接続が閉じられ、生成もキャンセルされる
+        async with self.http.stream('POST', self.endpoint, json=payload, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                return LLMStreamResult(response.status_code, '', None, 0, None, None, False)
+
+            async for line in response.aiter_lines():
+                if reader.feed_line(line):
+                    break
+
+        result = reader.result()
+        self.stats.record(result)
+        return result
+
+
+class LatencyWindow:
+    """直近の所要時間（秒）を保持し、パーセンタイルを返す"""
+
+    def __init__(self, size: int = 200):
+        self._values: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, ratio: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(ratio * len(values)))]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+
+class LLMTarget(NamedTuple):
+    name: str  # primary / hedge（メトリクスのラベル）
+    client: Any  # StreamingLLMClient または AsyncStreamingLLMClient
+    model: str
+    breaker: CircuitBreaker
+
+
+class _HedgingPolicy:
+    """回路遮断と予備リクエスト（ヘッジ）の共通部分
+
+    主系の呼び出しが「直近の主系の所要時間の percentile 値」を過ぎても終わらない場合に、
+    予備（別のエンドポイントまたはモデル）にも同じリクエストを送り、先に得られた
+    使える応答（JSONを解析できたもの）を採用する。主系の回路が開いている場合は最初から
+    予備に送り、両方開いている場合は CircuitOpenError ですぐに失敗させる。
+    計測数が min_samples に満たない間は default_delay を待ち時間にする。
+    """
+
+    def __init__(self, primary: LLMTarget, hedge: Optional[LLMTarget], percentile: float = 0.95,
+                 min_delay: float = 0.5, default_delay: float = 3.0, min_samples: int = 20,
+                 latencies: Optional[LatencyWindow] = None):
+        self.primary = primary
+        self.hedge = hedge
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.latencies = latencies if latencies is not None else LatencyWindow()
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    @staticmethod
+    def _payload_for(target: LLMTarget, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(payload, model=target.model)
+
+    @staticmethod
+    def _usable(result: LLMStreamResult) -> bool:
+        return result.status_code == 200 and result.parsed is not None
+
+    def _record_outcome(self, target: LLMTarget, result: LLMStreamResult, elapsed: float) -> None:
+        """応答を回路遮断の成功・失敗に数える（HTTPエラーと、JSONが揃わないまま時間切れになったものは失敗）"""
+        if result.status_code != 200 or (result.parsed is None and elapsed >= target.client.timeout):
+            target.breaker.record_failure()
+            return
+        target.breaker.record_success()
+        if target is self.primary:
+            self.latencies.record(elapsed)
+
+    def _first_target(self) -> Tuple[LLMTarget, bool]:
+        """最初に送る先と、その後に予備を送る余地があるか"""
+        if self.primary.breaker.allow():
+            return self.primary, self.hedge is not None
+        if self.hedge is not None and self.hedge.breaker.allow():
+            LLM_HEDGE_TOTAL.inc(result='failover')
+            return self.hedge, False
+        raise CircuitOpenError(f"LLM circuit open: {self.primary.breaker.name}")
+
+    def _hedge_allowed(self) -> bool:
+        if self.hedge is not None and self.hedge.breaker.allow():
+            LLM_HEDGE_TOTAL.inc(result='launched')
+            return True
+        return False
+
+
+class HedgedLLMClient(_HedgingPolicy):
+    """回路遮断・予備リクエスト付きの StreamingLLMClient（スレッド用）
+
+    予備を使う場合は主系・予備ともに executor で実行し、採用しなかった方は cancel で読み込みを打ち切る。
+    """
+
+    def __init__(self, primary: LLMTarget, hedge: Optional[LLMTarget] = None, executor: Optional[Executor] = None, **policy: Any):
+        super().__init__(primary, hedge, **policy)
+        self.executor = executor
+
+    def generate_json(self, payload: Dict[str, Any]) -> LLMStreamResult:
+        target, may_hedge = self._first_target()
+        if not may_hedge:
+            return self._call(target, payload, None)
+
+        calls: Dict[Future, Tuple[LLMTarget, threading.Event]] = {}
+
+        def launch(launch_target: LLMTarget) -> Future:
+            cancel = threading.Event()
+            future = submit_in_context(self.executor, self._call, launch_target, payload, cancel)
+            calls[future] = (launch_target, cancel)
+            return future
+
+        pending = {launch(target)}
+        hedge_at = time.monotonic() + self.hedge_delay() if may_hedge else None
+        fallback: Optional[LLMStreamResult] = None
+        error: Optional[BaseException] = None
+
+        while pending:
+            timeout = max(0.0, hedge_at - time.monotonic()) if hedge_at is not None else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if self._usable(result):
+                    for other, (_, cancel) in calls.items():
+                        if other is not future:
+                            cancel.set()
+                    if len(calls) > 1:
+                        LLM_HEDGE_TOTAL.inc(result=f"{calls[future][0].name}_won")
+                    return result
+                fallback = fallback or result
+
+            if hedge_at is not None and (not done or not pending):
+                # 待ち時間を過ぎた、または主系が待ち時間より前に失敗した場合は予備に送る
+                hedge_at = None
+                if self._hedge_allowed():
+                    pending.add(launch(self.hedge))
+
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def _call(self, target: LLMTarget, payload: Dict[str, Any], cancel: Optional[threading.Event]) -> LLMStreamResult:
+        started_at = time.monotonic()
+        try:
+            result = target.client.generate_json(self._payload_for(target, payload), cancel=cancel)
+        except Exception:
+            if cancel is not None and cancel.is_set():
+                target.breaker.release()
+            else:
+                target.breaker.record_failure()
+            raise
+
+        if cancel is not None and cancel.is_set():
+            target.breaker.release()  # 採用されなかった呼び出しは成功・失敗に数えない
+        else:
+            self._record_outcome(target, result, time.monotonic() - started_at)
+        return result
+
+
+class AsyncHedgedLLMClient(_HedgingPolicy):
+    """HedgedLLMClient の asyncio 版（採用しなかった呼び出しはタスクごとキャンセルする）"""
+
+    async def generate_json(self, payload: Dict[str, Any]) -> LLMStreamResult:
+        target, may_hedge = self._first_target()
+        if not may_hedge:
+            return await self._call(target, payload)
+
+        calls: Dict[asyncio.Task, LLMTarget] = {}
+
+        def launch(launch_target: LLMTarget) -> asyncio.Task:
+            task = asyncio.ensure_future(self._call(launch_target, payload))
+            calls[task] = launch_target
+            return task
+
+        pending = {launch(target)}
+        hedge_at = time.monotonic() + self.hedge_delay() if may_hedge else None
+        fallback: Optional[LLMStreamResult] = None
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                timeout = max(0.0, hedge_at - time.monotonic()) if hedge_at is not None else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if self._usable(result):
+                        if len(calls) > 1:
+                            LLM_HEDGE_TOTAL.inc(result=f"{calls[task].name}_won")
+                        return result
+                    fallback = fallback or result
+
+                if hedge_at is not None and (not done or not pending):
+                    # 待ち時間を過ぎた、または主系が待ち時間より前に失敗した場合は予備に送る
+                    hedge_at = None
+                    if self._hedge_allowed():
+                        pending.add(launch(self.hedge))
+        finally:
+            for task in calls:
+                if not task.done():
+                    task.cancel()
+
+        if fallback is not None:
+            return fallback
+        raise error
+
+    async def _call(self, target: LLMTarget, payload: Dict[str, Any]) -> LLMStreamResult:
+        started_at = time.monotonic()
+        try:
+            result = await target.client.generate_json(self._payload_for(target, payload))
+        except asyncio.CancelledError:
+            target.breaker.release()  # 採用されなかった呼び出しは成功・失敗に数えない
+            raise
+        except Exception:
+            target.breaker.record_failure()
+            raise
+        self._record_outcome(target, result, time.monotonic() - started_at)
+        return result
+
+
+class LLMStats:
+    """LLM呼び出しの集計（最初のトークンまでの時間・トークン/秒・打ち切り回数）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.early_terminations = 0
+        self.total_tokens = 0
+        self._ttft_sum = 0.0
+        self._ttft_count = 0
+        self._tps_sum = 0.0
+        self._tps_count = 0
+        self.last: Optional[Dict[str, Any]] = None
+
+    def record(self, result: LLMStreamResult) -> None:
+        with self._lock:
+            self.requests += 1
+            self.total_tokens += result.token_count
+            if result.terminated_early:
+                self.early_terminations += 1
+            if result.time_to_first_token is not None:
+                self._ttft_sum += result.time_to_first_token
+                self._ttft_count += 1
+            if result.tokens_per_second is not None:
+                self._tps_sum += result.tokens_per_second
+                self._tps_count += 1
+            self.last = {
+                'token_count': result.token_count,
+                'time_to_first_token': result.time_to_first_token,
+                'tokens_per_second': result.tokens_per_second,
+                'terminated_early': result.terminated_early
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'early_terminations': self.early_terminations,
+                'total_tokens': self.total_tokens,
+                'avg_time_to_first_token': round(self._ttft_sum / self._ttft_count, 3) if self._ttft_count else None,
+                'avg_tokens_per_second': round(self._tps_sum / self._tps_count, 1) if self._tps_count else None,
+                'last': self.last
+            }
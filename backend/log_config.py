@@ -0,0 +1,175 @@
+"""構造化ログの設定
+
+ログはキュー経由でバックグラウンドスレッドが書き出すため、リクエスト処理中の
+スレッドがログI/Oで待たされることはない（キューが溢れた分は捨てる）。
+DEBUGレベルの詳細ログ（店舗ごとのトレースなど）は、LOG_LEVEL=DEBUG のほか、
+リクエスト単位で有効にできる（X-Debug-Log ヘッダー / "debug": true / サンプリング）。
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import Config
+
+ROOT_LOGGER_NAME = 'restaurant_seeker'
+
+# ログに書き出さないパラメータ（APIキーなど）
+SECRET_PARAMS = ('key', 'api_key', 'apikey', 'token')
+# URLのクエリ文字列に含まれる上記パラメータの値（例外メッセージには要求URLがそのまま入る）
+_SECRET_QUERY_PATTERN = re.compile(r'\b(' + '|'.join(SECRET_PARAMS) + r')=[^&\s\'"]+', re.IGNORECASE)
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar('request_id', default='-')
+_request_debug: contextvars.ContextVar[bool] = contextvars.ContextVar('request_debug', default=False)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestLogger(logging.LoggerAdapter):
+    """リクエストIDを付与し、リクエスト単位のDEBUG有効化に対応したロガー"""
+
+    def isEnabledFor(self, level: int) -> bool:
+        if level == logging.DEBUG and _request_debug.get():
+            return True
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level: int, msg: Any, *args: Any, **kwargs: Any) -> None:
+        if self.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            # ロガー自身のレベル判定を通さずに記録する（リクエスト単位のDEBUGのため）
+            self.logger._log(level, msg, args, **kwargs)
+
+    def process(self, msg: Any, kwargs: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        extra = dict(kwargs.get('extra') or {})
+        extra.setdefault('request_id', _request_id.get())
+        kwargs['extra'] = extra
+        return msg, kwargs
+
+
+class StructuredFormatter(logging.Formatter):
+    """1行1レコードで出力するフォーマッタ（json またはテキスト）
+
+    extra={'data': {...}} で渡した項目は、json では同じ階層のキーとして、
+    テキストでは key=value として末尾に付く。
+    """
+
+    def __init__(self, output_format: str = 'text'):
+        super().__init__()
+        self.output_format = output_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = getattr(record, 'data', None) or {}
+        request_id = getattr(record, 'request_id', '-')
+        message = record.getMessage()
+
+        if self.output_format == 'json':
+            payload = {
+                'time': self.formatTime(record),
+                'level': record.levelname,
+                'logger': record.name,
+                'request_id': request_id,
+                'message': message
+            }
+            payload.update(data)
+            return mask_url_secrets(json.dumps(payload, ensure_ascii=False, default=str))
+
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name} [{request_id}] {message}"
+        if data:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in data.items())
+        # 呼び出し側で伏せ忘れたAPIキーも出力しない（書き出しスレッドで行うためリクエスト処理は待たない）
+        return mask_url_secrets(line)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """キューが満杯のときは待たずにレコードを捨てるQueueHandler"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def setup_logging() -> None:
+    """キュー経由で標準出力へ書き出すハンドラを設定（複数回呼んでも1回だけ設定）"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output_handler = logging.StreamHandler(sys.stdout)
+    output_handler.setFormatter(StructuredFormatter(Config.LOG_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.setLevel(Config.LOG_LEVEL)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> RequestLogger:
+    return RequestLogger(logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}"), {})
+
+
+def start_request_context(request_id: Optional[str] = None, force_debug: bool = False) -> Tuple[contextvars.Token, contextvars.Token]:
+    """リクエストIDとDEBUGログの有効/無効を現在のコンテキストに設定"""
+    debug = force_debug or (Config.LOG_DEBUG_SAMPLE_RATE > 0 and random.random() < Config.LOG_DEBUG_SAMPLE_RATE)
+    return (
+        _request_id.set(request_id or uuid.uuid4().hex[:12]),
+        _request_debug.set(debug)
+    )
+
+
+def end_request_context(tokens: Optional[Tuple[contextvars.Token, contextvars.Token]]) -> None:
+    if tokens is None:
+        return
+    id_token, debug_token = tokens
+    _request_id.reset(id_token)
+    _request_debug.reset(debug_token)
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+def debug_enabled() -> bool:
+    """現在のリクエストでDEBUGログが出力されるか（重いデバッグ処理の前に確認する）"""
+    return _request_debug.get() or logging.getLogger(ROOT_LOGGER_NAME).isEnabledFor(logging.DEBUG)
+
+
+def submit_in_context(executor: Executor, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """現在のリクエストのログコンテキストを引き継いでワーカースレッドで実行"""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+def mask_secrets(params: Dict[str, Any]) -> Dict[str, Any]:
+    """ログ出力用にAPIキーなどの値を伏せたコピーを返す"""
+    return {key: ('***' if key.lower() in SECRET_PARAMS and value else value) for key, value in params.items()}
+
+
+def mask_url_secrets(text: str) -> str:
+    """URLのクエリ文字列（key=... など）に含まれるAPIキーなどの値を伏せる"""
+    return _SECRET_QUERY_PATTERN.sub(r'\1=***', text)
+
+
+def describe_error(error: BaseException) -> str:
+    """ログ・エラー応答用の例外の説明（型名と、要求URL中のAPIキーを伏せたメッセージ）
+
+    requests / httpx の例外メッセージには key=<APIキー> を含む要求URLが入るため、
+    上流呼び出しの例外は str(e) ではなくこれを使う。
+    """
+    return f"{type(error).__name__}: {mask_url_secrets(str(error))}"
@@ -0,0 +1,244 @@
+"""処理段階ごとのレイテンシと各種カウンタ（Prometheusテキスト形式で出力）"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# レイテンシ用のバケット境界（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}')
+        return lines
+
+
+class Gauge:
+    """現在値を表すメトリクス（set で設定するか、set_function で出力時に値を取得する）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._functions[key] = function
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            values[key] = function()
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 -> [バケットごとの件数..., 合計, 件数]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """with ブロックの実行時間（秒）を記録"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_number(cumulative)}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, INF_BUCKET)} {_format_number(series[-1])}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {repr(series[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {_format_number(series[-1])}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# 処理段階ごとのレイテンシ
+#   stage: direct_parse / llm_call / hotpepper_page / hotpepper_fallback / scoring / filter_top / serialization / price_provider
+#   target: ページ（'page 2' など）や価格サイト名（該当しない段階は空）
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'restaurant_seeker_stage_duration_seconds',
+    'Latency of each search / price comparison stage in seconds.',
+    ('stage', 'target')
+))
+
+# クエリ解析の方法（direct: 辞書マッチ / cache: 解析キャッシュ / llm: LLMフォールバック）
+QUERY_PARSE_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_query_parse_total',
+    'Parsed queries by parse source.',
+    ('source',)
+))
+
+# キャッシュの参照結果（cache: hotpepper / local_store / llm_parse / search_response, result: hit / miss）
+CACHE_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_cache_requests_total',
+    'Cache lookups by cache and result.',
+    ('cache', 'result')
+))
+
+# 外部サービスのエラー（status: HTTPステータスコード、または connection / timeout / invalid_response など）
+UPSTREAM_ERRORS_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_upstream_errors_total',
+    'Upstream errors by upstream and status.',
+    ('upstream', 'status')
+))
+
+# 実行中の同じ処理に相乗りした呼び出し（level: llm_parse / hotpepper_page）
+COALESCED_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_coalesced_requests_total',
+    'Calls that joined an identical in-flight call instead of running their own.',
+    ('level',)
+))
+
+# 上流APIの呼び出し制御（upstream: hotpepper, priority: interactive / speculative / background,
+#   result: granted / queue_full / timeout / quota）
+RATE_LIMIT_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_rate_limit_requests_total',
+    'Upstream call permits by priority and result (granted or shed reason).',
+    ('upstream', 'priority', 'result')
+))
+
+# 当日の残り呼び出し回数（1日の上限を設定していない場合は -1）
+RATE_LIMIT_QUOTA_REMAINING = REGISTRY.register(Gauge(
+    'restaurant_seeker_rate_limit_quota_remaining',
+    'Remaining daily upstream call budget (-1 when unlimited).',
+    ('upstream',)
+))
+
+# トークンバケットの残りトークン数（すぐに呼び出せる回数）
+RATE_LIMIT_TOKENS = REGISTRY.register(Gauge(
+    'restaurant_seeker_rate_limit_tokens',
+    'Tokens currently available in the upstream token bucket.',
+    ('upstream',)
+))
+
+# 呼び出しの順番を待っているリクエスト数
+RATE_LIMIT_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'restaurant_seeker_rate_limit_queue_depth',
+    'Upstream calls waiting for a token.',
+    ('upstream',)
+))
+
+# 回路遮断の状態（name: llm_primary / llm_hedge、0: closed / 1: half_open / 2: open）
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    'restaurant_seeker_circuit_state',
+    'Circuit breaker state (0 closed, 1 half-open, 2 open).',
+    ('name',)
+))
+
+# 回路が開いていたため呼び出さずに失敗させた回数
+CIRCUIT_REJECTIONS_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_circuit_rejections_total',
+    'Calls rejected without being sent because the circuit was open.',
+    ('name',)
+))
+
+# LLMの予備リクエスト（result: launched / primary_won / hedge_won / failover（主系の回路が開いていた））
+LLM_HEDGE_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_llm_hedge_total',
+    'Hedged LLM requests by outcome.',
+    ('result',)
+))
+
+# 順位付けに応じたページ取得（decision: early_stop（上位が確定したため残りを取得しなかった）/
+#   extended（上位が埋まらないため HOTPEPPER_MAX_PAGES を超えて取得した）/
+#   rate_limited（呼び出し制御でページが打ち切られ、検索結果が一部だけになった））
+HOTPEPPER_PAGING_TOTAL = REGISTRY.register(Counter(
+    'restaurant_seeker_hotpepper_paging_total',
+    'Searches whose HotPepper paging was cut short or extended by ranking needs or the rate limiter.',
+    ('decision',)
+))
@@ -0,0 +1,88 @@
+"""順位付けに必要な分だけホットペッパーのページを取得する
+
+ホットペッパーの返す順序は検索サービスのスコアとは関係がないため、まだ取得していない
+ページの店舗が上位候補に入るかどうかは、取得済みの結果と「店舗が取り得る総合スコアの上限」
+から判断する。上限を加えても上位が入れ替わらないと分かった時点でページの取得をやめ、
+逆にジャンルの絞り込みで多くの店舗が除外されて上位候補が埋まらない場合は、
+通過率から必要なページ数を見積もって先に取得を始める。
+"""
+import heapq
+import math
+from typing import Any, Callable, List, Mapping, Tuple
+
+
+class RankingPagePlanner:
+    """1検索分のページ取得の計画
+
+    ページの店舗を採用するたびに record_page で結果を渡し、page_limit で取得するページ数を決める。
+    total_score: レストランの総合スコア（_calculate_total_score）
+    score_bound: 未取得の店舗が取り得る (総合スコアの上限, 推定評価の上限)
+    base_pages: 上位候補が埋まっている場合に取得するページ数（HOTPEPPER_MAX_PAGES）
+    limit / high_rated_quota / high_rating: 上位候補の件数・高評価店の優先枠・高評価とみなす評価
+    """
+
+    def __init__(self, total_score: Callable[[Mapping[str, Any]], float], score_bound: Tuple[float, float],
+                 page_size: int, base_pages: int, limit: int, high_rated_quota: int, high_rating: float = 4.0):
+        self.total_score = total_score
+        self.score_bound = score_bound
+        self.page_size = page_size
+        self.base_pages = base_pages
+        self.limit = limit
+        self.high_rated_quota = high_rated_quota
+        self.high_rating = high_rating
+        self.shop_count = 0  # 取得した店舗数
+        self.kept_count = 0  # 重複・ジャンル不一致を除いて採用した店舗数
+        self._high_scores: List[float] = []  # 高評価店の総合スコア
+        self._other_scores: List[float] = []
+        self.extended = False  # base_pages を超えて取得すると判断したか
+
+    def record_page(self, shop_count: int, restaurants: List[Mapping[str, Any]]) -> None:
+        """取得したページの店舗数と、そこから採用したレストランを記録"""
+        self.shop_count += shop_count
+        self.kept_count += len(restaurants)
+        for restaurant in restaurants:
+            scores = self._high_scores if restaurant.get('rating', 0) >= self.high_rating else self._other_scores
+            scores.append(self.total_score(restaurant))
+
+    @property
+    def pass_rate(self) -> float:
+        """取得した店舗のうち採用した割合"""
+        return self.kept_count / self.shop_count if self.shop_count else 0.0
+
+    def settled(self) -> bool:
+        """未取得の店舗がいくら加わっても上位候補が変わらないか
+
+        _filter_top_restaurants と同じ選び方（高評価店の優先枠 → 残り枠を総合スコア順）で
+        選ばれる最下位のスコアを求め、スコアの上限がそれに届かなければ入れ替わらない。
+        候補が上位件数以下の間は絞り込み自体が行われないため、確定とはみなさない。
+        """
+        if self.kept_count <= self.limit:
+            return False
+
+        bound_score, bound_rating = self.score_bound
+        high_scores = sorted(self._high_scores, reverse=True)
+        # 高評価枠に空きがあれば、スコアが低くても高評価店は上位に入る
+        if bound_rating >= self.high_rating and len(high_scores) < self.high_rated_quota:
+            return False
+
+        selected = high_scores[:self.high_rated_quota]
+        selected.extend(heapq.nlargest(self.limit - len(selected), high_scores[self.high_rated_quota:] + self._other_scores))
+        # 同点の場合は並び順次第で入れ替わるため、上限が最下位と同じなら確定しない
+        return bound_score < min(selected)
+
+    def page_limit(self, next_page: int, total_pages: int) -> int:
+        """取得するページ数（1ページ目を含む）を返す
+
+        next_page: 次に取得するページ番号（0始まり）
+        total_pages: 取得できるページ数の上限（results_available と HOTPEPPER_PREFETCH_MAX_PAGES による）
+        """
+        if self.settled():
+            return next_page
+
+        page_limit = min(self.base_pages, total_pages)
+        if self.kept_count < self.limit:
+            # 上位候補が埋まっていなければ、通過率から残りを埋めるのに必要なページ数を見積もる
+            per_page = self.pass_rate * self.page_size
+            needed = math.ceil((self.limit - self.kept_count) / per_page) if per_page > 0 else total_pages
+            page_limit = max(page_limit, min(total_pages, next_page + needed))
+        return page_limit
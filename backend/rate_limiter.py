@@ -0,0 +1,235 @@
+"""上流APIの呼び出し制御（トークンバケット + 優先度付きの待ち行列）
+
+呼び出しの前に acquire（ASGIモードでは acquire_async）で許可を得る。トークンが
+足りない間は優先度の高い順（同じ優先度なら到着順）に待たせ、待ち時間の上限（優先度ごとの
+max_wait、または呼び出し元が渡した締め切り）を超えたものや待ち行列が一杯のときに届いたものは
+RateLimitExceeded で打ち切る。
+1日の上限（daily_quota）を設定した場合は、残りが少なくなると優先度の低い呼び出しから
+打ち切り、ユーザーが待っている呼び出しの分を残しておく。
+スレッドと asyncio のどちらから呼んでも同じバケット・同じ待ち行列を共有する。
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from datetime import date
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import RATE_LIMIT_QUEUE_DEPTH, RATE_LIMIT_QUOTA_REMAINING, RATE_LIMIT_REQUESTS_TOTAL, RATE_LIMIT_TOKENS
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # ユーザーが結果を待っている呼び出し（1ページ目・価格比較・ジャンルマスター）
+    SPECULATIVE = 1  # 結果を増やすための先読み（2ページ目以降・フォールバック）
+    BACKGROUND = 2   # ローカルストアの更新など
+
+
+class RateLimitExceeded(RuntimeError):
+    """呼び出しを打ち切った（reason: queue_full / timeout / quota）"""
+
+    def __init__(self, upstream: str, priority: Priority, reason: str):
+        super().__init__(f"{upstream} call shed ({priority.name.lower()}): {reason}")
+        self.upstream = upstream
+        self.priority = priority
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ('priority', 'sequence', 'wake', 'granted', 'shed_reason', 'cancelled')
+
+    def __init__(self, priority: Priority, sequence: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.sequence = sequence
+        self.wake = wake
+        self.granted = False
+        self.shed_reason: Optional[str] = None
+        self.cancelled = False
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class TokenBucketScheduler:
+    """rate 回/秒（最大 burst 回まで連続可）で呼び出しを許可するスケジューラー
+
+    quota_reserve: 優先度ごとに、1日の上限のうち残しておく割合（残りがこれ以下なら打ち切る）
+    max_wait: 優先度ごとの待ち時間の上限（秒、None なら無制限）
+    rate が 0 以下ならトークンの制限はせず、1日の上限だけを適用する。
+    """
+
+    def __init__(self, upstream: str, rate: float, burst: int, daily_quota: int = 0,
+                 quota_reserve: Optional[Dict[Priority, float]] = None,
+                 max_wait: Optional[Dict[Priority, Optional[float]]] = None, max_queue: int = 100):
+        self.upstream = upstream
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.daily_quota = daily_quota
+        self.quota_reserve = quota_reserve or {}
+        self.max_wait = max_wait or {}
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._day = date.today()
+        self.used_today = 0
+        self._queue: List[_Waiter] = []  # 優先度順のヒープ（キャンセル済みは取り出し時に捨てる）
+        self._queued = 0
+        self._sequence = itertools.count()
+
+        RATE_LIMIT_TOKENS.set_function(lambda: self.snapshot()['tokens'], upstream=upstream)
+        RATE_LIMIT_QUOTA_REMAINING.set_function(lambda: self.snapshot()['quota_remaining'], upstream=upstream)
+        RATE_LIMIT_QUEUE_DEPTH.set_function(lambda: self.snapshot()['queued'], upstream=upstream)
+
+    def acquire(self, priority: Priority, deadline: Optional[float] = None) -> None:
+        """呼び出しの許可を得るまで待つ（打ち切られた場合は RateLimitExceeded）
+
+        deadline: 待つのをやめる時刻（time.monotonic() 基準）。優先度ごとの max_wait より早ければこちらで打ち切る
+        """
+        event = threading.Event()
+        waiter = self._enter(priority, event.set)
+        if waiter is None:
+            return
+
+        deadline = self._deadline(priority, deadline)
+        while True:
+            event.clear()
+            wait = self._poll(waiter, deadline)
+            if wait is None:
+                return
+            event.wait(wait)
+
+    async def acquire_async(self, priority: Priority, deadline: Optional[float] = None) -> None:
+        """acquire の asyncio 版（待っている間もイベントループを止めない）"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enter(priority, lambda: loop.call_soon_threadsafe(event.set))
+        if waiter is None:
+            return
+
+        deadline = self._deadline(priority, deadline)
+        try:
+            while True:
+                event.clear()
+                wait = self._poll(waiter, deadline)
+                if wait is None:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            # 呼び出し元がキャンセルされた場合は待ち行列から外す
+            with self._lock:
+                if not waiter.granted and not waiter.cancelled and waiter.shed_reason is None:
+                    waiter.cancelled = True
+                    self._queued -= 1
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'tokens': round(self._tokens, 3) if self.rate > 0 else -1,
+                'quota_remaining': self._quota_remaining(),
+                'used_today': self.used_today,
+                'queued': self._queued
+            }
+
+    def _deadline(self, priority: Priority, deadline: Optional[float]) -> Optional[float]:
+        max_wait = self.max_wait.get(priority)
+        if max_wait is None:
+            return deadline
+        priority_deadline = time.monotonic() + max_wait
+        return priority_deadline if deadline is None else min(priority_deadline, deadline)
+
+    def _enter(self, priority: Priority, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """すぐに許可できればNone、待つ必要があれば待ち行列に加えた _Waiter を返す"""
+        with self._lock:
+            self._refill(time.monotonic())
+            reason = self._quota_block(priority)
+            if reason is None and self._queued == 0 and self._tokens >= 1:
+                self._grant(priority)
+                return None
+            if reason is None and self._queued >= self.max_queue:
+                reason = 'queue_full'
+            if reason is not None:
+                self._shed(priority, reason)
+
+            waiter = _Waiter(priority, next(self._sequence), wake)
+            heapq.heappush(self._queue, waiter)
+            self._queued += 1
+            return waiter
+
+    def _poll(self, waiter: _Waiter, deadline: Optional[float]) -> Optional[float]:
+        """許可されていればNone、まだなら次に確認するまでの秒数を返す（打ち切りなら例外）"""
+        with self._lock:
+            self._dispatch()
+            if waiter.granted:
+                return None
+            if waiter.shed_reason is not None:
+                raise RateLimitExceeded(self.upstream, waiter.priority, waiter.shed_reason)
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                waiter.cancelled = True
+                self._queued -= 1
+                self._shed(waiter.priority, 'timeout')
+
+            # 次のトークンが貯まる頃に確認し直す（先に他の呼び出し元が配れば wake で起こされる）
+            wait = max((1 - self._tokens) / self.rate, 0.001) if self.rate > 0 else 0.001
+            if deadline is not None:
+                wait = min(wait, max(deadline - now, 0.001))
+            return wait
+
+    def _dispatch(self) -> None:
+        """貯まったトークンを優先度の高い待ちから順に配る（ロックを取得した状態で呼ぶ）"""
+        self._refill(time.monotonic())
+        while self._queue and self._tokens >= 1:
+            waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self._queued -= 1
+            reason = self._quota_block(waiter.priority)
+            if reason is not None:
+                waiter.shed_reason = reason
+                RATE_LIMIT_REQUESTS_TOTAL.inc(upstream=self.upstream, priority=waiter.priority.name.lower(), result=reason)
+            else:
+                self._grant(waiter.priority)
+                waiter.granted = True
+            waiter.wake()
+
+    def _refill(self, now: float) -> None:
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self.used_today = 0
+
+        if self.rate <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _quota_remaining(self) -> int:
+        if not self.daily_quota:
+            return -1
+        return max(0, self.daily_quota - self.used_today)
+
+    def _quota_block(self, priority: Priority) -> Optional[str]:
+        if not self.daily_quota:
+            return None
+        remaining = self.daily_quota - self.used_today
+        if remaining <= 0 or remaining <= self.daily_quota * self.quota_reserve.get(priority, 0.0):
+            return 'quota'
+        return None
+
+    def _grant(self, priority: Priority) -> None:
+        self._tokens -= 1
+        self.used_today += 1
+        RATE_LIMIT_REQUESTS_TOTAL.inc(upstream=self.upstream, priority=priority.name.lower(), result='granted')
+
+    def _shed(self, priority: Priority, reason: str) -> None:
+        RATE_LIMIT_REQUESTS_TOTAL.inc(upstream=self.upstream, priority=priority.name.lower(), result=reason)
+        raise RateLimitExceeded(self.upstream, priority, reason)
@@ -0,0 +1,109 @@
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Tuple, Union
+
+
+# 検索処理で参照するホットペッパー店舗データの項目（取得時にこれ以外は捨てる）
+SHOP_FIELDS = (
+    'id', 'name', 'address', 'tel', 'catch', 'open',
+    'private_room', 'card', 'parking', 'non_smoking', 'wifi', 'lunch'
+)
+
+# 同じ値が多数の店舗で繰り返される項目（インターンして1つの文字列を共有する）
+_INTERNED_SHOP_FIELDS = ('private_room', 'card', 'parking', 'non_smoking', 'wifi', 'lunch')
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def compact_shop(shop: Dict[str, Any]) -> Dict[str, Any]:
+    """グルメサーチAPIの店舗データを検索に必要な項目だけに絞り込む"""
+    compact = {field: shop[field] for field in SHOP_FIELDS if field in shop}
+    for field in _INTERNED_SHOP_FIELDS:
+        if field in compact:
+            compact[field] = _intern(compact[field])
+
+    genre = shop.get('genre')
+    if isinstance(genre, dict):
+        compact['genre'] = {'code': _intern(genre.get('code', '')), 'name': _intern(genre.get('name', ''))}
+    middle_area = shop.get('middle_area')
+    if isinstance(middle_area, dict):
+        compact['middle_area'] = {'code': _intern(middle_area.get('code', '')), 'name': _intern(middle_area.get('name', ''))}
+    budget = shop.get('budget')
+    if isinstance(budget, dict):
+        compact['budget'] = {'code': _intern(budget.get('code', '')), 'name': _intern(budget.get('name', ''))}
+    pc_photo = shop.get('photo', {}).get('pc') if isinstance(shop.get('photo'), dict) else None
+    if isinstance(pc_photo, dict):
+        compact['photo'] = {'pc': {size: pc_photo[size] for size in ('l', 'm') if size in pc_photo}}
+    return compact
+
+
+class RestaurantRecord:
+    """検索結果1件分のレストラン情報
+
+    辞書の代わりに __slots__ で保持し、料理ジャンル・地域・予算・ソース・特徴タグなど
+    繰り返し現れる文字列はインターンして共有する。get / [] で辞書と同じように
+    参照でき、レスポンスを返す時点で to_dict() により辞書へ変換する。
+    """
+
+    FIELDS = (
+        'id', 'name', 'cuisine', 'location', 'address', 'phone', 'rating', 'price_range',
+        'description', 'image', 'features', 'match_score', 'source', 'total_score'
+    )
+    __slots__ = FIELDS
+
+    def __init__(self, id: str, name: str, cuisine: str, location: str, address: str, phone: str,
+                 rating: float, price_range: str, description: str, image: str, features: Tuple[str, ...],
+                 match_score: float, source: str):
+        self.id = id
+        self.name = name
+        self.cuisine = _intern(cuisine)
+        self.location = _intern(location)
+        self.address = address
+        self.phone = phone
+        self.rating = rating
+        self.price_range = _intern(price_range)
+        self.description = description
+        self.image = image
+        self.features = tuple(_intern(feature) for feature in features)
+        self.match_score = match_score
+        self.source = _intern(source)
+        # total_score は上位絞り込みの時点で設定される（未設定のうちはキーが存在しない扱い）
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS and hasattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return [field for field in self.FIELDS if hasattr(self, field)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.keys()}
+        data['features'] = list(self.features)
+        return data
+
+    def __repr__(self) -> str:
+        return f"RestaurantRecord(id={self.id!r}, name={self.name!r})"
+
+
+def restaurants_to_dicts(restaurants: Iterable[Union[RestaurantRecord, Mapping[str, Any]]]) -> List[Dict[str, Any]]:
+    """レスポンス用に辞書のリストへ変換（サンプルデータなど元から辞書のものはそのまま）"""
+    return [restaurant.to_dict() if isinstance(restaurant, RestaurantRecord) else restaurant for restaurant in restaurants]
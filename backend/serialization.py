@@ -0,0 +1,131 @@
+"""レスポンスのJSONエンコードと圧縮
+
+orjson / brotli がインストールされていれば使用し、なければ標準ライブラリ
+（json / gzip）にフォールバックする。
+"""
+import gzip
+import json
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from cache import TTLCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps_json(payload: Any) -> bytes:
+    """UTF-8のJSONバイト列にエンコード（非ASCII文字はエスケープしない）"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding から使用する圧縮方式を選ぶ（br > gzip、未対応ならNone）"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    best = None
+    best_quality = 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+def parse_fields(fields: Any) -> Optional[Tuple[str, ...]]:
+    """fields パラメータ（カンマ区切り文字列またはリスト）を正規化する"""
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    names = {str(field).strip() for field in fields if str(field).strip()}
+    if not names:
+        return None
+    # 価格比較で使うため id は常に含める
+    names.add('id')
+    return tuple(sorted(names))
+
+
+def project_fields(restaurants: Iterable[Dict[str, Any]], fields: Optional[Tuple[str, ...]]) -> list:
+    """レストランの辞書を指定フィールドだけに絞り込む"""
+    if fields is None:
+        return list(restaurants)
+    return [{field: restaurant[field] for field in fields if field in restaurant} for restaurant in restaurants]
+
+
+class EncodedResponseCache:
+    """エンコード済み（＋圧縮済み）のレスポンス本体を保持するキャッシュ
+
+    キーごとに非圧縮のJSONと、要求された圧縮方式ごとのバイト列を保存し、
+    キャッシュヒット時は再エンコード・再圧縮せずにそのまま返す。
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes], encoding: Optional[str]) -> Tuple[bytes, bool]:
+        """(レスポンス本体, キャッシュヒットか) を返す"""
+        body = self.get(key, encoding)
+        if body is not None:
+            return body, True
+        return self.put(key, build(), encoding), False
+
+    def get(self, key: Hashable, encoding: Optional[str]) -> Optional[bytes]:
+        """キャッシュ済みなら指定の圧縮方式のバイト列を返す（未キャッシュならNone）"""
+        variants = self._cache.get(key)
+        if variants is None:
+            return None
+        return self._variant(key, variants, encoding)
+
+    def put(self, key: Hashable, body: bytes, encoding: Optional[str]) -> bytes:
+        """非圧縮のJSONを保存し、指定の圧縮方式のバイト列を返す"""
+        variants = {None: body}
+        self._cache.set(key, variants, size=len(body))
+        return self._variant(key, variants, encoding)
+
+    def _variant(self, key: Hashable, variants: Dict[Optional[str], bytes], encoding: Optional[str]) -> bytes:
+        body = variants.get(encoding)
+        if body is None:
+            body = compress(variants[None], encoding)
+            variants = dict(variants, **{encoding: body})
+            self._cache.set(key, variants, size=sum(len(value) for value in variants.values()))
+        return body
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def clear(self) -> None:
+        self._cache.clear()
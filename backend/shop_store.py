@@ -0,0 +1,236 @@
+"""ホットペッパー店舗データのローカルストア（SQLite）
+
+グルメサーチAPIから Config.HOTPEPPER_AREA_CODES の全エリアの店舗を取得して保存し、
+中エリア・ジャンル・予算・設備フラグのインデックスで検索できるようにする。
+
+使い方:
+    python shop_store.py refresh            # 全エリアを取得し直す
+    python shop_store.py refresh --area 新宿  # 指定エリアのみ
+    python shop_store.py status             # エリアごとの件数と取得日時
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from rate_limiter import Priority, TokenBucketScheduler
+
+
+# 設備フラグ列と「該当」とみなす値
+FEATURE_FLAGS = {
+    'private_room': 'あり',
+    'card': '利用可',
+    'non_smoking': '全面禁煙',
+    'parking': 'あり',
+    'wifi': 'あり',
+    'lunch': 'あり'
+}
+
+
+class ShopStore:
+    """店舗データのローカルインデックス
+
+    エリア単位で全件を取得・保存し、取得済みかつ鮮度が十分なエリアについては
+    グルメサーチAPIと同じ start/count のページングで結果を返す。
+    """
+
+    def __init__(self, path: str, max_age: float):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        flag_columns = ''.join(f' {flag} INTEGER NOT NULL DEFAULT 0,' for flag in FEATURE_FLAGS)
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS shops ('
+                ' id TEXT PRIMARY KEY,'
+                ' middle_area TEXT NOT NULL,'
+                ' area_rank INTEGER NOT NULL,'
+                ' genre_code TEXT,'
+                ' budget_code TEXT,'
+                f'{flag_columns}'
+                ' data TEXT NOT NULL,'
+                ' fetched_at REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_shops_area ON shops (middle_area, area_rank)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_shops_genre ON shops (genre_code, middle_area)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_shops_budget ON shops (budget_code, middle_area)')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_shops_area_genre_budget '
+                'ON shops (middle_area, genre_code, budget_code, area_rank)'
+            )
+            for flag in FEATURE_FLAGS:
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_shops_{flag} ON shops ({flag}, middle_area)')
+
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS area_coverage ('
+                ' middle_area TEXT PRIMARY KEY,'
+                ' shop_count INTEGER NOT NULL,'
+                ' fetched_at REAL NOT NULL)'
+            )
+            self._conn.commit()
+
+    def is_fresh(self, middle_area: str) -> bool:
+        """エリアが取得済みで、最終取得から max_age 以内かどうか"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fetched_at FROM area_coverage WHERE middle_area = ?', (middle_area,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.max_age
+
+    def search(self, middle_area: str, genre: Optional[str] = None, budget: Optional[str] = None,
+               start: int = 1, count: int = 100, **features: bool) -> Dict[str, Any]:
+        """グルメサーチAPIの results と同じ形式で検索結果を返す"""
+        conditions = ['middle_area = ?']
+        values: List[Any] = [middle_area]
+        if genre:
+            conditions.append('genre_code = ?')
+            values.append(genre)
+        if budget:
+            conditions.append('budget_code = ?')
+            values.append(budget)
+        for flag, required in features.items():
+            if flag in FEATURE_FLAGS and required:
+                conditions.append(f'{flag} = 1')
+
+        where = ' AND '.join(conditions)
+        with self._lock:
+            available = self._conn.execute(f'SELECT COUNT(*) FROM shops WHERE {where}', values).fetchone()[0]
+            rows = self._conn.execute(
+                f'SELECT data FROM shops WHERE {where} ORDER BY area_rank LIMIT ? OFFSET ?',
+                values + [count, max(start - 1, 0)]
+            ).fetchall()
+
+        shops = [json.loads(row[0]) for row in rows]
+        return {
+            'results_available': available,
+            'results_returned': str(len(shops)),
+            'results_start': start,
+            'shop': shops
+        }
+
+    def replace_area(self, middle_area: str, shops: List[Dict[str, Any]]) -> None:
+        """エリアの店舗を取得結果で置き換え、取得日時を記録する"""
+        fetched_at = time.time()
+        flag_names = list(FEATURE_FLAGS)
+        columns = ['id', 'middle_area', 'area_rank', 'genre_code', 'budget_code'] + flag_names + ['data', 'fetched_at']
+        placeholders = ', '.join('?' for _ in columns)
+
+        rows = []
+        for rank, shop in enumerate(shops):
+            rows.append(
+                [shop.get('id'), middle_area, rank, shop.get('genre', {}).get('code'), shop.get('budget', {}).get('code')]
+                + [1 if shop.get(flag, '') == value else 0 for flag, value in FEATURE_FLAGS.items()]
+                + [json.dumps(shop, ensure_ascii=False), fetched_at]
+            )
+
+        with self._lock:
+            self._conn.execute('DELETE FROM shops WHERE middle_area = ?', (middle_area,))
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO shops ({", ".join(columns)}) VALUES ({placeholders})', rows
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO area_coverage (middle_area, shop_count, fetched_at) VALUES (?, ?, ?)',
+                (middle_area, len(rows), fetched_at)
+            )
+            self._conn.commit()
+
+    def coverage(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT middle_area, shop_count, fetched_at FROM area_coverage ORDER BY middle_area'
+            ).fetchall()
+        now = time.time()
+        return [
+            {
+                'middle_area': middle_area,
+                'shop_count': shop_count,
+                'fetched_at': fetched_at,
+                'fresh': now - fetched_at <= self.max_age
+            }
+            for middle_area, shop_count, fetched_at in rows
+        ]
+
+
+def refresh_area(store: ShopStore, http, middle_area: str, scheduler=None) -> int:
+    """グルメサーチAPIから中エリアの全店舗を取得してストアを更新
+
+    scheduler（rate_limiter.TokenBucketScheduler）を渡した場合は各ページをバックグラウンドの
+    優先度で呼び出す。渡さない場合は REQUEST_DELAY 秒ごとに1ページ取得する。
+    """
+    if scheduler is None:
+        scheduler = TokenBucketScheduler('hotpepper_refresh', rate=1 / Config.REQUEST_DELAY, burst=1)
+    shops: List[Dict[str, Any]] = []
+    start = 1
+    while True:
+        params = {
+            'key': Config.HOTPEPPER_API_KEY,
+            'format': 'json',
+            'middle_area': middle_area,
+            'count': Config.HOTPEPPER_PAGE_SIZE,
+            'start': start
+        }
+        scheduler.acquire(Priority.BACKGROUND)
+        response = http.get(Config.HOTPEPPER_API_URL, params=params, timeout=Config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        results = response.json().get('results', {})
+        if 'error' in results:
+            raise RuntimeError(f"HotPepper API error: {results['error']}")
+
+        page_shops = results.get('shop', [])
+        shops.extend(page_shops)
+        available = int(results.get('results_available', 0))
+        if not page_shops or len(shops) >= available:
+            break
+
+        start += len(page_shops)
+
+    store.replace_area(middle_area, shops)
+    return len(shops)
+
+
+def main() -> None:
+    from http_client import HttpClient
+
+    parser = argparse.ArgumentParser(description='ホットペッパー店舗データのローカルストアを管理します')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = subparsers.add_parser('refresh', help='グルメサーチAPIから店舗データを取得し直す')
+    refresh_parser.add_argument('--area', action='append', help='対象エリア名（例: 新宿）。省略時は全エリア')
+    subparsers.add_parser('status', help='エリアごとの件数と取得日時を表示')
+    args = parser.parse_args()
+
+    store = ShopStore(Config.SHOP_STORE_PATH, Config.SHOP_STORE_MAX_AGE)
+
+    if args.command == 'status':
+        for area in store.coverage():
+            fetched = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(area['fetched_at']))
+            print(f"{area['middle_area']}: {area['shop_count']} shops, fetched {fetched} ({'fresh' if area['fresh'] else 'stale'})")
+        return
+
+    if not Config.HOTPEPPER_API_KEY:
+        raise SystemExit('HOTPEPPER_API_KEY is not configured')
+
+    http = HttpClient()
+    # 全エリアを通して REQUEST_DELAY 秒ごとに1回だけ呼び出す
+    scheduler = TokenBucketScheduler('hotpepper_refresh', rate=1 / Config.REQUEST_DELAY, burst=1)
+    areas = args.area or list(Config.HOTPEPPER_AREA_CODES)
+    for area_name in areas:
+        middle_area = Config.HOTPEPPER_AREA_CODES.get(area_name, area_name)
+        count = refresh_area(store, http, middle_area, scheduler)
+        print(f"[STORE] {area_name} ({middle_area}): {count} shops")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""同じ処理の同時実行をまとめる（single-flight）
+
+同じキーの処理が実行中の間に届いた呼び出しは、新たに実行せずに実行中の処理の
+結果を待って共有する。例外も待っていた全員に伝わる。処理が終わればキーは外れるため、
+結果を保持するキャッシュではない（完了後の呼び出しは改めて実行される）。
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from metrics import COALESCED_REQUESTS_TOTAL
+
+
+class SingleFlight:
+    """スレッド用（Flask版・バッチ検索）"""
+
+    def __init__(self, level: str):
+        self.level = level  # メトリクスのラベル（llm_parse / hotpepper_page）
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._calls[key] = future
+
+        if not owner:
+            COALESCED_REQUESTS_TOTAL.inc(level=self.level)
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """asyncio 用（ASGIモード、1つのイベントループ内で使う）
+
+    処理は最初の呼び出し元とは別のタスクで実行するため、呼び出し元がキャンセルされても
+    （クライアントの切断など）待っている他の呼び出し元には結果が届く。
+    """
+
+    def __init__(self, level: str):
+        self.level = level
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            COALESCED_REQUESTS_TOTAL.inc(level=self.level)
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 待っていた呼び出し元が全員キャンセルされた場合に未回収の例外として警告されないようにする
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
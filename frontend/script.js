@@ -18,27 +18,97 @@ async function searchRestaurants() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
             },
-            body: JSON.stringify({ query }),
+            body: JSON.stringify({ query, stream: true }),
         });
 
-        const data = await response.json();
-        showLoading(false);
-
-        if (data.status === 'restaurants_found') {
-            // レストランが見つかった場合、候補リストを表示
-            displayCandidates(data.restaurants);
-        } else {
-            // 結果が見つからない場合
-            showError(data.message || '該当するレストランが見つかりませんでした');
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream') || !response.body) {
+            // ストリーミング非対応の場合は通常のJSONレスポンスとして処理
+            handleSearchResult(await response.json());
+            return;
         }
 
+        await readSearchStream(response);
+
     } catch (error) {
         showLoading(false);
         showError('検索中にエラーが発生しました: ' + error.message);
     }
 }
 
+async function readSearchStream(response) {
+    // ページごとに届いたレストランを暫定表示し、最終結果で置き換える
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let previewRestaurants = [];
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let separatorIndex;
+        while ((separatorIndex = buffer.indexOf('\n\n')) >= 0) {
+            const rawEvent = buffer.slice(0, separatorIndex);
+            buffer = buffer.slice(separatorIndex + 2);
+
+            const { event, data } = parseSSEEvent(rawEvent);
+            if (!data) {
+                continue;
+            }
+
+            if (event === 'page') {
+                if (data.replaces_previous) {
+                    previewRestaurants = [];
+                }
+                previewRestaurants = previewRestaurants.concat(data.restaurants);
+                if (previewRestaurants.length > 0) {
+                    showLoading(false);
+                    displayCandidates(previewRestaurants);
+                }
+            } else if (event === 'results') {
+                handleSearchResult(data);
+            } else if (event === 'error') {
+                showLoading(false);
+                showError('検索中にエラーが発生しました: ' + data.error);
+            }
+        }
+    }
+
+    showLoading(false);
+}
+
+function parseSSEEvent(rawEvent) {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    return { event, data: dataLines.length > 0 ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+function handleSearchResult(data) {
+    showLoading(false);
+
+    if (data.status === 'restaurants_found') {
+        // レストランが見つかった場合、候補リストを表示
+        displayCandidates(data.restaurants);
+    } else {
+        // 結果が見つからない場合
+        document.getElementById('candidates-section').classList.add('hidden');
+        showError(data.message || '該当するレストランが見つかりませんでした');
+    }
+}
+
 function displayCandidates(candidates) {
     const candidatesSection = document.getElementById('candidates-section');
     const candidatesList = document.getElementById('candidates-list');
@@ -191,6 +261,17 @@ function displayPriceComparison(priceData) {
     `;
     
     priceData.forEach(item => {
+        if (item.timed_out) {
+            // 締め切りまでに応答がなかったサイト
+            tableHTML += `
+            <tr>
+                <td><strong>${item.site}</strong></td>
+                <td class="price-info" colspan="4">応答なし（タイムアウト）</td>
+            </tr>
+        `;
+            return;
+        }
+
         const reservationClass = item.reservation_available ? 'reservation-available' : 'reservation-unavailable';
         const reservationText = item.reservation_available ? '予約可' : '情報のみ';
         